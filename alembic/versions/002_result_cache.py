@@ -0,0 +1,45 @@
+"""Content-addressed result cache
+
+Revision ID: 002_result_cache
+Revises: 001_initial
+Create Date: 2026-10-18
+
+- transcription_tasks.content_hash: SHA-256 of the uploaded bytes
+- result_cache: (content hash, model, options) -> stored transcription result
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002_result_cache'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transcription_tasks', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.create_index('ix_transcription_tasks_content_hash', 'transcription_tasks', ['content_hash'])
+    
+    op.create_table(
+        'result_cache',
+        sa.Column('cache_key', sa.String(64), primary_key=True),
+        sa.Column('content_hash', sa.String(64), nullable=False, index=True),
+        sa.Column('source_task_id', sa.String(36), nullable=True),
+        sa.Column('result_text', sa.Text, nullable=True),
+        sa.Column('result_text_corrected', sa.Text, nullable=True),
+        sa.Column('language', sa.String(10), nullable=True),
+        sa.Column('duration', sa.Float, nullable=True),
+        sa.Column('summary', sa.Text, nullable=True),
+        sa.Column('topics', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('last_used_at', sa.DateTime, nullable=False, index=True),
+        sa.Column('hits', sa.Integer, nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('result_cache')
+    op.drop_index('ix_transcription_tasks_content_hash', 'transcription_tasks')
+    op.drop_column('transcription_tasks', 'content_hash')
@@ -0,0 +1,30 @@
+"""Audio metadata probed at upload
+
+Revision ID: 003_audio_probe
+Revises: 002_result_cache
+Create Date: 2026-10-18
+
+- transcription_tasks.sample_rate / channels / codec (duration already exists
+  and is now filled at upload time)
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_audio_probe'
+down_revision = '002_result_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transcription_tasks', sa.Column('sample_rate', sa.Integer, nullable=True))
+    op.add_column('transcription_tasks', sa.Column('channels', sa.Integer, nullable=True))
+    op.add_column('transcription_tasks', sa.Column('codec', sa.String(32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transcription_tasks', 'codec')
+    op.drop_column('transcription_tasks', 'channels')
+    op.drop_column('transcription_tasks', 'sample_rate')
@@ -0,0 +1,28 @@
+"""Quality presets
+
+Revision ID: 004_presets
+Revises: 003_audio_probe
+Create Date: 2026-10-18
+
+- transcription_tasks.preset: fast / balanced / accurate chosen at upload
+- transcription_tasks.real_time_factor: processing_time / duration
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_presets'
+down_revision = '003_audio_probe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transcription_tasks', sa.Column('preset', sa.String(20), nullable=True))
+    op.add_column('transcription_tasks', sa.Column('real_time_factor', sa.Float, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transcription_tasks', 'real_time_factor')
+    op.drop_column('transcription_tasks', 'preset')
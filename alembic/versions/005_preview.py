@@ -0,0 +1,26 @@
+"""Preview transcription
+
+Revision ID: 005_preview
+Revises: 004_presets
+Create Date: 2026-10-18
+
+- transcription_tasks.preview_text: first PREVIEW_SECONDS transcribed with the
+  preview model, cleared when the full result is saved
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_preview'
+down_revision = '004_presets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transcription_tasks', sa.Column('preview_text', sa.Text, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transcription_tasks', 'preview_text')
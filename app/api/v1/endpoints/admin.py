@@ -1,11 +1,13 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
 from sqlalchemy.orm import Session
 from app import models, auth, crud
 from app.database import get_db
 from app.core.config import settings, logger
-from app.core.services import whisper_service
+from app.core.queue import task_queue
 from app.schemas import RuleCreate, UpdateUserLimitRequest
+from app.services.voiceprints import VoiceprintRegistry
+from app.upload import StreamingUpload
 import os
 import uuid
 
@@ -58,26 +60,92 @@ async def clear_history(db: Session = Depends(get_db), current_user: models.User
 
 @router.post("/admin/regenerate-all")
 async def regenerate_all(db: Session = Depends(get_db), current_user: models.User = Depends(auth.require_admin)):
-    tasks = db.query(models.TranscriptionTask).filter(models.TranscriptionTask.status == "completed").all()
+    # Runs in the worker tier (analysis_tasks queue); can take minutes on a big history
+    count = db.query(models.TranscriptionTask).filter(
+        models.TranscriptionTask.status == "completed",
+        models.TranscriptionTask.result_text.isnot(None)
+    ).count()
     
-    # Fetch active rules for regeneration context
-    active_rules = db.query(models.AnalysisRule).filter(models.AnalysisRule.is_active == True).all()
-    rules = [{'category': r.category, 'keywords': r.keywords} for r in active_rules]
+    job = task_queue.enqueue_analysis("app.core.worker.regenerate_all_analyses")
+    if job is None:
+        raise HTTPException(status_code=503, detail="Fila indisponível. Tente novamente mais tarde.")
     
-    count = 0
-    for t in tasks:
-        if t.result_text:
-            try:
-                # Use new analyzer path
-                anal = whisper_service.analyzer.analyze(t.result_text, rules=rules)
-                t.summary = anal.get("summary")
-                t.topics = anal.get("topics")
-                t.analysis_status = "completed"
-                count += 1
-            except Exception as e:
-                logger.error(f"Failed to regen task {t.task_id}: {e}")
+    return {"count": count, "job_id": job.id, "queued": True}
+
+# --- Result Cache (content-addressed deduplication) ---
+
+@router.post("/admin/task/{task_id}/reprocess")
+async def reprocess_task(task_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.require_admin)):
+    """Force a full reprocess: drops the cached result for this audio and re-enqueues the task"""
+    import json
+    task_store = crud.TaskStore(db)
+    task = task_store.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    if task.status in ["queued", "processing"]:
+        raise HTTPException(status_code=409, detail="Tarefa já está na fila")
+    if not task.file_path or not os.path.exists(task.file_path):
+        raise HTTPException(status_code=400, detail="Arquivo de áudio não disponível para reprocessamento")
+    
+    dropped = task_store.invalidate_cached_result(task.content_hash) if task.content_hash else 0
+    
+    task.status = "queued"
+    task.progress = 0
+    task.started_at = None
+    task.error_message = None
     db.commit()
-    return {"count": count}
+    
+    ops = {}
+    if task.options:
+        try:
+            ops = json.loads(task.options)
+        except json.JSONDecodeError:
+            ops = {}
+    await task_queue.put((task.task_id, task.file_path, ops), duration=task.duration)
+    
+    logger.info(f"Admin {current_user.username} forced reprocess of task {task_id} ({dropped} cache entries dropped)")
+    return {"task_id": task_id, "status": "queued", "cache_entries_dropped": dropped}
+
+@router.delete("/admin/cache")
+async def clear_result_cache(db: Session = Depends(get_db), current_user: models.User = Depends(auth.require_admin)):
+    deleted = crud.TaskStore(db).evict_result_cache(max_entries=0, ttl_days=0)
+    return {"deleted": deleted}
+
+# --- Voiceprints (known agents labelled by name in diarization) ---
+
+def _voiceprints() -> VoiceprintRegistry:
+    return VoiceprintRegistry(settings.VOICEPRINTS_PATH, settings.VOICEPRINT_THRESHOLD)
+
+@router.get("/admin/voiceprints")
+async def list_voiceprints(current_user: models.User = Depends(auth.require_admin)):
+    return {"voiceprints": _voiceprints().entries()}
+
+@router.post("/admin/voiceprints")
+async def enroll_voiceprint(request: Request, current_user: models.User = Depends(auth.require_admin)):
+    """
+    Multipart fields: file (recording of the speaker alone, 10s+ of speech), name.
+    The embeddings are computed by a worker (transcription_short queue); poll the returned job or
+    GET /admin/voiceprints.
+    """
+    upload = await StreamingUpload(request).receive()
+    name = " ".join((upload.fields.get("name") or "").split())
+    if not 1 <= len(name) <= 60:
+        os.remove(upload.file_path)
+        raise HTTPException(400, "Informe o nome da pessoa (até 60 caracteres).")
+    
+    job = task_queue.enqueue_model_job("app.core.worker.enroll_voiceprint", name, upload.file_path)
+    if job is None:
+        os.remove(upload.file_path)
+        raise HTTPException(status_code=503, detail="Fila indisponível. Tente novamente mais tarde.")
+    
+    logger.info(f"Admin {current_user.username} enrolling voiceprint '{name}' (job {job.id})")
+    return {"name": name, "job_id": job.id, "queued": True}
+
+@router.delete("/admin/voiceprints/{name}")
+async def delete_voiceprint(name: str, current_user: models.User = Depends(auth.require_admin)):
+    if not _voiceprints().remove(name):
+        raise HTTPException(404, "Voz não cadastrada.")
+    return {"deleted": name}
 
 # --- Dynamic Analysis Rules (Tier 3) ---
 
@@ -1,43 +1,70 @@
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks, status
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks, Request, status
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
-import shutil
 import uuid
 import magic
 import asyncio
 from datetime import datetime
 import io
 import csv
+import json
 
 from app import models, auth, crud
-# from app.main import whisper_service # Circular import issue. We need a service instance.
-# Solution: Instantiate service in dependency or singleton. 
-# For now, we will import the CLASS and create a global instance in api/deps.py or similar, 
-# BUT main.py already creates it.
-# Let's import the instance from a new file `app.core.services` to avoid main.py circular.
-
 from app.core.config import settings, logger
 from app.database import get_db
 from app.validation import FileValidator
+from app.upload import StreamingUpload
+from app.services.audio import AudioProcessor
+from app.core.presets import PRESETS, DEFAULT_PRESET, enabled_presets
 from app.core.queue import task_queue
+from app.core.partials import partial_segments, format_partial
+from app.core.progress import progress_store
+from app.core.events import extrapolate_eta
 
-# Note: We need the whisper_service instance. 
-# I will initialize it in `app.core.services` in the next step.
-from app.core.services import whisper_service
+# API process only needs the analysis facade. The Whisper model lives in the worker tier.
+from app.core.services import analysis_service
 
 router = APIRouter()
 
+def _form_bool(value, default: bool) -> bool:
+    """Parses a multipart form boolean ('true', 'false', '1', 'on'...)."""
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+MAX_SPEAKERS = 10
+
+
+def _form_speakers(value):
+    """Optional num_speakers field: None (auto-detect) or 1..MAX_SPEAKERS."""
+    if value is None or value.strip() in ("", "0", "auto"):
+        return None
+    try:
+        num = int(value)
+    except ValueError:
+        num = 0
+    if not 1 <= num <= MAX_SPEAKERS:
+        raise HTTPException(400, f"Número de pessoas inválido (1 a {MAX_SPEAKERS}, ou vazio para detectar).")
+    return num
+
 @router.post("/upload")
 async def upload_audio(
+    request: Request,
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
-    timestamp: bool = Form(True),
-    diarization: bool = Form(True)
 ):
+    """
+    Multipart fields: file, timestamp (default true), diarization (default true),
+    preset (fast / balanced / accurate, default balanced),
+    num_speakers (1-10, default DIARIZATION_NUM_SPEAKERS / auto-detect),
+    force (admin only: ignore cached result and reprocess).
+    The body is streamed straight to UPLOAD_DIR (see app.upload).
+    """
     task_store = crud.TaskStore(db)
     
     # Check limits if not admin
@@ -47,21 +74,35 @@ async def upload_audio(
         if limit > 0 and usage >= limit:
              raise HTTPException(status_code=403, detail=f"Limite de transcrições atingido ({usage}/{limit}). Contate o admin.")
 
-    # Validate file (validates extension, MIME type, and file size)
+    # Stream to disk: validates extension, MIME type and size, hashes in the same pass
     try:
-        safe_filename, file_size = await FileValidator.validate_file(file)
+        upload = await StreamingUpload(request).receive()
     except HTTPException as e:
         raise e
     except Exception as e:
         logger.error(f"File validation error: {e}")
         raise HTTPException(400, f"Erro na validação do arquivo: {str(e)}")
+    file_path = upload.file_path
+    content_hash = upload.content_hash
+    timestamp = _form_bool(upload.fields.get("timestamp"), True)
+    diarization = _form_bool(upload.fields.get("diarization"), True)
+    force = _form_bool(upload.fields.get("force"), False)
+    preset = (upload.fields.get("preset") or DEFAULT_PRESET).strip().lower()
+    if preset not in enabled_presets():
+        os.remove(file_path)
+        raise HTTPException(400, f"Preset '{preset}' indisponível. Disponíveis: {', '.join(enabled_presets())}")
+    try:
+        num_speakers = _form_speakers(upload.fields.get("num_speakers"))
+    except HTTPException:
+        os.remove(file_path)
+        raise
 
     # --- Filename Sanitization & Collision Handling ---
     import re
     
     # 1. Cleaning: Remove digits and underscores that look like clutter
     # Strategy: Replace underscores with space, remove digits, strip.
-    raw_name = file.filename
+    raw_name = upload.filename
     # Remove extension for processing
     base, ext = os.path.splitext(raw_name)
     
@@ -105,29 +146,38 @@ async def upload_audio(
                 break
             counter += 1
 
-    # Save file (Disk uses UUID to never collide)
-    task_id = str(uuid.uuid4())
-    unique_filename = f"{task_id}_{safe_filename}" # Still use safe_filename for disk
-
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-    
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-         raise HTTPException(status_code=500, detail=f"Falha ao salvar arquivo: {str(e)}")
+    # Probe headers (duration, sample rate, channels, codec) for scheduling and ETA
+    audio_info = await run_in_threadpool(AudioProcessor.probe, file_path)
 
     # Create task
-    options = {"timestamp": timestamp, "diarization": diarization}
+    options = {"timestamp": timestamp, "diarization": diarization, "preset": preset}
+    if num_speakers:
+        options["num_speakers"] = num_speakers
     task = task_store.create_task(
         filename=final_display_name,
         file_path=file_path,
         owner_id=current_user.id,
-        options=options
+        options=options,
+        content_hash=content_hash,
+        audio_info=audio_info
     )
     
+    # Duplicate upload: complete immediately with the stored result
+    force = force and current_user.is_admin
+    cached = None if force else task_store.find_cached_result(content_hash, options)
+    if cached:
+        task_store.complete_from_cache(task.task_id, cached)
+        # The upload stays: the player streams it and admins can still force a reprocess
+        logger.info(f"Task {task.task_id} served from result cache (source: {cached.source_task_id})")
+        return {
+            "task_id": task.task_id,
+            "message": "Envio realizado com sucesso",
+            "status_url": f"/api/status/{task.task_id}",
+            "cached": True
+        }
+    
     # Enqueue
-    await task_queue.put((task.task_id, file_path, options))
+    await task_queue.put((task.task_id, file_path, options), duration=task.duration)
     
     return {
         "task_id": task.task_id,
@@ -135,6 +185,48 @@ async def upload_audio(
         "status_url": f"/api/status/{task.task_id}"
     }
 
+async def _live_progress(task: models.TranscriptionTask) -> int:
+    """Progress of a running task: the live value from Redis (the DB row is only updated every 10%)."""
+    progress = task.progress if task.progress else 0
+    try:
+        return max(progress, await run_in_threadpool(progress_store.get, task.task_id) or 0)
+    except Exception as e:
+        logger.warning(f"Could not read live progress of task {task.task_id}: {e}")
+        return progress
+
+def _estimate_eta(task: models.TranscriptionTask, task_store: crud.TaskStore, progress: int = None):
+    """
+    Seconds left for a queued/processing task, from the probed duration and the
+    real-time factor of recent tasks. None when it cannot be estimated.
+    progress: live value from Redis (defaults to the coarser DB column).
+    """
+    if task.status not in ("queued", "processing") or not task.duration:
+        return None
+    
+    progress = task.progress if progress is None else progress
+    if task.status == "processing" and task.started_at and progress:
+        # Extrapolate from this task's own pace
+        return extrapolate_eta(task.started_at, progress)
+    
+    rtf = task_store.estimate_rtf()
+    if rtf is None:
+        return None
+    eta = task.duration * rtf
+    if task.status == "processing" and task.started_at:
+        eta -= (datetime.utcnow() - task.started_at).total_seconds()
+    return max(0, round(eta))
+
+@router.get("/presets")
+async def list_presets(current_user: models.User = Depends(auth.get_current_user)):
+    labels = {"fast": "Rápido (rascunho)", "balanced": "Equilibrado", "accurate": "Preciso"}
+    return {
+        "default": DEFAULT_PRESET,
+        "presets": [
+            {"name": name, "label": labels.get(name, name), "model": settings.PRESET_MODELS[name], **PRESETS[name]}
+            for name in enabled_presets()
+        ]
+    }
+
 @router.get("/status/{task_id}")
 async def get_status(task_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
     task_store = crud.TaskStore(db)
@@ -158,14 +250,20 @@ async def get_status(task_id: str, db: Session = Depends(get_db), current_user:
         "created_at": task.created_at,
     }
     
-    # Use actual progress from database instead of fake time-based estimation
     progress = task.progress if task.progress else 0
-    if task.status == "completed":
+    if task.status == "processing":
+        progress = await _live_progress(task)
+    elif task.status == "completed":
         progress = 100
     elif task.status == "queued":
         progress = 0
     
     response["progress"] = progress
+    response["eta_seconds"] = _estimate_eta(task, task_store, progress)
+    
+    # First seconds transcribed by the preview job, until the full result is saved
+    if task.preview_text and task.status != "completed":
+        response["preview"] = task.preview_text
     
     if task.status == "failed":
         response["error"] = task.error_message
@@ -182,8 +280,26 @@ async def get_result(task_id: str, db: Session = Depends(get_db), current_user:
     if task.owner_id != current_user.id and not current_user.is_admin:
          raise HTTPException(status_code=403, detail="Não autorizado")
 
+    if task.status == "processing":
+        # Segments decoded so far (no spell check, analysis or diarized speakers yet)
+        try:
+            segments = await run_in_threadpool(partial_segments.get, task_id)
+        except Exception as e:
+            logger.warning(f"Could not read partial transcript of task {task_id}: {e}")
+            segments = []
+        options = json.loads(task.options) if task.options else {}
+        return {
+            "task_id": task.task_id,
+            "partial": True,
+            "text": format_partial(segments, options.get("timestamp", True)),
+            "segments": segments,
+            "progress": await _live_progress(task),
+            "filename": task.filename
+        }
+
     return {
         "task_id": task.task_id,
+        "partial": False,
         "text": task.result_text,
         "text_corrected": task.result_text_corrected,  # Spell-corrected version
         "language": task.language,
@@ -290,17 +406,33 @@ async def regenerate_analysis(task_id: str, db: Session = Depends(get_db), curre
         raise HTTPException(status_code=400, detail="Tarefa não possui transcrição para analisar")
     
     try:
-        logger.info(f"Regenerating analysis for task {task_id}")
-        analysis = whisper_service.generate_analysis(task.result_text)
-        
-        task.summary = analysis.get("summary")
-        task.topics = analysis.get("topics")
-        db.commit()
+        # Heavy NLP runs in the worker tier; we only wait (non-blocking) for the result
+        job = task_queue.enqueue_analysis("app.core.worker.regenerate_analysis", task_id)
+        if job is None:
+            # Queue unavailable: run through the lightweight facade off the event loop
+            logger.warning(f"Queue unavailable, regenerating analysis for {task_id} in API process")
+            analysis = await run_in_threadpool(
+                analysis_service.generate_analysis, task.result_text, crud.TaskStore(db).get_active_rules()
+            )
+            task.summary = analysis.get("summary")
+            task.topics = analysis.get("topics")
+            db.commit()
+        else:
+            try:
+                analysis = await task_queue.wait_for(job, timeout=120)
+            except TimeoutError:
+                return JSONResponse(status_code=202, content={
+                    "task_id": task_id,
+                    "summary": task.summary,
+                    "topics": task.topics,
+                    "message": "Análise em processamento. Atualize em instantes."
+                })
+            db.refresh(task)
         
         return {
             "task_id": task_id,
-            "summary": task.summary,
-            "topics": task.topics,
+            "summary": analysis.get("summary"),
+            "topics": analysis.get("topics"),
             "message": "Análise regenerada com sucesso"
         }
     except Exception as e:
@@ -1,8 +1,11 @@
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
 import asyncio
 import os
+from app import auth
 from app.core.config import logger
+from app.core.events import event_hub
+from app.database import SessionLocal
 
 router = APIRouter()
 
@@ -40,3 +43,48 @@ async def websocket_logs(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}")
         try: await websocket.close()
         except: pass
+
+
+@router.websocket("/ws/tasks")
+async def websocket_tasks(websocket: WebSocket, token: str = ""):
+    """
+    Status/progress events of the user's tasks (same fields as /api/status),
+    pushed by the worker through Redis pub/sub. Browsers cannot set headers on
+    a WebSocket, so the access token comes as ?token=. Authenticated once.
+    """
+    db = SessionLocal()
+    try:
+        user = await auth.get_current_user(token=token, db=db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    queue = event_hub.subscribe(user.id)
+    
+    async def drain_client():
+        # Detects the disconnect (the client sends nothing)
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+    
+    reader = asyncio.create_task(drain_client())
+    try:
+        while True:
+            event = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({event, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if reader in done:
+                event.cancel()
+                break
+            await websocket.send_text(event.result())
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Task events WebSocket error: {e}")
+    finally:
+        reader.cancel()
+        event_hub.unsubscribe(user.id, queue)
@@ -25,6 +25,9 @@ async def cleanup_old_files():
                 archived_count = task_store.archive_old_tasks(days=30)
                 if archived_count > 0:
                     logger.info(f"Auto-archived {archived_count} tasks older than 30 days")
+                
+                # Result cache: TTL + LRU size bound
+                task_store.evict_result_cache()
             finally:
                 db.close()
             
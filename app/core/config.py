@@ -60,6 +60,58 @@ class Settings:
         self.DEVICE = os.getenv("DEVICE", "cpu")
         self.COMPUTE_TYPE = os.getenv("COMPUTE_TYPE", "int8")
         
+        # Quality presets selectable per upload (workers keep every enabled preset's model loaded)
+        self.PRESETS = [p.strip() for p in os.getenv("PRESETS", "fast,balanced").split(",") if p.strip()]
+        self.PRESET_MODELS = {
+            "fast": os.getenv("PRESET_FAST_MODEL", "base"),
+            "balanced": self.WHISPER_MODEL,
+            "accurate": os.getenv("PRESET_ACCURATE_MODEL", "large-v3"),
+        }
+        
+        # Batched inference (VAD chunks decoded in parallel batches)
+        # auto = only on cuda; true = also on CPU; false = sequential decoding
+        self.WHISPER_BATCHED = os.getenv("WHISPER_BATCHED", "auto").lower()
+        self.WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", 16 if self.DEVICE == "cuda" else 8))
+        self.WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", 0))  # 0 = CTranslate2 default
+        self.WHISPER_NUM_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", 0))  # 0 = 2 with STEREO_SPLIT, else 1
+        
+        # Long audios: cut at pauses, chunks transcribed by a pool of model processes (CPU)
+        self.PARALLEL_PROCESSES = int(os.getenv("PARALLEL_PROCESSES", 0))  # 0 = disabled
+        self.PARALLEL_MIN_SECONDS = float(os.getenv("PARALLEL_MIN_SECONDS", 900))  # Only audios longer than this
+        self.PARALLEL_CHUNK_SECONDS = float(os.getenv("PARALLEL_CHUNK_SECONDS", 300))
+        self.PARALLEL_CPU_THREADS = int(os.getenv("PARALLEL_CPU_THREADS", 0))  # Per process, 0 = cores / processes
+        
+        # Shared inference server (one copy of Whisper + ECAPA for every worker on the host)
+        # Socket path or host:port; empty = each worker loads its own models
+        self.INFERENCE_SERVER = os.getenv("INFERENCE_SERVER", "")
+        self.INFERENCE_SERVER_WORKERS = int(os.getenv("INFERENCE_SERVER_WORKERS", 2))  # Concurrent transcriptions
+        self.INFERENCE_EMBED_BATCH = int(os.getenv("INFERENCE_EMBED_BATCH", 32))
+        # ECAPA crops per forward pass when the worker embeds locally (lower it if the GPU runs out of memory)
+        self.DIARIZATION_BATCH_SIZE = int(os.getenv("DIARIZATION_BATCH_SIZE", 32))
+        # Speaker embeddings cached by audio content + segments (.npz, LRU-bounded); 0 MB = off
+        self.DIARIZATION_CACHE_DIR = os.getenv("DIARIZATION_CACHE_DIR", "/home/appuser/.cache/embeddings")
+        self.DIARIZATION_CACHE_MAX_MB = int(os.getenv("DIARIZATION_CACHE_MAX_MB", 512))
+        # Above this many segments, two-stage clustering (Ward per window, then on the window centroids)
+        self.DIARIZATION_DIRECT_MAX_SEGMENTS = int(os.getenv("DIARIZATION_DIRECT_MAX_SEGMENTS", 2000))
+        self.DIARIZATION_WINDOW_SEGMENTS = int(os.getenv("DIARIZATION_WINDOW_SEGMENTS", 500))
+        # Known speaker count (e.g. 2 for agent + customer calls): fixed-k clustering; 0 = auto-detect.
+        # Uploads can override it with the num_speakers field.
+        self.DIARIZATION_NUM_SPEAKERS = int(os.getenv("DIARIZATION_NUM_SPEAKERS", 0))
+        # Don't embed segments in the middle of continuous speech (they take their neighbours' speaker)
+        self.DIARIZATION_SKIP_INNER_TURNS = os.getenv("DIARIZATION_SKIP_INNER_TURNS", "false").lower() in ("1", "true", "yes")
+        # Enrolled agent voices (admin API): matching segments are labelled by name instead of Pessoa N
+        self.VOICEPRINTS_PATH = os.getenv("VOICEPRINTS_PATH", "/app/data/voiceprints.npz")
+        self.VOICEPRINT_THRESHOLD = float(os.getenv("VOICEPRINT_THRESHOLD", 0.6))  # Min cosine similarity
+        
+        # Dual-channel calls: transcribe each channel separately, speaker = channel
+        self.STEREO_SPLIT = os.getenv("STEREO_SPLIT", "true").lower() in ("1", "true", "yes")
+        # Optional names per channel, e.g. "Atendente,Cliente" (default: Pessoa 1 / Pessoa 2)
+        self.STEREO_CHANNEL_LABELS = [l.strip() for l in os.getenv("STEREO_CHANNEL_LABELS", "").split(",") if l.strip()]
+        
+        # Cut silence / hold music longer than N seconds before Whisper and diarization
+        self.SILENCE_COMPACTION = os.getenv("SILENCE_COMPACTION", "true").lower() in ("1", "true", "yes")
+        self.SILENCE_MIN_GAP_S = float(os.getenv("SILENCE_MIN_GAP_S", 2.0))
+        
         self.MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 100))
         self.ALLOWED_EXTENSIONS = os.getenv("ALLOWED_EXTENSIONS", "mp3,wav,m4a,ogg,webm,flac,opus,ptt").split(",")
         
@@ -67,6 +119,11 @@ class Settings:
         self.UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/app/uploads")
         self.CLEANUP_AFTER_HOURS = int(os.getenv("CLEANUP_AFTER_HOURS", 24))
         
+        # Content-addressed result cache (duplicate uploads complete instantly)
+        self.RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 5000))  # LRU eviction
+        self.RESULT_CACHE_TTL_DAYS = int(os.getenv("RESULT_CACHE_TTL_DAYS", 30))  # Unused entries expire
+        
         # Security
         self.SECRET_KEY = os.getenv("SECRET_KEY")
         self.ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:8000").split(",")
@@ -74,10 +131,82 @@ class Settings:
         # Admin
         self.ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
+        # Warm Worker (models loaded once per process, recycled by job count / RSS)
+        # Queue order = priority: analysis jobs, then short audios, then the rest
+        self.WORKER_QUEUES = os.getenv("WORKER_QUEUES", "transcription_preview,analysis_tasks,transcription_clips,transcription_short,transcription_tasks").split(",")
+        self.WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", 500))  # 0 = never recycle
+        self.WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", 0))  # 0 = no RSS limit
+        self.WORKER_WARMUP = os.getenv("WORKER_WARMUP", "true").lower() in ("1", "true", "yes")
+
+        # Scheduling by probed duration (unknown duration -> long queue, 3600s timeout)
+        self.SHORT_AUDIO_SECONDS = float(os.getenv("SHORT_AUDIO_SECONDS", 120))
+        self.JOB_TIMEOUT_MIN_S = int(os.getenv("JOB_TIMEOUT_MIN_S", 600))
+        self.JOB_TIMEOUT_MAX_S = int(os.getenv("JOB_TIMEOUT_MAX_S", 6 * 3600))
+        self.JOB_TIMEOUT_FACTOR = float(os.getenv("JOB_TIMEOUT_FACTOR", 3.0))  # Timeout per second of audio
+        
+        # Micro-batching of short clips (voice notes): one batched inference call for many tasks
+        self.MICROBATCH_SIZE = int(os.getenv("MICROBATCH_SIZE", 8))  # 1 = disabled
+        self.MICROBATCH_MAX_SECONDS = float(os.getenv("MICROBATCH_MAX_SECONDS", 30))  # Max 30 (one Whisper window)
+        self.MICROBATCH_WINDOW_MS = int(os.getenv("MICROBATCH_WINDOW_MS", 200))  # Wait for a burst to fill the batch
+        
+        # Two-tier decoding: draft with a small model, re-decode only low-confidence segments with WHISPER_MODEL
+        self.TWO_TIER = os.getenv("TWO_TIER", "false").lower() in ("1", "true", "yes")
+        self.TWO_TIER_DRAFT_MODEL = os.getenv("TWO_TIER_DRAFT_MODEL", "small")
+        self.TWO_TIER_MIN_LOGPROB = float(os.getenv("TWO_TIER_MIN_LOGPROB", -1.0))  # avg_logprob below -> weak
+        self.TWO_TIER_MAX_NO_SPEECH = float(os.getenv("TWO_TIER_MAX_NO_SPEECH", 0.6))  # no_speech_prob above -> weak
+        
+        # Checkpoint / resume of long transcriptions after a worker restart
+        self.CHECKPOINTS = os.getenv("CHECKPOINTS", "true").lower() in ("1", "true", "yes")
+        self.CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "/app/data/checkpoints")
+        self.CHECKPOINT_MIN_SECONDS = float(os.getenv("CHECKPOINT_MIN_SECONDS", 300))
+        
+        # Preview: first N seconds with a tiny model on the high-priority queue (0 = off)
+        self.PREVIEW_SECONDS = float(os.getenv("PREVIEW_SECONDS", 0))
+        self.PREVIEW_MODEL = os.getenv("PREVIEW_MODEL", "tiny")
+
     def validate(self):
         if self.MAX_FILE_SIZE_MB <= 0:
             raise ValueError("MAX_FILE_SIZE_MB must be positive")
-        
+
+        if self.WORKER_MAX_JOBS < 0 or self.WORKER_MAX_RSS_MB < 0:
+            raise ValueError("WORKER_MAX_JOBS and WORKER_MAX_RSS_MB cannot be negative")
+
+        if self.WHISPER_BATCHED not in ("auto", "true", "false"):
+            raise ValueError("WHISPER_BATCHED must be auto, true or false")
+
+        if self.WHISPER_BATCH_SIZE <= 0 or self.WHISPER_CPU_THREADS < 0 or self.WHISPER_NUM_WORKERS < 0:
+            raise ValueError("WHISPER_BATCH_SIZE must be positive, WHISPER_CPU_THREADS/WHISPER_NUM_WORKERS not negative")
+
+        if self.PARALLEL_PROCESSES < 0 or self.PARALLEL_CPU_THREADS < 0 or self.PARALLEL_CHUNK_SECONDS <= 0:
+            raise ValueError("PARALLEL_PROCESSES/PARALLEL_CPU_THREADS cannot be negative, PARALLEL_CHUNK_SECONDS must be positive")
+
+        if self.INFERENCE_SERVER_WORKERS <= 0 or self.INFERENCE_EMBED_BATCH <= 0:
+            raise ValueError("INFERENCE_SERVER_WORKERS and INFERENCE_EMBED_BATCH must be positive")
+        if self.DIARIZATION_BATCH_SIZE <= 0 or self.DIARIZATION_CACHE_MAX_MB < 0:
+            raise ValueError("DIARIZATION_BATCH_SIZE must be positive, DIARIZATION_CACHE_MAX_MB not negative")
+        if self.DIARIZATION_WINDOW_SEGMENTS < 100 or self.DIARIZATION_DIRECT_MAX_SEGMENTS < self.DIARIZATION_WINDOW_SEGMENTS:
+            raise ValueError("DIARIZATION_WINDOW_SEGMENTS must be >= 100 and not above DIARIZATION_DIRECT_MAX_SEGMENTS")
+        if not 0 <= self.DIARIZATION_NUM_SPEAKERS <= 10:
+            raise ValueError("DIARIZATION_NUM_SPEAKERS must be between 0 (auto) and 10")
+        if not 0 < self.VOICEPRINT_THRESHOLD <= 1:
+            raise ValueError("VOICEPRINT_THRESHOLD must be in (0, 1]")
+
+        if self.MICROBATCH_SIZE < 1 or not 0 < self.MICROBATCH_MAX_SECONDS <= 30 or self.MICROBATCH_WINDOW_MS < 0:
+            raise ValueError("MICROBATCH_SIZE must be >= 1, MICROBATCH_MAX_SECONDS in (0, 30], MICROBATCH_WINDOW_MS >= 0")
+
+        if self.PREVIEW_SECONDS < 0:
+            raise ValueError("PREVIEW_SECONDS cannot be negative")
+
+        if self.TWO_TIER_MIN_LOGPROB > 0 or not 0 < self.TWO_TIER_MAX_NO_SPEECH <= 1:
+            raise ValueError("TWO_TIER_MIN_LOGPROB must be <= 0 and TWO_TIER_MAX_NO_SPEECH in (0, 1]")
+
+        unknown = set(self.PRESETS) - set(self.PRESET_MODELS)
+        if unknown or "balanced" not in self.PRESETS:
+            raise ValueError(f"PRESETS must include 'balanced' and only fast/balanced/accurate (unknown: {', '.join(unknown)})")
+
+        if self.JOB_TIMEOUT_MIN_S <= 0 or self.JOB_TIMEOUT_MAX_S < self.JOB_TIMEOUT_MIN_S:
+            raise ValueError("JOB_TIMEOUT_MIN_S must be positive and not above JOB_TIMEOUT_MAX_S")
+
         if not self.ALLOWED_EXTENSIONS:
             raise ValueError("ALLOWED_EXTENSIONS cannot be empty")
         
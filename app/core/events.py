@@ -0,0 +1,109 @@
+"""
+Task status / progress events over Redis pub/sub.
+
+The worker publishes one small JSON message per task change on the owner's
+channel; each API process holds a single pattern subscription and fans the
+messages out to the WebSockets of that owner (/ws/tasks). Dashboards stop
+polling /api/status, so watching tasks costs no DB queries.
+"""
+import json
+import asyncio
+import logging
+from datetime import datetime
+from app.core.queue import task_queue
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "task_events:{}"
+RECONNECT_S = 2.0
+
+
+def extrapolate_eta(started_at, progress: int):
+    """Seconds left at the task's own pace so far (None before the first progress)."""
+    if not started_at or not progress:
+        return None
+    elapsed = (datetime.utcnow() - started_at).total_seconds()
+    return round(elapsed * (100 - progress) / progress)
+
+
+def task_event(task) -> dict:
+    """Same fields as /api/status (ETA extrapolated from the task's own pace)."""
+    event = {"task_id": task.task_id, "status": task.status, "progress": task.progress or 0}
+    if task.status == "completed":
+        event["progress"] = 100
+    event["eta_seconds"] = extrapolate_eta(task.started_at, task.progress) if task.status == "processing" else None
+    if task.preview_text and task.status != "completed":
+        event["preview"] = task.preview_text
+    if task.status == "failed":
+        event["error"] = task.error_message
+    return event
+
+
+class TaskEventPublisher:
+    """Worker side. Best effort: a Redis hiccup never fails a job."""
+
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+
+    def publish(self, task):
+        if task is not None:
+            self.publish_event(task.owner_id, task_event(task))
+
+    def publish_event(self, owner_id: str, event: dict):
+        if not owner_id:
+            return
+        try:
+            self.redis.publish(CHANNEL.format(owner_id), json.dumps(event))
+        except Exception as e:
+            logger.warning(f"Could not publish event of task {event.get('task_id')}: {e}")
+
+
+class TaskEventHub:
+    """API side: one Redis subscription per process, one asyncio queue per WebSocket."""
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._listeners = {}  # owner_id -> set of asyncio.Queue
+        self._reader = None
+
+    def subscribe(self, owner_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=100)
+        self._listeners.setdefault(owner_id, set()).add(queue)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        return queue
+
+    def unsubscribe(self, owner_id: str, queue: asyncio.Queue):
+        queues = self._listeners.get(owner_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._listeners[owner_id]
+
+    def _dispatch(self, channel: str, data: str):
+        owner_id = channel.split(":", 1)[1]
+        for queue in list(self._listeners.get(owner_id, ())):
+            if queue.full():
+                queue.get_nowait()  # Slow client: drop its oldest event, the next one supersedes it
+            queue.put_nowait(data)
+
+    async def _read(self):
+        from redis import asyncio as aioredis
+
+        while self._listeners:
+            try:
+                client = aioredis.from_url(self.redis_url, decode_responses=True)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL.format("*"))
+                    while self._listeners:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message:
+                            self._dispatch(message["channel"], message["data"])
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Task event subscription lost ({e}). Reconnecting...")
+                await asyncio.sleep(RECONNECT_S)
+
+
+task_events = TaskEventPublisher(task_queue.redis_conn)
+event_hub = TaskEventHub(task_queue.redis_url)
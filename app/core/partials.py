@@ -0,0 +1,56 @@
+
+"""
+Partial transcripts of running tasks.
+
+The worker appends every segment to a Redis list as soon as it is decoded
+(timestamps already on the original recording); /api/result returns them,
+marked partial, until the full result is saved and the list is dropped.
+"""
+import json
+from app.core.queue import task_queue
+
+KEY = "task:{}:segments"
+TTL_S = 6 * 3600  # Leftovers of crashed workers expire on their own
+
+
+class PartialSegments:
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+
+    def append(self, task_id: str, start: float, end: float, text: str, speaker=None):
+        key = KEY.format(task_id)
+        item = {"start": round(start, 2), "end": round(end, 2), "text": text.strip()}
+        if speaker is not None:
+            item["speaker"] = speaker
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, json.dumps(item))
+        pipe.expire(key, TTL_S)
+        pipe.execute()
+
+    def get(self, task_id: str) -> list:
+        """Segments decoded so far, in timeline order (stereo channels arrive interleaved)."""
+        items = [json.loads(raw) for raw in self.redis.lrange(KEY.format(task_id), 0, -1)]
+        return sorted(items, key=lambda s: s["start"])
+
+    def clear(self, task_id: str):
+        self.redis.delete(KEY.format(task_id))
+
+
+def format_partial(segments: list, use_timestamps: bool = True) -> str:
+    """Same line format as the final transcript (speakers only when already known)."""
+    lines = []
+    for seg in segments:
+        parts = []
+        if use_timestamps:
+            parts.append(f"[{int(seg['start'] // 60):02d}:{int(seg['start'] % 60):02d}]")
+        speaker = seg.get("speaker")
+        if isinstance(speaker, str):
+            parts.append(f"[{speaker}]")
+        elif speaker is not None:
+            parts.append(f"[Pessoa {speaker + 1}]")
+        parts.append(seg["text"])
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+partial_segments = PartialSegments(task_queue.redis_conn)
@@ -0,0 +1,46 @@
+
+"""
+Per-upload quality presets.
+
+A preset picks the Whisper model and the decoding options, and turns
+diarization / spell-check on or off. Pure data: imported by the API (form
+validation) as well as by the worker.
+"""
+from app.core.config import settings
+
+DEFAULT_PRESET = "balanced"
+
+PRESETS = {
+    # Quick draft: small model, greedy decoding, no extra passes
+    "fast": {"beam_size": 1, "word_timestamps": False, "diarization": False, "spell_check": False},
+    # Previous fixed behaviour
+    "balanced": {"beam_size": 5, "word_timestamps": True, "diarization": True, "spell_check": True},
+    "accurate": {"beam_size": 8, "word_timestamps": True, "diarization": True, "spell_check": True},
+}
+
+
+def enabled_presets() -> list:
+    return [p for p in settings.PRESETS if p in PRESETS]
+
+
+def preset_name(options: dict = None) -> str:
+    """Preset of a task's options (tasks created before presets = balanced)."""
+    return (options or {}).get("preset") or DEFAULT_PRESET
+
+
+def preset_model(options: dict = None) -> str:
+    return settings.PRESET_MODELS.get(preset_name(options), settings.WHISPER_MODEL)
+
+
+def resolve(options: dict = None) -> dict:
+    """
+    Effective settings for a task: the preset's values, with explicit
+    diarization=False from the upload form still honoured. num_speakers:
+    the upload's, else DIARIZATION_NUM_SPEAKERS, None = auto-detect.
+    """
+    options = options or {}
+    config = dict(PRESETS.get(preset_name(options), PRESETS[DEFAULT_PRESET]))
+    config["model"] = preset_model(options)
+    config["diarization"] = config["diarization"] and options.get("diarization", True)
+    config["num_speakers"] = options.get("num_speakers") or settings.DIARIZATION_NUM_SPEAKERS or None
+    return config
@@ -0,0 +1,89 @@
+"""
+Coalesced progress reporting.
+
+Whisper calls the progress callback once per decoded segment. Live progress
+goes to Redis (and the task event channel) at most once per PUBLISH_INTERVAL_S;
+the DB row is only written at DB_STEP milestones. /api/status reads Redis
+first and falls back to the DB.
+"""
+import time
+import logging
+import threading
+from app.core.queue import task_queue
+from app.core.events import task_events, extrapolate_eta
+
+logger = logging.getLogger(__name__)
+
+KEY = "task:{}:progress"
+TTL_S = 6 * 3600
+PUBLISH_INTERVAL_S = 1.0  # Redis / event updates
+DB_STEP = 10              # Persist to the DB every 10%
+
+
+class ProgressStore:
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+
+    def set(self, task_id: str, progress: int):
+        self.redis.set(KEY.format(task_id), progress, ex=TTL_S)
+
+    def get(self, task_id: str):
+        value = self.redis.get(KEY.format(task_id))
+        return int(value) if value is not None else None
+
+    def clear(self, task_id: str):
+        self.redis.delete(KEY.format(task_id))
+
+
+class ProgressReporter:
+    """
+    Progress callback of one task. Thread-safe: both channels of a stereo call
+    report concurrently.
+    """
+
+    def __init__(self, task_store, task, store=None, publisher=None, clock=time.monotonic):
+        self.task_store = task_store
+        self.task_id = task.task_id
+        self.owner_id = task.owner_id
+        self.started_at = task.started_at
+        self.store = store
+        self.publisher = publisher
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._published = task.progress or 0
+        self._published_at = None
+        self._persisted = task.progress or 0
+
+    def __call__(self, pct: int):
+        with self._lock:
+            if pct <= self._published:
+                return
+            now = self.clock()
+            if self._published_at is not None and now - self._published_at < PUBLISH_INTERVAL_S and pct < 100:
+                return
+            self._published, self._published_at = pct, now
+            self._publish(pct)
+            if pct // DB_STEP > self._persisted // DB_STEP:
+                self._persisted = pct
+                self.task_store.update_progress(self.task_id, pct, notify=False)
+
+    def _publish(self, pct: int):
+        try:
+            if self.store:
+                self.store.set(self.task_id, pct)
+            if self.publisher:
+                self.publisher.publish_event(self.owner_id, {
+                    "task_id": self.task_id,
+                    "status": "processing",
+                    "progress": pct,
+                    "eta_seconds": extrapolate_eta(self.started_at, pct)
+                })
+        except Exception as e:
+            logger.warning(f"Could not publish progress of task {self.task_id}: {e}")
+
+
+progress_store = ProgressStore(task_queue.redis_conn)
+
+
+def reporter_for(task_store, task) -> ProgressReporter:
+    return ProgressReporter(task_store, task, store=progress_store, publisher=task_events)
@@ -1,5 +1,7 @@
 
 import os
+import time
+import asyncio
 import logging
 from redis import Redis
 from rq import Queue
@@ -11,39 +13,178 @@ class TaskQueue:
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.queue = None
+        self.short_queue = None
+        self.clips_queue = None
+        self.analysis_queue = None
+        self.preview_queue = None
         self._init_queue()
 
     def _init_queue(self):
         try:
             self.redis_conn = Redis.from_url(self.redis_url)
             self.queue = Queue("transcription_tasks", connection=self.redis_conn, default_timeout=3600)
+            # Audios shorter than SHORT_AUDIO_SECONDS: listed before the long queue by workers,
+            # so a quick call is never stuck behind an hour-long recording
+            self.short_queue = Queue("transcription_short", connection=self.redis_conn, default_timeout=3600)
+            # Voice notes (<= MICROBATCH_MAX_SECONDS): a worker takes several at once (process_clip)
+            self.clips_queue = Queue("transcription_clips", connection=self.redis_conn, default_timeout=3600)
+            # Short model-free jobs (analysis regeneration). Workers listen to it first.
+            self.analysis_queue = Queue("analysis_tasks", connection=self.redis_conn, default_timeout=600)
+            # First seconds of long uploads with a tiny model (PREVIEW_SECONDS): highest priority
+            self.preview_queue = Queue("transcription_preview", connection=self.redis_conn, default_timeout=300)
             logger.info(f"RQ Queue initialized: {self.redis_url}")
         except Exception as e:
             logger.error(f"Failed to initialize RQ: {e}. Tasks will fail!")
             # In a real enterprise app, we might want to crash or fallback, 
             # but for now we'll just log error as fallback to memory is tricky with RQ pattern change
 
-    async def put(self, item):
+    @staticmethod
+    def job_timeout(duration: float = None) -> int:
+        """RQ timeout scaled to the audio length (fixed 3600s when unknown)."""
+        if not duration:
+            return 3600
+        timeout = int(duration * settings.JOB_TIMEOUT_FACTOR)
+        return max(settings.JOB_TIMEOUT_MIN_S, min(settings.JOB_TIMEOUT_MAX_S, timeout))
+
+    def queue_for(self, duration: float = None):
+        if duration and settings.MICROBATCH_SIZE > 1 and duration <= settings.MICROBATCH_MAX_SECONDS and self.clips_queue:
+            return self.clips_queue
+        if duration and duration <= settings.SHORT_AUDIO_SECONDS and self.short_queue:
+            return self.short_queue
+        return self.queue
+
+    def wants_preview(self, duration: float = None) -> bool:
+        """Previews only pay off for long audios (short ones finish within seconds anyway)."""
+        if not settings.PREVIEW_SECONDS or not self.preview_queue:
+            return False
+        return not duration or duration > settings.SHORT_AUDIO_SECONDS
+
+    def claim_clips(self, limit: int) -> list:
+        """
+        Atomically takes up to `limit` waiting clip jobs off the queue (LREM: a job
+        is claimed by exactly one worker), waiting up to MICROBATCH_WINDOW_MS for
+        a burst to fill the batch. Claimed jobs are marked finished and expire
+        after the claiming job's timeout plus RQ's result TTL (release_clips
+        shortens that once the batch is stored).
+        Returns their (task_id, file_path, options).
+        """
+        from rq import get_current_job
+        from rq.job import Job, JobStatus
+        
+        if not self.clips_queue or limit <= 0:
+            return []
+        current = get_current_job()
+        ttl = self.claim_ttl(current.timeout if current else None)
+        
+        claimed = []
+        deadline = time.monotonic() + settings.MICROBATCH_WINDOW_MS / 1000
+        while True:
+            for job_id in self.clips_queue.get_job_ids(0, limit - len(claimed)):
+                if not self.clips_queue.remove(job_id):
+                    continue  # Another worker got it
+                try:
+                    job = Job.fetch(job_id, connection=self.redis_conn)
+                    claimed.append(tuple(job.args))
+                    if current:
+                        # Startup recovery checks the claiming job's worker, not this one
+                        job.meta["claimed_by"] = current.id
+                        job.save_meta()
+                    job.set_status(JobStatus.FINISHED)
+                    # Outlives the claimer, so recovery can still read claimed_by
+                    job.cleanup(ttl, remove_from_queue=False)
+                except Exception as e:
+                    logger.warning(f"Could not claim clip job {job_id}: {e}")
+            if len(claimed) >= limit or time.monotonic() >= deadline:
+                return claimed
+            time.sleep(0.05)
+
+    @staticmethod
+    def claim_ttl(claimer_timeout: int = None) -> int:
+        """Lifetime of a claimed clip job: its claimer's whole run, then as long as a finished job."""
+        from rq.defaults import DEFAULT_RESULT_TTL
+        return (claimer_timeout or 3600) + DEFAULT_RESULT_TTL
+
+    def release_clips(self, job_ids):
+        """Batch stored: claimed clip jobs are kept only as long as RQ keeps a finished job."""
+        from rq.defaults import DEFAULT_RESULT_TTL
+        from rq.job import Job
+        
+        for job_id in job_ids:
+            try:
+                Job(job_id, connection=self.redis_conn).cleanup(DEFAULT_RESULT_TTL, remove_from_queue=False)
+            except Exception as e:
+                logger.warning(f"Could not expire claimed clip job {job_id}: {e}")
+
+    async def put(self, item, duration: float = None):
         """
         Enqueue a task for the worker.
         Item: (task_id, file_path, options)
+        duration: probed audio length (seconds), picks the queue and the timeout
         """
         task_id, file_path, options = item
         
         if self.queue:
+            # Preview first: an idle worker blocked on dequeue takes whatever lands first,
+            # and a preview queued behind its own full job would only run once that finished
+            if self.wants_preview(duration):
+                self.preview_queue.enqueue("app.core.worker.process_preview", args=(task_id, file_path))
+            
             # We enqueue the function reference string to avoid circular imports here if possible,
             # but RQ usually needs the function. 
             # We imported 'app.core.worker' inside the worker process, but here we specify the path.
-            job = self.queue.enqueue(
-                "app.core.worker.process_transcription",
+            queue = self.queue_for(duration)
+            func = "app.core.worker.process_clip" if queue is self.clips_queue else "app.core.worker.process_transcription"
+            job = queue.enqueue(
+                func,
                 args=(task_id, file_path, options),
                 job_id=task_id, # Use same ID for tracking
+                job_timeout=self.job_timeout(duration),
                 retry=None # Configurable
             )
-            logger.info(f"Task {task_id} enqueued to RQ. Job ID: {job.id}")
+            logger.info(f"Task {task_id} enqueued to RQ ({queue.name}, timeout {job.timeout}s). Job ID: {job.id}")
         else:
             logger.error(f"Queue not initialized! Task {task_id} lost.")
 
+    def enqueue_analysis(self, func: str, *args):
+        """
+        Send analysis work (e.g. 'app.core.worker.regenerate_analysis') to the worker tier.
+        Returns the RQ job, or None if the queue is unavailable.
+        """
+        if not self.analysis_queue:
+            logger.error(f"Queue not initialized! Cannot enqueue {func}.")
+            return None
+        job = self.analysis_queue.enqueue(func, args=args)
+        logger.info(f"{func} enqueued to RQ. Job ID: {job.id}")
+        return job
+
+    def enqueue_model_job(self, func: str, *args):
+        """
+        Send a short job that needs the worker's models (e.g. voiceprint
+        enrollment) to the transcription_short queue, never to analysis_tasks.
+        Returns the RQ job, or None if the queue is unavailable.
+        """
+        if not self.short_queue:
+            logger.error(f"Queue not initialized! Cannot enqueue {func}.")
+            return None
+        job = self.short_queue.enqueue(func, args=args, job_timeout=self.job_timeout(None))
+        logger.info(f"{func} enqueued to RQ ({self.short_queue.name}). Job ID: {job.id}")
+        return job
+
+    async def wait_for(self, job, timeout: float = 60.0, poll_interval: float = 0.5):
+        """
+        Waits for a job without blocking the event loop.
+        Returns the job result, raises TimeoutError / RuntimeError.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = job.get_status(refresh=True)
+            if status == "finished":
+                return job.return_value()
+            if status in ("failed", "stopped", "canceled"):
+                raise RuntimeError(f"Job {job.id} {status}")
+            await asyncio.sleep(poll_interval)
+        raise TimeoutError(f"Job {job.id} not finished after {timeout}s")
+
     # get() and task_done() are no longer needed for RQ as the worker handles pulling
     # We keep them if existing code relies on them, but we should refactor usages.
     # The 'main.py' used to call consume, now it won't.
@@ -0,0 +1,111 @@
+"""
+Startup recovery of unfinished tasks.
+
+Every API process runs it on startup (several uvicorn workers, rolling
+restarts), so it has to be idempotent: one leader at a time (Redis lock), and
+a task is only re-enqueued when no live job exists for it - its RQ job is
+gone, or was started by a worker whose heartbeat has expired.
+"""
+import os
+import json
+import logging
+from rq import Worker
+from rq.job import Job, JobStatus
+from rq.exceptions import NoSuchJobError
+from rq.registry import StartedJobRegistry
+
+from app import models
+from app.core.queue import task_queue
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "recovery:leader"
+LOCK_TTL_S = 300  # Released at the end; expires if the leader dies mid-recovery
+
+
+def live_workers(conn) -> set:
+    """Names of workers whose heartbeat key has not expired."""
+    return {worker.name for worker in Worker.all(connection=conn)}
+
+
+def _fetch(job_id: str, conn):
+    try:
+        return Job.fetch(job_id, connection=conn)
+    except NoSuchJobError:
+        return None
+
+
+def job_alive(job, workers: set, conn) -> bool:
+    """True if the task's job is still waiting, or running on a live worker."""
+    status = job.get_status(refresh=False)
+    if status in (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED):
+        return True
+    if status == JobStatus.STARTED:
+        return job.worker_name in workers
+    claimed_by = job.meta.get("claimed_by")
+    if status == JobStatus.FINISHED and claimed_by:
+        # Clip taken into another job's batch: alive while that job is
+        claimer = _fetch(claimed_by, conn)
+        return claimer is not None and claimer.get_status(refresh=False) == JobStatus.STARTED \
+            and claimer.worker_name in workers
+    return False
+
+
+async def recover_tasks(db) -> dict:
+    """Re-enqueues queued/processing tasks that no live job is working on."""
+    conn = task_queue.redis_conn
+    lock = conn.lock(LOCK_KEY, timeout=LOCK_TTL_S)
+    if not lock.acquire(blocking=False):
+        logger.info("Task recovery already running in another process. Skipping.")
+        return {"recovered": 0, "running": 0, "deleted": 0}
+
+    counts = {"recovered": 0, "running": 0, "deleted": 0}
+    try:
+        workers = live_workers(conn)
+        pending_tasks = db.query(models.TranscriptionTask).filter(
+            models.TranscriptionTask.status.in_(["queued", "processing"])
+        ).all()
+
+        for task in pending_tasks:
+            job = _fetch(task.task_id, conn)
+            if job is not None and job_alive(job, workers, conn):
+                counts["running"] += 1
+                continue
+
+            if not os.path.exists(task.file_path):
+                # File missing, cannot recover
+                logger.warning(f"Task {task.task_id} file missing. Deleting task.")
+                db.delete(task)
+                counts["deleted"] += 1
+                continue
+
+            if job is not None and job.get_status(refresh=False) == JobStatus.STARTED:
+                # Dead worker: drop the stale entry so registry cleanup never fails the new job
+                StartedJobRegistry(job.origin, connection=conn).remove(job.id)
+
+            # Reset status to queued (long tasks resume from their checkpoint)
+            task.status = "queued"
+            task.progress = 0
+            task.started_at = None
+
+            ops = {}
+            if task.options:
+                try:
+                    ops = json.loads(task.options)
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid options JSON for task {task.task_id}, using defaults")
+
+            logger.info(f"Recovering task {task.task_id} with options: {ops}")
+            await task_queue.put((task.task_id, task.file_path, ops), duration=task.duration)
+            counts["recovered"] += 1
+
+        db.commit()
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass  # Expired meanwhile
+
+    logger.info(f"Startup recovery: {counts['recovered']} re-enqueued, {counts['running']} still running, "
+                f"{counts['deleted']} broken tasks cleaned.")
+    return counts
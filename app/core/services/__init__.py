@@ -1,8 +1,27 @@
 # Services module initialization
-# Re-export whisper_service from parent module for backward compatibility
-from app.services.transcription import TranscriptionService
+#
+# IMPORTANT: nothing heavy is imported here. The API process imports this
+# package (analysis facade) and must never load faster_whisper / torch /
+# speechbrain. `whisper_service` is built lazily on first attribute access,
+# which only happens in the worker.
 from app.core.config import settings
 from . import spell_checker
+from .analysis import analysis_service
 
-# Singleton instance (matching app.core.services.py behavior)
-whisper_service = TranscriptionService(settings)
+_whisper_service = None
+
+
+def get_whisper_service():
+    """Singleton TranscriptionService (loads Whisper + diarizer). Worker-side only."""
+    global _whisper_service
+    if _whisper_service is None:
+        from app.services.transcription import TranscriptionService
+        _whisper_service = TranscriptionService(settings)
+    return _whisper_service
+
+
+def __getattr__(name):
+    # Keeps `from app.core.services import whisper_service` working (PEP 562)
+    if name == "whisper_service":
+        return get_whisper_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,26 @@
+"""
+Analysis Facade
+Lightweight entry point to BusinessAnalyzer for the API process.
+Only imports the analyzer (sumy / scikit-learn, lazily) - never faster_whisper,
+torch or speechbrain.
+"""
+
+
+class AnalysisService:
+    def __init__(self):
+        self._analyzer = None
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            from app.services.analysis import BusinessAnalyzer
+            self._analyzer = BusinessAnalyzer()
+        return self._analyzer
+
+    def generate_analysis(self, text: str, rules: list = None) -> dict:
+        """Summary + topics for an existing transcription"""
+        return self.analyzer.analyze(text, rules=rules)
+
+
+# Singleton instance
+analysis_service = AnalysisService()
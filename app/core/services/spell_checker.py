@@ -24,6 +24,18 @@ def get_tool():
     return _tool
 
 
+def warmup():
+    """Start the LanguageTool JVM and run one check so the first task doesn't pay for it"""
+    tool = get_tool()
+    if tool is None:
+        return
+    try:
+        tool.check("Olá, tudo bem?")
+        logger.info("LanguageTool warmed up")
+    except Exception as e:
+        logger.warning(f"LanguageTool warmup failed: {e}")
+
+
 def correct_text(text: str) -> str:
     """
     Apply spell and grammar correction to Portuguese text.
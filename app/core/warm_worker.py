@@ -0,0 +1,167 @@
+
+"""
+Persistent warm worker.
+
+The default `rq worker` forks a fresh work-horse per job, so every task reloads
+Whisper, the ECAPA encoder and the LanguageTool JVM. This entry point loads and
+warms them once, then runs jobs in-process (rq SimpleWorker).
+
+A small supervisor keeps the worker alive: it is restarted after a crash and
+after it recycles itself (WORKER_MAX_JOBS / WORKER_MAX_RSS_MB).
+
+Usage: python -m app.core.warm_worker
+"""
+import os
+import sys
+import signal
+import time
+import threading
+import multiprocessing
+from rq import Queue, SimpleWorker
+
+from app.core.config import settings, logger
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Non-Linux fallback: peak RSS (KB on Linux, bytes on macOS - good enough as a guard)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WarmWorker(SimpleWorker):
+    """
+    SimpleWorker executes jobs in the worker process itself, so the models
+    loaded by preload_models() are reused across jobs.
+    """
+
+    jobs_executed = 0
+    recycle_requested = False  # RSS limit hit: work() returns after this job
+
+    def execute_job(self, job, queue):
+        # The job runs in this thread, so nothing would extend the worker / job heartbeat
+        # (TTL: job_monitoring_interval + 60s) during an hour-long transcription.
+        # Startup recovery relies on it to tell a busy worker from a dead one.
+        stop = threading.Event()
+        beat = threading.Thread(target=self._keep_heartbeat, args=(job, stop), name="heartbeat", daemon=True)
+        beat.start()
+        try:
+            result = super().execute_job(job, queue)
+        finally:
+            stop.set()
+            beat.join()
+            self.jobs_executed += 1
+
+        if settings.WORKER_MAX_RSS_MB:
+            rss = current_rss_mb()
+            if rss > settings.WORKER_MAX_RSS_MB:
+                logger.warning(
+                    f"Worker RSS {rss:.0f}MB above limit {settings.WORKER_MAX_RSS_MB}MB. Recycling after this job."
+                )
+                # Checked by Worker.work() before dequeuing the next job (warm shutdown)
+                self._stop_requested = True
+                self.recycle_requested = True
+        return result
+
+    def _keep_heartbeat(self, job, stop: threading.Event):
+        while not stop.wait(self.job_monitoring_interval):
+            try:
+                self.maintain_heartbeats(job)
+            except Exception as e:
+                logger.warning(f"Heartbeat of job {job.id} failed: {e}")
+
+
+def preload_models():
+    """Loads (and optionally warms) Whisper, ECAPA and LanguageTool in this process."""
+    start = time.perf_counter()
+
+    # Importing the worker module builds the TranscriptionService singleton
+    import app.core.worker  # noqa: F401
+    from app.core.services import whisper_service, spell_checker
+
+    if settings.WORKER_WARMUP:
+        whisper_service.warmup()
+        spell_checker.warmup()
+    else:
+        spell_checker.get_tool()
+
+    logger.info(f"Models preloaded in {time.perf_counter() - start:.1f}s (RSS {current_rss_mb():.0f}MB)")
+
+
+EXIT_STOPPED = 3  # run_worker() returned without a deliberate recycle
+
+
+def run_worker():
+    """Child process: preload models, then consume jobs until recycled or stopped."""
+    from app.core.queue import task_queue
+
+    preload_models()
+
+    conn = task_queue.redis_conn
+    queues = [Queue(name.strip(), connection=conn) for name in settings.WORKER_QUEUES if name.strip()]
+    worker = WarmWorker(queues, connection=conn)
+
+    logger.info(f"Warm worker {worker.name} listening on: {', '.join(q.name for q in queues)}")
+    worker.work(max_jobs=settings.WORKER_MAX_JOBS or None)
+
+    max_jobs_reached = bool(settings.WORKER_MAX_JOBS) and worker.jobs_executed >= settings.WORKER_MAX_JOBS
+    if not (max_jobs_reached or worker.recycle_requested):
+        # work() gave up on its own (lost Redis connection...): the supervisor backs off
+        logger.warning(f"Warm worker {worker.name} stopped without recycling.")
+        sys.exit(EXIT_STOPPED)
+
+
+def main():
+    """
+    Supervisor: (re)spawns the warm worker.
+    Clean exit (code 0) = recycled (WORKER_MAX_JOBS / WORKER_MAX_RSS_MB) -> restart immediately.
+    Anything else (crash, work() returning early) -> restart with exponential backoff,
+    so a Redis outage does not turn into a model-reloading loop.
+    """
+    # spawn: never fork a process that already initialised CUDA / OpenMP
+    ctx = multiprocessing.get_context("spawn")
+    state = {"stopping": False, "proc": None}
+
+    def _shutdown(signum, frame):
+        state["stopping"] = True
+        proc = state["proc"]
+        if proc is not None and proc.is_alive():
+            # rq handles SIGTERM as warm shutdown (finishes the current job)
+            os.kill(proc.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    crashes = 0
+    while not state["stopping"]:
+        proc = ctx.Process(target=run_worker, name="warm-worker")
+        state["proc"] = proc
+        proc.start()
+        proc.join()
+
+        if state["stopping"]:
+            break
+
+        if proc.exitcode == 0:
+            crashes = 0
+            logger.info("Warm worker recycled. Restarting...")
+            continue
+
+        crashes += 1
+        backoff = min(60, 2 ** crashes)
+        if proc.exitcode == EXIT_STOPPED:
+            logger.error(f"Warm worker stopped unexpectedly. Restarting in {backoff}s...")
+        else:
+            logger.error(f"Warm worker died (exit code {proc.exitcode}). Restarting in {backoff}s...")
+        time.sleep(backoff)
+
+    logger.info("Warm worker supervisor stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,183 @@
 
+import os
 import asyncio
 from time import perf_counter
 from app import crud
 from app.database import SessionLocal
-from app.core.config import logger
+from app.core.config import settings, logger
+from app.core import presets
 from app.core.queue import task_queue
+from app.core.partials import partial_segments
+from app.core.events import task_events
+from app.core.progress import reporter_for, progress_store
+from app.services.checkpoint import Checkpoint
 from app.core.services import whisper_service
 from app.core.services import spell_checker
+from app.core.services import analysis_service
+
+def _fetch_rules(task_store):
+    try:
+        return task_store.get_active_rules()
+    except Exception as e:
+        logger.warning(f"Could not fetch analysis rules: {e}")
+        return []
+
+def _checkpoint_for(task):
+    """Long tasks only: short ones are cheaper to redo than to checkpoint."""
+    if not settings.CHECKPOINTS or (task.duration and task.duration < settings.CHECKPOINT_MIN_SECONDS):
+        return None
+    try:
+        return Checkpoint(settings.CHECKPOINT_DIR, task.task_id)
+    except OSError as e:
+        logger.warning(f"Checkpoints disabled for task {task.task_id}: {e}")
+        return None
 
 def process_transcription(task_id: str, file_path: str, options: dict = {}):
     background_db = SessionLocal()
-    task_store = crud.TaskStore(background_db)
+    task_store = crud.TaskStore(background_db, on_change=task_events.publish)
+    checkpoint = None
     
     try:
+        task = task_store.get_task(task_id)
+        if task and task.status == "completed":
+            # Already done (e.g. transcribed in a clip batch, or re-enqueued on recovery)
+            logger.info(f"Task {task_id} already completed. Skipping.")
+            return
+        
         logger.info(f"Starting processing for task {task_id}")
-        task_store.update_status(task_id, "processing")
+        task = task_store.update_status(task_id, "processing")
+        if not task:
+            logger.warning(f"Task {task_id} no longer exists. Skipping.")
+            return
         
         start_ts = perf_counter()
         
-        def update_prog(pct):
-            task_store.update_progress(task_id, pct)
+        # Live progress in Redis, DB row only every 10%
+        progress_store.clear(task_id)
+        update_prog = reporter_for(task_store, task)
+        
+        # Partial transcript, readable through /api/result while processing
+        partial_segments.clear(task_id)  # Leftovers of a previous attempt
+        
+        def publish_segment(seg, speaker=None):
+            try:
+                partial_segments.append(task_id, seg.start, seg.end, seg.text, speaker)
+            except Exception as e:
+                logger.warning(f"Could not publish partial segment of task {task_id}: {e}")
+        
+        # Segments / embeddings saved as they are computed: a recovered job resumes from them
+        checkpoint = _checkpoint_for(task)
         
         # Fetch Rules
-        rules = []
-        try:
-            # We need models here. 
-            # app.core.worker imports crud, but we can do raw query or use crud if we add it.
-            # Raw query for simplicity to avoid circular dep if crud depends on models.
-            from app.models import AnalysisRule
-            active_rules = background_db.query(AnalysisRule).filter(AnalysisRule.is_active == True).all()
-            rules = [{'category': r.category, 'keywords': r.keywords} for r in active_rules]
-        except Exception as e:
-            logger.warning(f"Could not fetch analysis rules: {e}")
+        rules = _fetch_rules(task_store)
 
-        result = whisper_service.process_task(file_path, options=options, progress_callback=update_prog, rules=rules)
+        result = whisper_service.process_task(
+            file_path, options=options, progress_callback=update_prog, rules=rules,
+            segment_callback=publish_segment, checkpoint=checkpoint
+        )
         processing_time = perf_counter() - start_ts
         
-        # Get original text
-        original_text = result.get("text", "")
+        _store_result(task_store, task_id, result, processing_time, options)
+        partial_segments.clear(task_id)
+        progress_store.clear(task_id)
+        if checkpoint:
+            checkpoint.clear()
+
+    except Exception as e:
+        logger.error(f"Task {task_id} failed: {e}")
+        task_store.update_status(task_id, "failed", error_message=str(e))
+        if checkpoint:
+            checkpoint.clear()  # A failure that raised would happen again; only crashes resume
+    finally:
+        background_db.close()
+
+def process_preview(task_id: str, file_path: str):
+    """
+    Quick preview (transcription_preview queue): first PREVIEW_SECONDS with
+    PREVIEW_MODEL, stored on the task while the full job is still waiting/running.
+    """
+    background_db = SessionLocal()
+    task_store = crud.TaskStore(background_db, on_change=task_events.publish)
+    
+    try:
+        task = task_store.get_task(task_id)
+        if not task or task.status in ("completed", "failed"):
+            return
+        
+        start_ts = perf_counter()
+        text = whisper_service.transcribe_preview(file_path, settings.PREVIEW_SECONDS)
+        task_store.save_preview(task_id, text)
+        logger.info(f"Preview of task {task_id} ready in {perf_counter() - start_ts:.1f}s")
+    except Exception as e:
+        # Best effort: the full job is unaffected
+        logger.warning(f"Preview of task {task_id} failed: {e}")
+    finally:
+        background_db.close()
+
+def process_clip(task_id: str, file_path: str, options: dict = {}):
+    """
+    Short clip (transcription_clips queue). Claims up to MICROBATCH_SIZE - 1 more
+    waiting clips and transcribes them all in one batched inference call.
+    Claimed jobs are removed from the queue and marked finished here, and
+    expire once the batch is stored.
+    """
+    background_db = SessionLocal()
+    task_store = crud.TaskStore(background_db, on_change=task_events.publish)
+    
+    pending = [(task_id, file_path, options)]
+    claimed = []
+    try:
+        claimed = task_queue.claim_clips(settings.MICROBATCH_SIZE - 1)
+        batch = pending + claimed
+        
+        pending = []
+        for tid, path, opts in batch:
+            task = task_store.get_task(tid)
+            if task and task.status == "completed":
+                continue
+            task_store.update_status(tid, "processing")
+            pending.append((tid, path, opts))
+        if not pending:
+            return
+        
+        logger.info(f"Transcribing {len(pending)} clips in one batch: {', '.join(t for t, _, _ in pending)}")
+        start_ts = perf_counter()
+        results = whisper_service.process_clips(
+            [(path, opts) for _, path, opts in pending], rules=_fetch_rules(task_store)
+        )
+        # Batch wall time split evenly: keeps the real-time-factor stats meaningful
+        processing_time = (perf_counter() - start_ts) / len(pending)
         
-        # Apply spell correction
-        corrected_text = None
+        for (tid, _, opts), result in zip(pending, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                _store_result(task_store, tid, result, processing_time, opts)
+            except Exception as e:
+                logger.error(f"Task {tid} failed: {e}")
+                task_store.update_status(tid, "failed", error_message=str(e))
+    
+    except Exception as e:
+        logger.error(f"Clip batch of task {task_id} failed: {e}")
+        for tid, _, _ in pending:
+            task_store.update_status(tid, "failed", error_message=str(e))
+    finally:
+        # Job ID == task ID (TaskQueue.put)
+        task_queue.release_clips([tid for tid, _, _ in claimed])
+        background_db.close()
+
+def _store_result(task_store, task_id: str, result: dict, processing_time: float, options: dict = None):
+    """Spell correction, result persistence and result cache (shared by single and batched jobs)."""
+    background_db = task_store.db
+    
+    # Get original text
+    original_text = result.get("text", "")
+    
+    # Apply spell correction (skipped by the "fast" preset)
+    corrected_text = None
+    if not presets.resolve(options)["spell_check"]:
+        logger.info(f"Spell correction disabled by preset for task {task_id}")
+    else:
         try:
             logger.info(f"Applying spell correction for task {task_id}...")
             corrected_text = spell_checker.correct_text(original_text)
@@ -48,33 +185,91 @@ def process_transcription(task_id: str, file_path: str, options: dict = {}):
         except Exception as e:
             logger.warning(f"Spell correction failed for task {task_id}: {e}")
             corrected_text = original_text  # Fallback to original
+    
+    # Save Result
+    task_store.save_result(
+        task_id=task_id,
+        text=original_text,
+        language=result.get("language", "unknown"),
+        duration=result.get("duration", 0.0),
+        processing_time=processing_time,
+        summary=result.get("summary"),
+        topics=result.get("topics")
+    )
+    
+    # Save corrected text separately
+    if corrected_text and corrected_text != original_text:
+        task = task_store.get_task(task_id)
+        if task:
+            task.result_text_corrected = corrected_text
+            background_db.commit()
+            logger.info(f"Saved corrected text for task {task_id}")
+    
+    # Index result by content hash so re-uploads of this audio complete instantly
+    try:
+        task_store.store_cached_result(task_id)
+    except Exception as e:
+        logger.warning(f"Could not cache result for task {task_id}: {e}")
+    
+    logger.info(f"Task {task_id} completed successfully.")
+
+def regenerate_analysis(task_id: str) -> dict:
+    """Re-runs the business analysis of a completed task (analysis_tasks queue)."""
+    background_db = SessionLocal()
+    task_store = crud.TaskStore(background_db)
+    
+    try:
+        task = task_store.get_task(task_id)
+        if not task or not task.result_text:
+            raise ValueError(f"Task {task_id} has no transcription to analyze")
         
-        # Save Result
-        task_store.save_result(
-            task_id=task_id,
-            text=original_text,
-            language=result.get("language", "unknown"),
-            duration=result.get("duration", 0.0),
-            processing_time=processing_time,
-            summary=result.get("summary"),
-            topics=result.get("topics")
-        )
-        
-        # Save corrected text separately
-        if corrected_text and corrected_text != original_text:
-            task = task_store.get_task(task_id)
-            if task:
-                task.result_text_corrected = corrected_text
-                background_db.commit()
-                logger.info(f"Saved corrected text for task {task_id}")
+        logger.info(f"Regenerating analysis for task {task_id}")
+        analysis = analysis_service.generate_analysis(task.result_text, rules=task_store.get_active_rules())
         
-        logger.info(f"Task {task_id} completed successfully.")
+        task.summary = analysis.get("summary")
+        task.topics = analysis.get("topics")
+        background_db.commit()
+        return {"summary": task.summary, "topics": task.topics}
+    finally:
+        background_db.close()
 
-    except Exception as e:
-        logger.error(f"Task {task_id} failed: {e}")
-        task_store.update_status(task_id, "failed", error_message=str(e))
+def regenerate_all_analyses() -> int:
+    """Re-runs the business analysis of every completed task (admin action)."""
+    background_db = SessionLocal()
+    task_store = crud.TaskStore(background_db)
+    
+    try:
+        from app.models import TranscriptionTask
+        tasks = background_db.query(TranscriptionTask).filter(TranscriptionTask.status == "completed").all()
+        rules = task_store.get_active_rules()
+        
+        count = 0
+        for t in tasks:
+            if t.result_text:
+                try:
+                    anal = analysis_service.generate_analysis(t.result_text, rules=rules)
+                    t.summary = anal.get("summary")
+                    t.topics = anal.get("topics")
+                    t.analysis_status = "completed"
+                    count += 1
+                except Exception as e:
+                    logger.error(f"Failed to regen task {t.task_id}: {e}")
+        background_db.commit()
+        logger.info(f"Regenerated analysis for {count} tasks.")
+        return count
     finally:
         background_db.close()
 
+def enroll_voiceprint(name: str, file_path: str) -> dict:
+    """Enrolls a speaker's voiceprint from an admin upload (transcription_short queue: needs the models)."""
+    try:
+        samples = whisper_service.enroll_voiceprint(name, file_path)
+        return {"name": name, "samples": samples}
+    finally:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
 # task_consumer is no longer needed with RQ
 # The process_transcription function is called directly by the RQ worker process
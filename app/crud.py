@@ -4,16 +4,65 @@ from datetime import datetime
 import uuid
 from typing import Optional, List
 import os
-from app.core.config import logger
+from app.core.config import settings, logger
+
+# Options that don't change the transcription result (excluded from the cache key)
+_NON_RESULT_OPTIONS = {"force"}
+
+
+def _speaker_config(options: dict = None) -> str:
+    """Settings that change the speaker labels of a diarized result (enrolling a voice invalidates it)."""
+    from app.core import presets
+    from app.services.voiceprints import registry_version
+    if not presets.resolve(options)["diarization"]:
+        return ""
+    return "|".join([
+        ",".join(settings.STEREO_CHANNEL_LABELS),
+        str(settings.DIARIZATION_NUM_SPEAKERS),
+        registry_version(settings.VOICEPRINTS_PATH)
+    ])
+
+
+def _decoding_config(options: dict = None) -> str:
+    """Two-tier settings, for presets on the default model (TranscriptionService._two_tier)."""
+    from app.core.presets import preset_model
+    if not settings.TWO_TIER or preset_model(options) != settings.WHISPER_MODEL \
+            or settings.TWO_TIER_DRAFT_MODEL == settings.WHISPER_MODEL:
+        return ""
+    return "|".join([
+        settings.TWO_TIER_DRAFT_MODEL,
+        str(settings.TWO_TIER_MIN_LOGPROB),
+        str(settings.TWO_TIER_MAX_NO_SPEECH)
+    ])
+
+
+def result_cache_key(content_hash: str, options: dict = None) -> str:
+    """sha256(content hash | model | result-affecting options | speaker settings | two-tier settings)"""
+    import json
+    import hashlib
+    relevant = {k: v for k, v in (options or {}).items() if k not in _NON_RESULT_OPTIONS}
+    from app.core.presets import preset_model
+    raw = (f"{content_hash}|{preset_model(options)}|{json.dumps(relevant, sort_keys=True)}|"
+           f"{_speaker_config(options)}|{_decoding_config(options)}")
+    return hashlib.sha256(raw.encode()).hexdigest()
 
 
 class TaskStore:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, on_change=None):
         self.db = db
+        # Called with the task after every status/progress/result commit (worker: pub/sub events)
+        self.on_change = on_change
+
+    def _changed(self, task):
+        if task and self.on_change:
+            self.on_change(task)
 
-    def create_task(self, filename: str, file_path: str, owner_id: str, options: dict = None) -> models.TranscriptionTask:
+    def create_task(self, filename: str, file_path: str, owner_id: str, options: dict = None, content_hash: str = None,
+                    audio_info: dict = None) -> models.TranscriptionTask:
+        """audio_info: AudioProcessor.probe() output (duration, sample_rate, channels, codec)"""
         import json
         options_str = json.dumps(options) if options else None
+        audio_info = audio_info or {}
         
         task = models.TranscriptionTask(
             filename=filename,
@@ -21,7 +70,13 @@ class TaskStore:
             owner_id=owner_id,
             status="queued",
             progress=0,
-            options=options_str
+            options=options_str,
+            preset=(options or {}).get("preset"),
+            content_hash=content_hash,
+            duration=audio_info.get("duration"),
+            sample_rate=audio_info.get("sample_rate"),
+            channels=audio_info.get("channels"),
+            codec=audio_info.get("codec")
         )
         self.db.add(task)
         self.db.commit()
@@ -33,12 +88,15 @@ class TaskStore:
             models.TranscriptionTask.task_id == task_id
         ).first()
 
-    def update_progress(self, task_id: str, progress: int):
+    def update_progress(self, task_id: str, progress: int, notify: bool = True):
+        """notify=False: the caller already published the live progress (ProgressReporter)."""
         task = self.get_task(task_id)
         if task:
             task.progress = progress
             self.db.commit()
             self.db.refresh(task)
+            if notify:
+                self._changed(task)
         return task
 
 
@@ -56,6 +114,7 @@ class TaskStore:
                 
             self.db.commit()
             self.db.refresh(task)
+            self._changed(task)
         return task
 
     def save_result(self, task_id: str, text: str, language: str, duration: float, processing_time: float, summary: str = None, topics: str = None):
@@ -66,14 +125,44 @@ class TaskStore:
             task.language = language
             task.duration = duration
             task.processing_time = processing_time
+            task.real_time_factor = processing_time / duration if duration and processing_time else None
             task.summary = summary
             task.topics = topics
+            task.preview_text = None  # Superseded by the full transcript
             task.analysis_status = "Pendente de análise" if summary else "Não processado"
             task.completed_at = datetime.utcnow()
             self.db.commit()
             self.db.refresh(task)
+            self._changed(task)
         return task
     
+    def save_preview(self, task_id: str, text: str):
+        """Stores the preview unless the full transcript already finished (it would be stale)."""
+        task = self.get_task(task_id)
+        if task and task.status != "completed":
+            task.preview_text = text
+            self.db.commit()
+            self.db.refresh(task)
+            self._changed(task)
+        return task
+    
+    def estimate_rtf(self, sample: int = 50) -> Optional[float]:
+        """
+        Real-time factor (processing seconds per audio second) of the last
+        completed tasks. None until there is history.
+        """
+        rows = self.db.query(
+            models.TranscriptionTask.processing_time, models.TranscriptionTask.duration
+        ).filter(
+            models.TranscriptionTask.status == "completed",
+            models.TranscriptionTask.processing_time > 0,
+            models.TranscriptionTask.duration > 0
+        ).order_by(models.TranscriptionTask.completed_at.desc()).limit(sample).all()
+        
+        if not rows:
+            return None
+        return sum(p for p, _ in rows) / sum(d for _, d in rows)
+
     def rename_task(self, task_id: str, new_name: str) -> Optional[models.TranscriptionTask]:
         task = self.get_task(task_id)
         if task:
@@ -309,6 +398,109 @@ class TaskStore:
                 
         return stats
 
+    # Result Cache (content-addressed deduplication)
+    def find_cached_result(self, content_hash: str, options: dict = None) -> Optional[models.ResultCache]:
+        if not settings.RESULT_CACHE_ENABLED or not content_hash:
+            return None
+        entry = self.db.query(models.ResultCache).filter(
+            models.ResultCache.cache_key == result_cache_key(content_hash, options)
+        ).first()
+        if entry:
+            entry.hits += 1
+            entry.last_used_at = datetime.utcnow()
+            self.db.commit()
+        return entry
+
+    def complete_from_cache(self, task_id: str, entry: models.ResultCache) -> Optional[models.TranscriptionTask]:
+        """Completes a duplicate task immediately with the cached result"""
+        task = self.save_result(
+            task_id=task_id,
+            text=entry.result_text,
+            language=entry.language,
+            duration=entry.duration,
+            processing_time=0.0,
+            summary=entry.summary,
+            topics=entry.topics
+        )
+        if task:
+            task.result_text_corrected = entry.result_text_corrected
+            self.db.commit()
+        return task
+
+    def store_cached_result(self, task_id: str) -> Optional[models.ResultCache]:
+        """Indexes the result of a completed task by (content hash, model, options)"""
+        import json
+        task = self.get_task(task_id)
+        if not settings.RESULT_CACHE_ENABLED or not task or not task.content_hash or task.status != "completed":
+            return None
+        
+        options = {}
+        if task.options:
+            try:
+                options = json.loads(task.options)
+            except json.JSONDecodeError:
+                pass
+        
+        key = result_cache_key(task.content_hash, options)
+        entry = self.db.query(models.ResultCache).filter(models.ResultCache.cache_key == key).first()
+        if not entry:
+            entry = models.ResultCache(cache_key=key, content_hash=task.content_hash, hits=0)
+            self.db.add(entry)
+        
+        entry.source_task_id = task.task_id
+        entry.result_text = task.result_text
+        entry.result_text_corrected = task.result_text_corrected
+        entry.language = task.language
+        entry.duration = task.duration
+        entry.summary = task.summary
+        entry.topics = task.topics
+        entry.last_used_at = datetime.utcnow()
+        self.db.commit()
+        
+        self.evict_result_cache()
+        return entry
+
+    def invalidate_cached_result(self, content_hash: str) -> int:
+        """Drops every cached result for this audio (all models / options)"""
+        count = self.db.query(models.ResultCache).filter(
+            models.ResultCache.content_hash == content_hash
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return count
+
+    def evict_result_cache(self, max_entries: int = None, ttl_days: int = None) -> int:
+        """TTL on last use + LRU down to max_entries"""
+        from datetime import timedelta
+        max_entries = settings.RESULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        ttl_days = settings.RESULT_CACHE_TTL_DAYS if ttl_days is None else ttl_days
+        
+        evicted = 0
+        if ttl_days > 0:
+            cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+            evicted += self.db.query(models.ResultCache).filter(
+                models.ResultCache.last_used_at < cutoff
+            ).delete(synchronize_session=False)
+        
+        excess = self.db.query(models.ResultCache).count() - max_entries
+        if excess > 0:
+            oldest = self.db.query(models.ResultCache.cache_key).order_by(
+                models.ResultCache.last_used_at.asc()
+            ).limit(excess).all()
+            evicted += self.db.query(models.ResultCache).filter(
+                models.ResultCache.cache_key.in_([k for (k,) in oldest])
+            ).delete(synchronize_session=False)
+        
+        self.db.commit()
+        if evicted:
+            logger.info(f"Result cache: evicted {evicted} entries")
+        return evicted
+
+    # Analysis Rules
+    def get_active_rules(self) -> List[dict]:
+        """Active analysis rules in the format expected by BusinessAnalyzer"""
+        active_rules = self.db.query(models.AnalysisRule).filter(models.AnalysisRule.is_active == True).all()
+        return [{'category': r.category, 'keywords': r.keywords} for r in active_rules]
+
     # Global Configuration
     def get_global_config(self, key: str) -> str:
         config = self.db.query(models.GlobalConfig).filter(models.GlobalConfig.key == key).first()
@@ -14,7 +14,7 @@ import uuid
 # Import Core
 from app.core.config import settings, logger
 from app.core.limiter import limiter
-from app.core.queue import task_queue
+from app.core.recovery import recover_tasks
 
 
 # Import Database
@@ -89,44 +89,12 @@ async def startup_event():
             logger.info("Admin user verified/created.")
             
         # 3. TASK RECOVERY (Reliability Fix)
-        # Instead of deleting, we re-queue pending tasks!
-        pending_tasks = db.query(models.TranscriptionTask).filter(
-            models.TranscriptionTask.status.in_(["queued", "processing"])
-        ).all()
-        
-        recovered_count = 0
-        deleted_count = 0
-        
-        for task in pending_tasks:
-            # Check if file still exists
-            if os.path.exists(task.file_path):
-                # Reset status to queued
-                task.status = "queued"
-                task.progress = 0
-                task.started_at = None
-                
-                # Parse options from JSON stored in database
-                import json
-                ops = {}
-                if task.options:
-                    try:
-                        ops = json.loads(task.options)
-                    except json.JSONDecodeError:
-                        logger.warning(f"Invalid options JSON for task {task.task_id}, using defaults")
-                        ops = {}
-                
-                # Re-queue
-                logger.info(f"Recovering task {task.task_id} with options: {ops}")
-                await task_queue.put((task.task_id, task.file_path, ops))
-                recovered_count += 1
-            else:
-                # File missing, cannot recover
-                logger.warning(f"Task {task.task_id} file missing. Deleting task.")
-                db.delete(task)
-                deleted_count += 1
-                
-        db.commit()
-        logger.info(f"Startup Plan: Recovered {recovered_count} tasks, Cleaned {deleted_count} broken tasks.")
+        # Re-queue unfinished tasks whose worker died. Leader-elected and idempotent:
+        # safe with several API processes and rolling restarts.
+        try:
+            await recover_tasks(db)
+        except Exception as e:
+            logger.error(f"Task recovery failed: {e}")
 
     finally:
         db.close()
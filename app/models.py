@@ -28,6 +28,14 @@ class TranscriptionTask(Base):
     notes = Column(Text, nullable=True)
     owner_id = Column(String, nullable=True, index=True) # ForeignKey to User.id
     is_archived = Column(Boolean, default=False, nullable=False, index=True)  # For auto-cleanup
+    content_hash = Column(String, nullable=True, index=True)  # SHA-256 of uploaded bytes (dedup)
+    # Probed at upload (container headers); duration is refined by the worker
+    sample_rate = Column(Integer, nullable=True)
+    channels = Column(Integer, nullable=True)
+    codec = Column(String, nullable=True)
+    preset = Column(String, nullable=True)  # fast / balanced / accurate (see app/core/presets.py)
+    real_time_factor = Column(Float, nullable=True)  # processing_time / duration
+    preview_text = Column(Text, nullable=True)  # First PREVIEW_SECONDS, cleared when the full result is saved
     
     # Composite indexes
     __table_args__ = (
@@ -48,6 +56,11 @@ class TranscriptionTask(Base):
             "error_message": self.error_message,
             "language": self.language,
             "duration": self.duration,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "codec": self.codec,
+            "preset": self.preset,
+            "real_time_factor": self.real_time_factor,
             "processing_time": self.processing_time,
             "analysis_status": self.analysis_status or "Pendente de análise",
             "summary": self.summary,
@@ -91,3 +104,24 @@ class AnalysisRule(Base):
     keywords = Column(Text, nullable=False) # Comma separated: "cancelar, não quero"
     is_active = Column(Boolean, default=True)
     description = Column(Text, nullable=True)
+
+class ResultCache(Base):
+    """
+    Content-addressed transcription results.
+    Key = sha256(content_hash | model | options): re-uploads of the same call
+    complete immediately by copying the stored result.
+    """
+    __tablename__ = "result_cache"
+
+    cache_key = Column(String, primary_key=True)
+    content_hash = Column(String, nullable=False, index=True)
+    source_task_id = Column(String, nullable=True)
+    result_text = Column(Text, nullable=True)
+    result_text_corrected = Column(Text, nullable=True)
+    language = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)
+    summary = Column(Text, nullable=True)
+    topics = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # LRU eviction
+    hits = Column(Integer, default=0, nullable=False)
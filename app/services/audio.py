@@ -1,43 +1,347 @@
 
 import logging
 import subprocess
-import uuid
-import os
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Whisper and ECAPA both work on 16kHz mono
+SAMPLE_RATE = 16000
+
+# Channel-split detection (dual-channel call-center recordings)
+FRAME_MS = 50
+SILENCE_DB = -45.0      # Frames quieter than this on both channels are ignored
+DOMINANCE_DB = 10.0     # A frame "belongs" to a channel if it is this much louder
+SPLIT_MIN_DOMINATED = 0.6  # Share of active frames that must be dominated by one channel
+SPLIT_MIN_PER_CHANNEL = 0.05  # Each channel must dominate at least this share
+
+# Silence / hold-music compaction
+SPEECH_PAD_MS = 200     # Kept around every speech span (soft joins, no clipped words)
+
+
+class SpeechMap:
+    """
+    Offset map between a compacted (speech-only) buffer and the original timeline.
+    spans: kept (start, end) sample ranges of the original audio, sorted, disjoint.
+    """
+
+    def __init__(self, spans, total_samples: int):
+        self.total_samples = total_samples
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self.orig_starts = spans[:, 0]
+        self.orig_ends = spans[:, 1]
+        lengths = spans[:, 1] - spans[:, 0]
+        # Where each kept span starts in the compacted buffer
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.compact_samples = int(lengths.sum())
+
+    @classmethod
+    def identity(cls, total_samples: int):
+        return cls([(0, total_samples)], total_samples)
+
+    @property
+    def removed_seconds(self) -> float:
+        return (self.total_samples - self.compact_samples) / SAMPLE_RATE
+
+    def to_original(self, seconds, is_end: bool = False):
+        """
+        Maps compacted-timeline seconds back to the original timeline.
+        Ends that fall exactly on a join stay in the span they close.
+        """
+        t = np.asarray(seconds, dtype=np.float64) * SAMPLE_RATE
+        side = "left" if is_end else "right"
+        idx = np.clip(np.searchsorted(self.compact_starts, t, side=side) - 1, 0, len(self.compact_starts) - 1)
+        return (self.orig_starts[idx] + (t - self.compact_starts[idx])) / SAMPLE_RATE
+
+    def compact(self, audio: np.ndarray) -> np.ndarray:
+        if self.compact_samples == self.total_samples:
+            return audio
+        return np.concatenate([audio[a:b] for a, b in zip(self.orig_starts, self.orig_ends)])
+
+    def restore(self, segments, info=None):
+        """Remaps segment and word timestamps (and info.duration) to the original audio."""
+        if self.compact_samples == self.total_samples:
+            return segments, info
+        restored = []
+        for seg in segments:
+            words = getattr(seg, "words", None)
+            if words:
+                starts = self.to_original([w.start for w in words])
+                ends = self.to_original([w.end for w in words], is_end=True)
+                words = [replace_fields(w, start=float(a), end=float(b)) for w, a, b in zip(words, starts, ends)]
+            restored.append(replace_fields(
+                seg,
+                start=float(self.to_original(seg.start)),
+                end=float(self.to_original(seg.end, is_end=True)),
+                words=words
+            ))
+        if info is not None:
+            info = replace_fields(info, duration=self.total_samples / SAMPLE_RATE)
+        return restored, info
+
+
+def shift_segments(segments, offset_s: float):
+    """Moves segment and word timestamps by offset_s (chunk position in the full audio)."""
+    shifted = []
+    for seg in segments:
+        words = getattr(seg, "words", None)
+        if words:
+            words = [replace_fields(w, start=w.start + offset_s, end=w.end + offset_s) for w in words]
+        shifted.append(replace_fields(seg, start=seg.start + offset_s, end=seg.end + offset_s, words=words))
+    return shifted
+
+
+def weak_ranges(segments, min_logprob: float, max_no_speech: float, pad_s: float = 0.2, total_s: float = None):
+    """
+    Low-confidence runs of segments (two-tier decoding): consecutive weak
+    segments are merged into one range so the larger model sees the whole
+    phrase. Returns [(first, last, start_s, end_s)], last exclusive.
+    """
+    ranges = []
+    for i, seg in enumerate(segments):
+        if seg.avg_logprob >= min_logprob and seg.no_speech_prob <= max_no_speech:
+            continue
+        start, end = max(0.0, seg.start - pad_s), seg.end + pad_s
+        if total_s is not None:
+            end = min(end, total_s)
+        if ranges and ranges[-1][1] == i:
+            first, _, prev_start, _ = ranges[-1]
+            ranges[-1] = (first, i + 1, prev_start, end)
+        else:
+            ranges.append((i, i + 1, start, end))
+    return ranges
+
+
+def splice_segments(segments, ranges, replacements):
+    """Replaces each weak range of segments by its re-decoded segments (full-audio timeline)."""
+    spliced, cursor = [], 0
+    for (first, last, _, _), redecoded in zip(ranges, replacements):
+        spliced.extend(segments[cursor:first])
+        spliced.extend(redecoded)
+        cursor = last
+    spliced.extend(segments[cursor:])
+    return spliced
+
+
+def replace_fields(obj, **fields):
+    """faster-whisper results are NamedTuples (<1.0) or dataclasses (>=1.0)."""
+    if hasattr(obj, "_replace"):
+        return obj._replace(**fields)
+    import dataclasses
+    return dataclasses.replace(obj, **fields)
+
+
 class AudioProcessor:
     @staticmethod
-    def enhance_audio(input_path: str) -> str:
+    def probe(input_path: str) -> dict:
         """
-        Enhances audio quality (Optimized for Speed):
-        1. Standardize (FFmpeg) -> 16kHz Mono
-        2. Normalize (FFmpeg loudnorm) - Fast and effective
+        Reads duration, sample rate, channels and codec from the container headers
+        (libsndfile: wav/flac/ogg/mp3), falling back to ffprobe. No decoding.
+        Unknown values are None.
         """
-        # Temp paths
-        final_output = f"{input_path}_opt_{uuid.uuid4().hex[:6]}.wav"
+        meta = {"duration": None, "sample_rate": None, "channels": None, "codec": None}
+        try:
+            import soundfile as sf
+            info = sf.info(input_path)
+            if info.frames > 0 and info.samplerate > 0:
+                meta.update(
+                    duration=info.frames / info.samplerate,
+                    sample_rate=info.samplerate,
+                    channels=info.channels,
+                    codec=info.subtype.lower() if info.subtype else info.format.lower()
+                )
+                return meta
+        except Exception:
+            pass  # Unsupported container (m4a, webm, opus...) or no libsndfile
         
+        try:
+            import json
+            out = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "a:0",
+                 "-show_entries", "stream=codec_name,sample_rate,channels,duration:format=duration",
+                 "-of", "json", input_path],
+                check=True, capture_output=True, text=True, timeout=30
+            ).stdout
+            data = json.loads(out or "{}")
+            stream = (data.get("streams") or [{}])[0]
+            duration = stream.get("duration") or data.get("format", {}).get("duration")
+            meta.update(
+                duration=float(duration) if duration not in (None, "N/A") else None,
+                sample_rate=int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+                channels=stream.get("channels"),
+                codec=stream.get("codec_name")
+            )
+        except Exception as e:
+            logger.warning(f"ffprobe failed for {input_path}: {e}")
+        return meta
+
+    @staticmethod
+    def probe_channels(input_path: str) -> int:
+        """Number of channels of the first audio stream (ffprobe, headers only). 1 on failure."""
+        try:
+            out = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "a:0",
+                 "-show_entries", "stream=channels", "-of", "csv=p=0", input_path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            return int(out.strip() or 1)
+        except Exception as e:
+            logger.warning(f"ffprobe failed for {input_path}: {e}")
+            return 1
+
+    @staticmethod
+    def decode_audio(input_path: str, channels: int = 1, max_seconds: float = None) -> np.ndarray:
+        """
+        Single decode stage (Optimized for Speed):
+        1. Standardize (FFmpeg) -> 16kHz float32 PCM (Mono unless channels=2)
+        2. Normalize (FFmpeg loudnorm) - Fast and effective
+
+        Output is piped straight into memory: no intermediate WAV on the upload
+        volume. The same buffer is handed to faster-whisper and the diarizer.
+        max_seconds: decode only the beginning of the file (previews).
+        Returns shape (samples,) for mono, (channels, samples) otherwise.
+        """
         try:
             logger.info("Starting Optimized Audio Pipeline (FFmpeg only)...")
-            
-            # Single pass FFmpeg: Convert to WAV 16k Mono AND Normalize
+
+            # Single pass FFmpeg: Decode to raw float32 16k AND Normalize
             # -ar 16000: Resample to 16k (Whisper native)
-            # -ac 1: Mono
+            # -ac N: Mono (or keep both call-center channels)
             # -af loudnorm: EBU R128 Loudness Normalization (better than peak)
+            # -f f32le -: Raw little-endian float32 samples on stdout
             command = [
-                "ffmpeg", "-y", "-i", input_path,
-                "-ar", "16000", 
-                "-ac", "1",
-                "-af", "loudnorm=I=-16:TP=-1.5:LRA=11", 
-                final_output
+                "ffmpeg", "-nostdin", "-i", input_path,
+                "-ar", str(SAMPLE_RATE),
+                "-ac", str(channels),
+                "-af", "loudnorm=I=-16:TP=-1.5:LRA=11",
+                "-f", "f32le", "-acodec", "pcm_f32le",
+                "-"
             ]
-            
+            if max_seconds:
+                command[-1:-1] = ["-t", str(max_seconds)]
+
             # Run fast C++ binary
-            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-            logger.info(f"Audio optimization complete: {final_output}")
-            return final_output
+            proc = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            audio = np.frombuffer(proc.stdout, dtype=np.float32)
+            if channels > 1:
+                # Interleaved L R L R ... -> (channels, samples), each channel contiguous
+                audio = np.ascontiguousarray(audio[:len(audio) - len(audio) % channels].reshape(-1, channels).T)
+
+            logger.info(f"Audio decoded: {audio.shape[-1] / SAMPLE_RATE:.1f}s @ {SAMPLE_RATE}Hz, {channels} channel(s)")
+            return audio
 
         except Exception as e:
             logger.error(f"Audio enhancement failed: {e}", exc_info=True)
-            return input_path # Fallback to original
+            # Fallback: plain decode (PyAV, bundled with faster-whisper), no normalization
+            from faster_whisper import decode_audio
+            limit = int(max_seconds * SAMPLE_RATE) if max_seconds else None
+            if channels == 2:
+                return np.stack(decode_audio(input_path, sampling_rate=SAMPLE_RATE, split_stereo=True))[:, :limit]
+            return decode_audio(input_path, sampling_rate=SAMPLE_RATE)[:limit]
+
+    @staticmethod
+    def frame_energy_db(audio: np.ndarray, frame_ms: int = FRAME_MS) -> np.ndarray:
+        """Per-frame energy in dB. audio: (channels, samples) -> (channels, frames)"""
+        frame = SAMPLE_RATE * frame_ms // 1000
+        n = audio.shape[-1] // frame
+        frames = audio[..., :n * frame].reshape(audio.shape[0], n, frame)
+        # einsum avoids materialising frames**2 (hundreds of MB on long calls)
+        power = np.einsum('cnf,cnf->cn', frames, frames) / frame
+        return 10 * np.log10(power + 1e-10)
+
+    @staticmethod
+    def is_channel_split(stereo: np.ndarray) -> bool:
+        """
+        True if each channel carries its own speaker (agent on one side, customer
+        on the other): most active frames are clearly dominated by one channel and
+        both channels dominate a meaningful share. Upmixed mono or a shared
+        microphone recorded in stereo -> False.
+        """
+        if stereo.ndim != 2 or stereo.shape[0] != 2:
+            return False
+        
+        energy = AudioProcessor.frame_energy_db(stereo)
+        active = energy.max(axis=0) > SILENCE_DB
+        if active.sum() < 1000 // FRAME_MS:  # Less than 1s of sound
+            return False
+        
+        diff = energy[0, active] - energy[1, active]
+        left = float(np.mean(diff > DOMINANCE_DB))
+        right = float(np.mean(diff < -DOMINANCE_DB))
+        
+        logger.info(f"Channel dominance: left={left:.2f} right={right:.2f}")
+        return (left + right) >= SPLIT_MIN_DOMINATED and min(left, right) >= SPLIT_MIN_PER_CHANNEL
+
+    @staticmethod
+    def find_speech(audio: np.ndarray) -> list:
+        """
+        Speech spans (start, end) in samples. Uses faster-whisper's Silero VAD,
+        which also rejects hold music; energy threshold if it is unavailable.
+        """
+        try:
+            from faster_whisper.vad import VadOptions, get_speech_timestamps
+            chunks = get_speech_timestamps(audio, VadOptions(speech_pad_ms=0))
+            return [(c["start"], c["end"]) for c in chunks]
+        except ImportError:
+            frame = SAMPLE_RATE * FRAME_MS // 1000
+            active = AudioProcessor.frame_energy_db(audio[None])[0] > SILENCE_DB
+            # Rising/falling edges of the active mask -> spans
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+            return [(a * frame, b * frame) for a, b in edges.reshape(-1, 2)]
+
+    @staticmethod
+    def compact_silence(audio: np.ndarray, min_gap_s: float) -> tuple[np.ndarray, SpeechMap]:
+        """
+        Cuts non-speech gaps longer than min_gap_s (silence, hold music) from a
+        mono buffer. Returns (compacted audio, SpeechMap back to the original).
+        """
+        total = len(audio)
+        spans = AudioProcessor.find_speech(audio)
+        if not spans:
+            # Nothing detected: let Whisper decide on the untouched audio
+            return audio, SpeechMap.identity(total)
+        
+        pad = SAMPLE_RATE * SPEECH_PAD_MS // 1000
+        min_gap = int(min_gap_s * SAMPLE_RATE)
+        kept = []
+        for start, end in spans:
+            start, end = max(0, start - pad), min(total, end + pad)
+            if kept and start - kept[-1][1] < min_gap:
+                kept[-1][1] = max(kept[-1][1], end)  # Short pause: keep it
+            else:
+                kept.append([start, end])
+        
+        speech_map = SpeechMap(kept, total)
+        if speech_map.removed_seconds > 0:
+            logger.info(
+                f"Silence compaction: {total / SAMPLE_RATE:.1f}s -> "
+                f"{speech_map.compact_samples / SAMPLE_RATE:.1f}s ({len(kept)} speech spans)"
+            )
+        return speech_map.compact(audio), speech_map
+
+    @staticmethod
+    def split_at_pauses(audio: np.ndarray, chunk_seconds: float, search_seconds: float = 15.0) -> list:
+        """
+        Cuts a mono buffer into ~chunk_seconds pieces. Each cut is moved to the
+        quietest frame within +/- search_seconds of its target, so no word is split.
+        Returns [(start, end)] in samples, covering the whole buffer.
+        """
+        total = len(audio)
+        chunk = int(chunk_seconds * SAMPLE_RATE)
+        if total <= chunk * 1.5:
+            return [(0, total)]
+        
+        frame = SAMPLE_RATE * FRAME_MS // 1000
+        energy = AudioProcessor.frame_energy_db(audio[None])[0]
+        window = int(search_seconds * 1000 // FRAME_MS)
+        
+        cuts = [0]
+        target = chunk
+        while total - target > chunk // 2:
+            center = target // frame
+            lo, hi = max(cuts[-1] // frame + 1, center - window), min(len(energy), center + window + 1)
+            cut = (lo + int(np.argmin(energy[lo:hi]))) * frame if hi > lo else target
+            cuts.append(cut)
+            target = cut + chunk
+        cuts.append(total)
+        return list(zip(cuts[:-1], cuts[1:]))
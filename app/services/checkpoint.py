@@ -0,0 +1,125 @@
+
+"""
+Checkpoints of long transcriptions.
+
+Decoded segments are appended to a JSON-lines file as they come out of the
+decoder, and ECAPA embeddings are saved block by block, on the data volume
+shared by the workers. A job recovered after a worker restart resumes from
+the end of the last checkpointed segment instead of from the beginning.
+"""
+import os
+import json
+import logging
+from collections import namedtuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Stand-ins for faster-whisper's results (only the fields the pipeline reads)
+Segment = namedtuple("Segment", "start end text words avg_logprob no_speech_prob")
+Word = namedtuple("Word", "start end word probability")
+TranscriptionInfo = namedtuple("TranscriptionInfo", "language duration")
+
+
+class Checkpoint:
+    def __init__(self, directory: str, task_id: str):
+        self.segments_path = os.path.join(directory, f"{task_id}.segments.jsonl")
+        self.embeddings_path = os.path.join(directory, f"{task_id}.embeddings.npz")
+        os.makedirs(directory, exist_ok=True)
+
+    def bind(self, fingerprint: str):
+        """
+        Drops a checkpoint written for other audio or settings (same task
+        re-run with another preset, compaction toggled...).
+        """
+        lines = self._read_lines()
+        if lines and lines[0].get("fingerprint") == fingerprint:
+            # Rewritten so new segments never land after a torn line
+            with open(self.segments_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+            return
+        self.clear()
+        self._append({"fingerprint": fingerprint})
+
+    # --- Segments (compacted / transcription-input timeline) ---
+
+    def load_segments(self):
+        """(segments, info) already decoded; info is None until the decoder finished."""
+        segments, info = [], None
+        for line in self._read_lines()[1:]:
+            if "done" in line:
+                info = TranscriptionInfo(line["language"], line["duration"])
+            else:
+                words = [Word(*w) for w in line["words"]] if line.get("words") else None
+                segments.append(Segment(line["start"], line["end"], line["text"], words,
+                                        line.get("avg_logprob", 0.0), line.get("no_speech_prob", 0.0)))
+        return segments, info
+
+    def append_segment(self, seg):
+        words = getattr(seg, "words", None)
+        self._append({
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "words": [[w.start, w.end, w.word, getattr(w, "probability", 1.0)] for w in words] if words else None,
+            "avg_logprob": getattr(seg, "avg_logprob", 0.0),
+            "no_speech_prob": getattr(seg, "no_speech_prob", 0.0)
+        })
+
+    def mark_done(self, info):
+        self._append({"done": True, "language": info.language, "duration": info.duration})
+
+    # --- Embeddings ---
+
+    def load_embeddings(self, n_segments: int):
+        """
+        (segment indices, embeddings, segments covered) saved so far for this
+        segment list; ([], None, 0) if none.
+        """
+        try:
+            with np.load(self.embeddings_path) as data:
+                if int(data["n_segments"]) == n_segments:
+                    return data["indices"].tolist(), data["embeddings"], int(data["upto"])
+        except (OSError, KeyError, ValueError):
+            pass
+        return [], None, 0
+
+    def save_embeddings(self, indices, embeddings, upto: int, n_segments: int):
+        tmp = self.embeddings_path + ".tmp.npz"
+        np.savez(
+            tmp,
+            indices=np.asarray(indices, dtype=np.int64),
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            upto=upto,
+            n_segments=n_segments
+        )
+        os.replace(tmp, self.embeddings_path)  # Never a half-written checkpoint
+
+    def clear(self):
+        for path in (self.segments_path, self.embeddings_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # --- File helpers ---
+
+    def _append(self, item: dict):
+        with open(self.segments_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def _read_lines(self) -> list:
+        try:
+            with open(self.segments_path, encoding="utf-8") as f:
+                raw = [row for row in f.read().split("\n") if row]  # Not splitlines(): text may hold U+2028...
+        except FileNotFoundError:
+            return []
+        lines = []
+        for row in raw:
+            try:
+                lines.append(json.loads(row))
+            except json.JSONDecodeError:
+                # Worker killed mid-write: the torn last line is ignored
+                logger.warning(f"Ignoring torn checkpoint line in {self.segments_path}")
+                break
+        return lines
@@ -1,27 +1,197 @@
 
 import logging
-import os
-import pickle
-import hashlib
+import numpy as np
+from collections import namedtuple
 from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+EMBED_CHECKPOINT_BLOCK = 64  # Segments embedded between two embedding checkpoints
+DISTANCE_THRESHOLD = 0.8     # Ward cut on unit-norm embeddings (see _compute_diarization)
+OVERCLUSTER_FACTOR = 0.75    # Stage one of cluster_embeddings: tighter cut, more clusters per window
+WINDOW_REDUCTION = 10        # ...but at least 10 segments per stage-one cluster on average
+MIN_WINDOW_CLUSTERS = 8      # Cap floor: never force distinct speakers of a window together
+INNER_TURN_GAP_S = 0.3       # Segments this close on both sides are continuous speech
+
+
+def length_batches(lengths, batch_size: int):
+    """Indices grouped into batches of similar length (less zero padding per forward pass)."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[b:b + batch_size] for b in range(0, len(order), batch_size)]
+
+
+def ward_labels(X, threshold: float = None, n_clusters: int = None):
+    """Ward agglomerative clustering, cut at a distance threshold (auto speaker count) or at n_clusters."""
+    from sklearn.cluster import AgglomerativeClustering
+
+    if len(X) < 2:
+        return np.zeros(len(X), dtype=int)
+    return AgglomerativeClustering(
+        n_clusters=n_clusters,
+        metric='euclidean',
+        linkage='ward',
+        distance_threshold=None if n_clusters else threshold
+    ).fit_predict(X)
+
+
+def cluster_embeddings(X, threshold: float, max_direct: int, window: int):
+    """
+    Labels of unit-norm embeddings. Up to max_direct rows, plain Ward (O(n^2)
+    memory). Above it, two stages: each window of consecutive segments is
+    over-clustered with a tighter threshold (capped at window // WINDOW_REDUCTION
+    clusters), and the window centroids are then clustered the same way
+    (recursively, if there are still too many).
+    """
+    from sklearn.preprocessing import normalize
+
+    if len(X) <= max_direct:
+        return ward_labels(X, threshold)
+
+    local = np.empty(len(X), dtype=int)
+    centroids = []
+    for start in range(0, len(X), window):
+        block = X[start:start + window]
+        block_labels = ward_labels(block, threshold * OVERCLUSTER_FACTOR)
+        cap = max(MIN_WINDOW_CLUSTERS, window // WINDOW_REDUCTION)
+        if block_labels.max() >= cap:
+            block_labels = ward_labels(block, n_clusters=cap)  # Noisy window: keep the reduction going
+        for lbl in np.unique(block_labels):
+            local[start + np.flatnonzero(block_labels == lbl)] = len(centroids)
+            centroids.append(block[block_labels == lbl].mean(axis=0))
+    if len(centroids) >= len(X):
+        return ward_labels(X, threshold)  # Nothing merged, recursion would not shrink
+
+    centroid_labels = cluster_embeddings(normalize(np.array(centroids)), threshold, max_direct, window)
+    return np.asarray(centroid_labels)[local]
+
+
+
+def fixed_k_labels(X, k: int):
+    """Known speaker count: k-means on unit-norm embeddings, then one cosine assignment pass."""
+    from sklearn.cluster import KMeans
+
+    k = min(k, len(X))
+    if k < 2:
+        return np.zeros(len(X), dtype=int)
+    km = KMeans(n_clusters=k, n_init=10, random_state=0).fit(X)
+    return assign_nearest(X, *centroids(X, km.labels_))
+
+
+def centroids(X, labels):
+    """(label values, unit-norm centroid per label) of unit-norm embeddings."""
+    from sklearn.preprocessing import normalize
+
+    values = np.unique(labels)
+    return values, normalize(np.stack([X[labels == v].mean(axis=0) for v in values]))
+
+
+def assign_nearest(E, values, C):
+    """Label of the most cosine-similar centroid for every row of E (one matrix product)."""
+    return values[np.argmax(E @ C.T, axis=1)]
+
+
+def inner_turn_segments(segments, max_gap: float = INNER_TURN_GAP_S) -> set:
+    """
+    Segments with continuous speech on both sides (gaps <= max_gap), every
+    other one so that each keeps embedded neighbours. They are not embedded
+    up front: one whose neighbours end up with the same speaker takes it.
+    """
+    skipped = set()
+    for i in range(1, len(segments) - 1):
+        if i - 1 in skipped:
+            continue
+        if segments[i].start - segments[i - 1].end <= max_gap and segments[i + 1].start - segments[i].end <= max_gap:
+            skipped.add(i)
+    return skipped
+
+_Window = namedtuple("_Window", "start end")
+
+
 class DiarizationService:
-    def __init__(self, device: str = "cpu"):
+    def __init__(self, device: str = "cpu", embedder=None, batch_size: int = 32, cache=None,
+                 max_direct: int = 2000, window: int = 500, skip_inner_turns: bool = False, voiceprints=None):
         self.device = device
         self.embedding_model = None
+        # Optional RemoteEmbedder (shared inference server): no local ECAPA
+        self.embedder = embedder
+        self.batch_size = batch_size  # Crops per ECAPA forward pass
+        self.cache = cache  # Optional EmbeddingCache
+        # Above max_direct segments, two-stage clustering in windows of `window` segments
+        self.max_direct = max_direct
+        self.window = window
+        self.skip_inner_turns = skip_inner_turns
+        self.voiceprints = voiceprints  # Optional VoiceprintRegistry: known speakers labelled by name
+        
+    def load_model(self):
+        """Loads the ECAPA speaker encoder (no-op if already loaded)."""
+        if self.embedding_model:
+            return self.embedding_model
+
+        import torch
+        from speechbrain.inference.speaker import EncoderClassifier
+
+        # Map 'cuda' to 'cuda' and 'cpu' to 'cpu'
+        run_opts = {"device": "cuda"} if self.device == "cuda" and torch.cuda.is_available() else {"device": "cpu"}
+        
+        self.embedding_model = EncoderClassifier.from_hparams(
+            source="speechbrain/spkrec-ecapa-voxceleb", 
+            savedir="/home/appuser/.cache/speechbrain_checkpoints",
+            run_opts=run_opts
+        )
+        return self.embedding_model
+
+    def warmup(self):
+        """Loads the encoder and runs one dummy forward pass (first call pays lazy init costs)."""
+        import torch
+        
+        model = self.load_model()
+        dummy = torch.zeros(1, 16000)
+        if self.device == "cuda" and torch.cuda.is_available():
+            dummy = dummy.cuda()
+        with torch.no_grad():
+            model.encode_batch(dummy)
+        logger.info("Diarization encoder warmed up.")
+
+    def encode_crops(self, crops, batch_size: int = None):
+        """
+        ECAPA embeddings of 1-D float32 crops, zero-padded into batches
+        (wav_lens masks the padding). Crops are batched by length so each batch
+        pads little. Returns (n, emb_dim) numpy array, in the order of `crops`.
+        """
+        import torch
         
-    def diarize(self, audio_path: str, segments) -> List[int]:
+        batch_size = batch_size or self.batch_size
+        model = self.load_model()
+        use_cuda = self.device == "cuda" and torch.cuda.is_available()
+        out = [None] * len(crops)
+        for chunk in length_batches([len(c) for c in crops], batch_size):
+            max_len = max(len(crops[i]) for i in chunk)
+            wavs = torch.zeros(len(chunk), max_len)
+            for j, i in enumerate(chunk):
+                wavs[j, :len(crops[i])] = torch.as_tensor(crops[i])
+            wav_lens = torch.tensor([len(crops[i]) / max_len for i in chunk])
+            if use_cuda:
+                wavs, wav_lens = wavs.cuda(), wav_lens.cuda()
+            with torch.no_grad():
+                embeddings = model.encode_batch(wavs, wav_lens).squeeze(1).cpu().numpy()
+            for i, emb in zip(chunk, embeddings):
+                out[i] = emb
+        return np.stack(out)
+
+    def diarize(self, audio, segments, checkpoint=None, num_speakers: int = None) -> List[int]:
         """
         Performs speaker diarization on the segments.
-        Returns a list of speaker IDs corresponding to each segment.
+        `audio` is the shared decoded buffer (16kHz mono float32 numpy array).
+        checkpoint: embeddings are saved block by block and reused on resume.
+        num_speakers: known speaker count (fixed-k clustering), None = auto-detect.
+        Returns a list of speaker IDs corresponding to each segment (names for
+        enrolled voiceprints).
         """
-        # Lazy Loading
+        # Lazy Loading (torch/speechbrain only needed when embedding locally)
         try:
-            import torch
-            import torchaudio
-            from speechbrain.inference.speaker import EncoderClassifier
+            if self.embedder is None:
+                import torch
+                from speechbrain.inference.speaker import EncoderClassifier
             import numpy as np
             from sklearn.cluster import AgglomerativeClustering
             from sklearn.preprocessing import normalize
@@ -29,103 +199,134 @@ class DiarizationService:
             logger.warning("Diarization dependencies missing.")
             return [0] * len(segments)
 
-        # Cache check using hash
-        cache_path = self._get_cache_path(audio_path, len(segments))
-        if os.path.exists(cache_path):
-             # Basic validity check could go here
-            return self._load_cache(cache_path, len(segments))
+        return self._compute_diarization(audio, segments, checkpoint, num_speakers)
 
-        return self._compute_diarization(audio_path, segments, cache_path)
+    @staticmethod
+    def _crops(audio, segments):
+        """Audio of each segment worth embedding: (crops, segment indices)."""
+        fs = 16000
+        crops, valid_indices = [], []
+        for i, seg in enumerate(segments):
+            start = int(seg.start * fs)
+            end = int(seg.end * fs)
+            # Skip very short segments (<0.2s, noisy embeddings) and out-of-bounds ones
+            if end - start < 3200 or start >= len(audio):
+                continue
+            end = min(end, len(audio))
+            crops.append(audio[start:end])
+            valid_indices.append(i)
+        return crops, valid_indices
 
-    def _get_cache_path(self, audio_path, seg_len):
-        h = hashlib.md5()
-        h.update(f"{audio_path}_{seg_len}".encode()) # Include seg_len in hash to invalidate if segments change
-        hash_id = h.hexdigest()
-        return os.path.join("/home/appuser/.cache/embeddings", f"{hash_id}.pkl")
+    def _embed_remote(self, audio, segments):
+        """Crops the segments here, the inference server encodes them (batched with other workers)."""
+        crops, valid_indices = self._crops(audio, segments)
+        if not crops:
+            return [], []
+        return list(self.embedder.embed([np.ascontiguousarray(c) for c in crops])), valid_indices
 
-    def _load_cache(self, path, expected_len):
-        try:
-            with open(path, 'rb') as f:
-                data = pickle.load(f)
-                labels = data.get('labels')
-                if labels and len(labels) == expected_len:
-                    logger.info("Loaded diarization from cache.")
-                    return labels
-        except (IOError, pickle.UnpicklingError, EOFError, KeyError) as e:
-            logger.debug(f"Cache load failed for {path}: {e}")
-        except Exception as e:
-            logger.warning(f"Unexpected cache error: {e}")
-        return None
+    def _embed_local(self, audio, segments):
+        """Padded batches of DIARIZATION_BATCH_SIZE crops instead of one forward pass per segment."""
+        crops, valid_indices = self._crops(audio, segments)
+        if not crops:
+            return [], []
+        return list(self.encode_crops(crops)), valid_indices
 
-    def _compute_diarization(self, audio_path, segments, cache_path):
-        import torch
-        import torchaudio
-        from speechbrain.inference.speaker import EncoderClassifier
-        import numpy as np
-        from sklearn.cluster import AgglomerativeClustering
+    def _embed(self, audio, segments, checkpoint=None):
+        """(embeddings, valid_indices); with a checkpoint, blocks already embedded are skipped."""
+        embed = self._embed_remote if self.embedder is not None else self._embed_local
+        if checkpoint is None:
+            return embed(audio, segments)
+        
+        valid_indices, saved, upto = checkpoint.load_embeddings(len(segments))
+        embeddings = list(saved) if saved is not None else []
+        if upto:
+            logger.info(f"Resuming embeddings at segment {upto}/{len(segments)} (checkpoint).")
+        for start in range(upto, len(segments), EMBED_CHECKPOINT_BLOCK):
+            block = segments[start:start + EMBED_CHECKPOINT_BLOCK]
+            block_embeddings, block_indices = embed(audio, block)
+            embeddings.extend(block_embeddings)
+            valid_indices.extend(start + i for i in block_indices)
+            checkpoint.save_embeddings(valid_indices, embeddings, start + len(block), len(segments))
+        return embeddings, valid_indices
+
+    def _cached_embed(self, audio, segments, checkpoint=None):
+        """_embed behind the content-addressed embedding cache (clustering is never cached)."""
+        if self.cache is None:
+            return self._embed(audio, segments, checkpoint)
+        key = self.cache.key(audio, segments)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        embeddings, valid_indices = self._embed(audio, segments, checkpoint)
+        self.cache.put(key, embeddings, valid_indices)
+        return embeddings, valid_indices
+
+    def _cluster(self, X_norm, num_speakers=None):
+        """
+        (labels, names). Segments matching an enrolled voiceprint get its
+        registry index; the others are clustered, their labels offset by
+        len(names). names is empty when nothing matched.
+        """
+        known, names = self.voiceprints.match(X_norm) if self.voiceprints is not None else (None, [])
+        if known is None or (known < 0).all():
+            return self._cluster_unknown(X_norm, num_speakers), []
+        
+        rest = known < 0
+        labels = known.copy()
+        logger.info(f"{int((~rest).sum())}/{len(X_norm)} segments matched enrolled voiceprints.")
+        if rest.any():
+            if num_speakers:
+                num_speakers = max(1, num_speakers - len(np.unique(known[~rest])))
+            labels[rest] = len(names) + self._cluster_unknown(X_norm[rest], num_speakers)
+        return labels, names
+
+    def _cluster_unknown(self, X_norm, num_speakers=None):
+        # Long recordings (thousands of segments) go through the two-stage variant
+        if num_speakers:
+            return fixed_k_labels(X_norm, num_speakers)
+        return cluster_embeddings(X_norm, DISTANCE_THRESHOLD, self.max_direct, self.window)
+
+    def embed_voice(self, audio, window_s: float = 3.0):
+        """Embeddings of consecutive windows of an enrollment recording (speech only, compacted)."""
+        windows = [_Window(t, min(t + window_s, len(audio) / 16000))
+                   for t in np.arange(0, len(audio) / 16000, window_s)]
+        embeddings, _ = self._embed(audio, windows)
+        return embeddings
+
+    def _label_skipped(self, audio, segments, skipped, final_labels, X_norm, labels):
+        """
+        Inner-turn segments take their neighbours' speaker when both agree; the
+        rest are embedded now and assigned to the nearest speaker centroid.
+        """
+        from sklearn.preprocessing import normalize
+
+        ambiguous = []
+        for i in sorted(skipped):
+            prev, next_l = final_labels[i - 1], final_labels[i + 1]
+            if prev != -1 and prev == next_l:
+                final_labels[i] = prev
+            else:
+                ambiguous.append(i)
+        logger.info(f"Skipped embedding {len(skipped) - len(ambiguous)}/{len(segments)} inner-turn segments.")
+        if not ambiguous:
+            return
+        embeddings, valid = self._embed(audio, [segments[i] for i in ambiguous])
+        if embeddings:
+            assigned = assign_nearest(normalize(np.array(embeddings)), *centroids(X_norm, np.asarray(labels)))
+            for j, lbl in zip(valid, assigned):
+                final_labels[ambiguous[j]] = int(lbl)
+
+    def _compute_diarization(self, audio, segments, checkpoint=None, num_speakers=None):
         from sklearn.preprocessing import normalize
         
-        logger.info(f"Starting Diarization on {self.device.upper()}...")
+        where = "inference server" if self.embedder else self.device.upper()
+        logger.info(f"Starting Diarization on {where}...")
         
         try:
-            # Init Model
-            if not self.embedding_model:
-                # Map 'cuda' to 'cuda' and 'cpu' to 'cpu'
-                run_opts = {"device": "cuda"} if self.device == "cuda" and torch.cuda.is_available() else {"device": "cpu"}
-                
-                self.embedding_model = EncoderClassifier.from_hparams(
-                    source="speechbrain/spkrec-ecapa-voxceleb", 
-                    savedir="/home/appuser/.cache/speechbrain_checkpoints",
-                    run_opts=run_opts
-                )
-            
-            # Load Audio (Torchaudio is faster and handles resampling)
-            wav, fs = torchaudio.load(audio_path)
-            
-            # Convert to Mono
-            if wav.shape[0] > 1:
-                wav = wav.mean(dim=0, keepdim=True)
-                
-            # Resample if needed (SpeechBrain expects 16k)
-            if fs != 16000:
-                resampler = torchaudio.transforms.Resample(fs, 16000).to(wav.device)
-                wav = resampler(wav)
-                fs = 16000
-
-            # Move to device
-            if self.device == "cuda" and torch.cuda.is_available():
-                wav = wav.cuda()
-                
-            embeddings = []
-            valid_indices = []
-            
-            # Compute Embeddings
-            for i, seg in enumerate(segments):
-                # Convert time to samples
-                start = int(seg.start * fs)
-                end = int(seg.end * fs)
-                
-                # Skip very short segments (<0.2s) helps reducing noise clustering
-                if end - start < 3200: 
-                    continue
-                
-                # Verify bounds
-                if start >= wav.shape[1]: continue
-                end = min(end, wav.shape[1])
-                
-                # Extract crop
-                crop = wav[:, start:end]
-                
-                # Encode
-                # encode_batch expects (batch, time)
-                # Ensure no grad
-                with torch.no_grad():
-                    emb = self.embedding_model.encode_batch(crop)
-                    # Result is (batch, 1, emb_dim) -> squeeze to (emb_dim)
-                    emb = emb.squeeze().cpu().numpy()
-                    
-                embeddings.append(emb)
-                valid_indices.append(i)
+            skipped = inner_turn_segments(segments) if self.skip_inner_turns else set()
+            embedded = [i for i in range(len(segments)) if i not in skipped]
+            embeddings, valid_indices = self._cached_embed(audio, [segments[i] for i in embedded], checkpoint)
+            valid_indices = [embedded[i] for i in valid_indices]
                 
             if len(embeddings) < 2:
                 logger.info("Not enough segments for clustering.")
@@ -146,22 +347,14 @@ class DiarizationService:
             # Threshold 0.8 -> Cosine Sim 0.68  (Reasonable for distinct speakers)
             # Threshold 0.6 -> Cosine Sim 0.82  (Very strict, might split same person)
             
-            clusterer = AgglomerativeClustering(
-                n_clusters=None,
-                metric='euclidean',
-                linkage='ward', 
-                distance_threshold=0.8 # TIGHTENED from 1.5 to 0.8 to force separation
-            )
-            
-            # Alternate approach: If user wants specific count, we could swap params.
-            # But currently we want "Best possible auto".
-            
-            labels = clusterer.fit_predict(X_norm)
+            labels, names = self._cluster(X_norm, num_speakers)
             
             # Map back to original segments
             final_labels = [-1] * len(segments)
             for idx, lbl in zip(valid_indices, labels):
                 final_labels[idx] = int(lbl)
+            if skipped:
+                self._label_skipped(audio, segments, skipped, final_labels, X_norm, labels)
                 
             # 3. Smoothing (Post-Processing)
             # Algorithm: Rolling majority vote or simple neighbor fix
@@ -176,20 +369,19 @@ class DiarizationService:
 
             # Fill -1 (skipped short segments) with nearest neighbor
             # Forward pass
-            last_known = 0
+            last_known = next((l for l in final_labels if l != -1), 0)
             for j in range(len(final_labels)):
                 if final_labels[j] != -1:
                     last_known = final_labels[j]
                 else:
                     final_labels[j] = last_known
             
-            # Cache Result
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            with open(cache_path, 'wb') as f:
-                pickle.dump({'labels': final_labels}, f)
-                
-            num_speakers = len(set(final_labels))
-            logger.info(f"Diarization Complete. Detected {num_speakers} speakers.")
+            if names:
+                # Registry indices -> names, clusters renumbered from Pessoa 1
+                final_labels = [names[l] if l < len(names) else l - len(names) for l in final_labels]
+            
+            detected = len(set(final_labels))
+            logger.info(f"Diarization Complete. Detected {detected} speakers.")
             
             return final_labels
             
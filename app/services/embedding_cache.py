@@ -0,0 +1,79 @@
+"""
+Speaker embedding cache.
+
+ECAPA embeddings are keyed by the audio content and the segment boundaries
+and stored as .npz (no pickle). Clustering always runs on top of them, so a
+re-run of the same audio with another threshold or speaker count skips the
+encoder. The directory is bounded in size: least recently used files go first.
+"""
+import os
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENCODER_ID = "spkrec-ecapa-voxceleb"  # Part of the key: other encoder, other embeddings
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(audio, segments) -> str:
+        h = hashlib.sha256(ENCODER_ID.encode())
+        h.update(np.ascontiguousarray(audio).data)
+        for seg in segments:
+            h.update(f"|{seg.start:.3f}-{seg.end:.3f}".encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str):
+        """(embeddings, segment indices) or None."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                embeddings, indices = data["embeddings"], data["indices"].tolist()
+            os.utime(path)  # Recently used: evicted last
+        except (OSError, KeyError, ValueError):
+            return None
+        logger.info("Loaded speaker embeddings from cache.")
+        return list(embeddings), indices
+
+    def put(self, key: str, embeddings, indices):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(
+                tmp,
+                embeddings=np.asarray(embeddings, dtype=np.float32),
+                indices=np.asarray(indices, dtype=np.int64)
+            )
+            os.replace(tmp, path)  # Readers never see a half-written file
+        except OSError as e:
+            logger.warning(f"Could not cache speaker embeddings: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used files until the directory fits max_bytes."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and ".tmp." not in entry.name:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
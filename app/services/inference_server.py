@@ -0,0 +1,251 @@
+
+"""
+Shared local inference server.
+
+Several worker processes on one host each loading their own Whisper and ECAPA
+models run out of RAM long before the CPUs are busy. With INFERENCE_SERVER set,
+one server process holds a single copy of the weights and the workers become
+thin clients over a UNIX socket (or localhost TCP):
+
+- transcribe: concurrent requests share the CTranslate2 model, which decodes
+  up to INFERENCE_SERVER_WORKERS of them in parallel on the same weights.
+  Requests are not batched together here. Merging audios from different
+  requests into one batch only works for clips of at most 30 s decoded with
+  the same options, and the worker already does that in its clip micro-batch
+  (TranscriptionService._transcribe_clip_batch, one clip_timestamps chunk per
+  clip). Longer audios arrive one per request; batched=True requests use
+  BatchedInferencePipeline over their own VAD chunks.
+- embed: ECAPA crops from every connected worker are gathered for a few
+  milliseconds and encoded together as padded batches.
+
+Usage: python -m app.services.inference_server
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+
+logger = logging.getLogger(__name__)
+
+EMBED_WAIT_S = 0.01  # How long the embedder waits for crops from other workers
+
+
+def parse_address(address: str):
+    """'/run/careca/inference.sock' -> UNIX socket, 'host:port' -> TCP."""
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return (host, int(port)), "AF_INET"
+    return address, "AF_UNIX"
+
+
+class InferenceClient:
+    """One connection per thread (stereo calls transcribe both channels at once)."""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address, self.family = parse_address(address)
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family=self.family, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def call(self, op: str, *args, **kwargs):
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.send((op, args, kwargs))
+                status, value = conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                # Server restarted: reconnect once
+                self._local.conn = None
+                if attempt == 2:
+                    raise ConnectionError(f"Inference server unreachable at {self.address}: {e}")
+                logger.warning(f"Inference server connection lost ({e}). Reconnecting...")
+        if status == "error":
+            raise RuntimeError(f"Inference server: {value}")
+        return value
+
+
+class RemoteWhisperModel:
+    """Stands in for WhisperModel / BatchedInferencePipeline in TranscriptionService."""
+
+    def __init__(self, client: InferenceClient, batched: bool = False, model: str = None):
+        self.client = client
+        self.batched = batched
+        self.model = model  # Whisper model name (quality preset); None = server default
+
+    def transcribe(self, audio, **kwargs):
+        # Segments come back as a list (already decoded), same (segments, info) contract
+        return self.client.call("transcribe", audio, batched=self.batched, model=self.model, **kwargs)
+
+
+class RemoteEmbedder:
+    """ECAPA embeddings computed by the server (see DiarizationService.encode_crops)."""
+
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def embed(self, crops):
+        return self.client.call("embed", crops)
+
+
+class InferenceServer:
+    def __init__(self, settings):
+        from app.services.diarization import DiarizationService
+
+        self.settings = settings
+        self.workers = settings.INFERENCE_SERVER_WORKERS
+        self.models = {}
+        self._batched_models = {}
+        self._models_lock = threading.Lock()  # Guards the dicts only, never held while loading
+        self._load_locks = {}                 # Model name -> lock held while that model loads
+        
+        # Default model plus every enabled quality preset's model (and the two-tier draft model)
+        from app.core.presets import enabled_presets
+        names = [settings.WHISPER_MODEL] + [settings.PRESET_MODELS[p] for p in enabled_presets()]
+        if settings.TWO_TIER:
+            names.append(settings.TWO_TIER_DRAFT_MODEL)
+        for name in dict.fromkeys(names):
+            self.get_model(name)
+        self._slots = threading.Semaphore(self.workers)
+
+        self.diarizer = DiarizationService(device=settings.DEVICE, batch_size=settings.INFERENCE_EMBED_BATCH)
+        self._embed_queue = queue.Queue()
+
+    def get_model(self, name: str = None, batched: bool = False):
+        name = name or self.settings.WHISPER_MODEL
+        with self._models_lock:
+            model = self.models.get(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        if model is None:
+            # Requests for other (loaded) models keep running while this one loads
+            with load_lock:
+                with self._models_lock:
+                    model = self.models.get(name)
+                if model is None:
+                    model = self._load_model(name)
+                    with self._models_lock:
+                        self.models[name] = model
+        if not batched:
+            return model
+        with self._models_lock:
+            if name not in self._batched_models:
+                from faster_whisper import BatchedInferencePipeline
+                self._batched_models[name] = BatchedInferencePipeline(model=model)
+            return self._batched_models[name]
+
+    def _load_model(self, name: str):
+        from faster_whisper import WhisperModel
+        logger.info(f"Inference server loading Whisper: {name} ({self.settings.DEVICE})")
+        return WhisperModel(
+            name,
+            device=self.settings.DEVICE,
+            compute_type=self.settings.COMPUTE_TYPE,
+            download_root=os.environ.get('HF_HOME', '/home/appuser/.cache/huggingface'),
+            cpu_threads=self.settings.WHISPER_CPU_THREADS,
+            num_workers=self.workers
+        )
+
+    # --- Operations (called from connection threads) ---
+
+    def op_transcribe(self, audio, batched: bool = False, model: str = None, **kwargs):
+        with self._slots:
+            model = self.get_model(model, batched=batched)
+            segments, info = model.transcribe(audio, **kwargs)
+            return list(segments), info
+
+    def op_embed(self, crops):
+        future = Future()
+        self._embed_queue.put((crops, future))
+        return future.result()
+
+    OPERATIONS = {"transcribe": op_transcribe, "embed": op_embed}
+
+    # --- Embedding batcher ---
+
+    def _embed_loop(self):
+        batch_size = self.settings.INFERENCE_EMBED_BATCH
+        while True:
+            items = [self._embed_queue.get()]
+            deadline = time.monotonic() + EMBED_WAIT_S
+            while sum(len(crops) for crops, _ in items) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._embed_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            crops = [crop for request, _ in items for crop in request]
+            try:
+                embeddings = self.diarizer.encode_crops(crops, batch_size=batch_size)
+                start = 0
+                for request, future in items:
+                    future.set_result(embeddings[start:start + len(request)])
+                    start += len(request)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+
+    # --- Connections ---
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = ("ok", self.OPERATIONS[op](self, *args, **kwargs))
+                except Exception as e:
+                    logger.error(f"Inference request '{op}' failed: {e}", exc_info=True)
+                    result = ("error", f"{type(e).__name__}: {e}")
+                conn.send(result)
+
+    def serve_forever(self):
+        address, family = parse_address(self.settings.INFERENCE_SERVER)
+        if family == "AF_UNIX":
+            os.makedirs(os.path.dirname(address) or ".", exist_ok=True)
+            if os.path.exists(address):
+                os.remove(address)  # Stale socket from a previous run
+
+        import numpy as np
+        for model in list(self.models.values()):
+            segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), language="pt", beam_size=1)
+            list(segments)
+        self.diarizer.warmup()
+        threading.Thread(target=self._embed_loop, name="embedder", daemon=True).start()
+
+        with Listener(address, family=family, authkey=self.settings.SECRET_KEY.encode()) as listener:
+            logger.info(f"Inference server listening on {self.settings.INFERENCE_SERVER} "
+                        f"({self.workers} concurrent transcriptions)")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    # Failed handshake (wrong authkey, port scan...): keep serving
+                    logger.warning(f"Rejected inference connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+def main():
+    from app.core.config import settings
+
+    if not settings.INFERENCE_SERVER:
+        raise SystemExit("INFERENCE_SERVER is not set (socket path or host:port)")
+    InferenceServer(settings).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+
+"""
+Parallel transcription of long audios.
+
+The buffer is cut at speech pauses into chunks that a pool of processes
+transcribes concurrently. Each process holds its own CTranslate2 model with
+a pinned thread count, so N chunks use N core groups instead of one.
+"""
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from app.services.audio import AudioProcessor, SAMPLE_RATE, shift_segments, replace_fields
+
+logger = logging.getLogger(__name__)
+
+# Model of this pool process (set by _init_process)
+_model = None
+
+
+def _init_process(model_name: str, device: str, compute_type: str, download_root: str, cpu_threads: int):
+    global _model
+    from faster_whisper import WhisperModel
+    _model = WhisperModel(
+        model_name,
+        device=device,
+        compute_type=compute_type,
+        download_root=download_root,
+        cpu_threads=cpu_threads,
+        num_workers=1
+    )
+
+
+def _transcribe_chunk(audio: np.ndarray, transcribe_kwargs: dict):
+    segments, info = _model.transcribe(audio, **transcribe_kwargs)
+    return list(segments), info
+
+
+class ParallelTranscriber:
+    """
+    Pool of model processes, created once and reused by every task of the
+    warm worker. Memory cost: one extra model per process.
+    """
+
+    def __init__(self, model_name: str, device: str, compute_type: str, download_root: str,
+                 processes: int, cpu_threads: int, chunk_seconds: float):
+        self.processes = processes
+        self.chunk_seconds = chunk_seconds
+        self._pool_args = (model_name, device, compute_type, download_root, cpu_threads)
+        self._pool = None
+        self._pool_lock = threading.Lock()  # Both stereo channel threads may start the pool
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: never fork a process that already initialised CTranslate2 / OpenMP
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process,
+                    initargs=self._pool_args
+                )
+                logger.info(f"Parallel transcription pool started ({self.processes} processes, "
+                            f"{self._pool_args[4] or 'default'} threads each).")
+            return self._pool
+
+    def warmup(self):
+        """Starts every pool process (each loads its model) before the first long task."""
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        futures = [self.pool.submit(_transcribe_chunk, silence, {"beam_size": 1}) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def transcribe(self, audio: np.ndarray, transcribe_kwargs: dict, cb=None, on_segment=None):
+        """
+        Same contract as TranscriptionService._transcribe_audio: (segments, info),
+        segments ordered and timestamped on the full buffer. on_segment gets each
+        chunk's segments as the chunk completes (chunks finish out of order).
+        """
+        spans = AudioProcessor.split_at_pauses(audio, self.chunk_seconds)
+        logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s in {len(spans)} chunks "
+                    f"across {self.processes} processes.")
+
+        futures = {
+            self.pool.submit(_transcribe_chunk, audio[start:end], transcribe_kwargs): i
+            for i, (start, end) in enumerate(spans)
+        }
+        results = [None] * len(spans)
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            results[i] = future.result()
+            if on_segment:
+                for seg in shift_segments(results[i][0], spans[i][0] / SAMPLE_RATE):
+                    on_segment(seg)
+            if cb: cb(min(99, int(done / len(spans) * 100)))
+
+        segments = []
+        for (start, _), (chunk_segments, _) in zip(spans, results):
+            segments.extend(shift_segments(chunk_segments, start / SAMPLE_RATE))
+
+        info = replace_fields(results[0][1], duration=len(audio) / SAMPLE_RATE)
+        if cb: cb(100)
+        return segments, info
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -1,76 +1,333 @@
 
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper import WhisperModel, BatchedInferencePipeline
-from app.services.audio import AudioProcessor
+import numpy as np
+from app.services.audio import AudioProcessor, SpeechMap, SAMPLE_RATE, FRAME_MS, DOMINANCE_DB, shift_segments, replace_fields, weak_ranges, splice_segments
 from app.services.diarization import DiarizationService
+from app.services.embedding_cache import EmbeddingCache
+from app.services.voiceprints import VoiceprintRegistry
+from app.services.parallel import ParallelTranscriber
+from app.services.inference_server import InferenceClient, RemoteWhisperModel, RemoteEmbedder
 from app.services.analysis import BusinessAnalyzer
+from app.core import presets
 
 logger = logging.getLogger(__name__)
 
+# Decoding options of the non-batched path (also used by the process pool)
+SEQUENTIAL_OPTIONS = {
+    "beam_size": 5,
+    "language": "pt",
+    "vad_filter": True,
+    "word_timestamps": True,
+}
+
 class TranscriptionService:
     def __init__(self, settings):
         self.settings = settings
-        self.model = None
+        self.model = None           # Default (balanced preset) model
         self.batched_model = None
+        self.models = {}            # Whisper model name -> model, one per enabled preset
+        self.batched_models = {}
+        self._clip_models = {}
+        self._preview_model = None
+        self.parallel = None
+        self.inference_client = None
         self._load_model()
         
         # Sub-services
         self.audio_processor = AudioProcessor()
-        self.diarizer = DiarizationService(device=self.settings.DEVICE)
+        embedder = RemoteEmbedder(self.inference_client) if self.inference_client else None
+        cache_mb = self.settings.DIARIZATION_CACHE_MAX_MB
+        embedding_cache = EmbeddingCache(self.settings.DIARIZATION_CACHE_DIR, cache_mb * 1024 * 1024) if cache_mb else None
+        self.diarizer = DiarizationService(
+            device=self.settings.DEVICE,
+            embedder=embedder,
+            batch_size=self.settings.DIARIZATION_BATCH_SIZE,
+            cache=embedding_cache,
+            max_direct=self.settings.DIARIZATION_DIRECT_MAX_SEGMENTS,
+            window=self.settings.DIARIZATION_WINDOW_SEGMENTS,
+            skip_inner_turns=self.settings.DIARIZATION_SKIP_INNER_TURNS,
+            voiceprints=VoiceprintRegistry(self.settings.VOICEPRINTS_PATH, self.settings.VOICEPRINT_THRESHOLD)
+        )
         self.analyzer = BusinessAnalyzer()
 
     def _load_model(self):
+        if self.settings.INFERENCE_SERVER:
+            # Shared inference server holds the weights; this process only sends audio
+            self.inference_client = InferenceClient(self.settings.INFERENCE_SERVER, self.settings.SECRET_KEY.encode())
+            for name in self._preset_model_names():
+                self.models[name] = RemoteWhisperModel(self.inference_client, model=name)
+                if self.use_batched():
+                    self.batched_models[name] = RemoteWhisperModel(self.inference_client, batched=True, model=name)
+            self.model = self.models[self.settings.WHISPER_MODEL]
+            self.batched_model = self.batched_models.get(self.settings.WHISPER_MODEL)
+            logger.info(f"Using shared inference server at {self.settings.INFERENCE_SERVER}")
+            return
+        
         try:
-            logger.info(f"Loading Whisper: {self.settings.WHISPER_MODEL} ({self.settings.DEVICE})")
             content_root = os.environ.get('HF_HOME', '/home/appuser/.cache/huggingface')
             
-            self.model = WhisperModel(
-                self.settings.WHISPER_MODEL,
-                device=self.settings.DEVICE,
-                compute_type=self.settings.COMPUTE_TYPE,
-                download_root=content_root
-            )
+            # 2 workers so both channels of a stereo call decode concurrently
+            num_workers = self.settings.WHISPER_NUM_WORKERS or (2 if self.settings.STEREO_SPLIT else 1)
             
-            if self.settings.DEVICE == "cuda":
-                try:
-                    self.batched_model = BatchedInferencePipeline(model=self.model)
-                    logger.info("Batched Pipeline enabled.")
-                except:
-                    logger.warning("Batched Pipeline failed. Using standard.")
+            # Every enabled preset's model stays loaded (presets sharing a model share it)
+            for name in self._preset_model_names():
+                self.models[name] = self._whisper_model(name, num_workers)
+                
+                if self.use_batched():
+                    try:
+                        self.batched_models[name] = BatchedInferencePipeline(model=self.models[name])
+                        logger.info(f"Batched Pipeline enabled for {name} (batch_size={self.settings.WHISPER_BATCH_SIZE}).")
+                    except:
+                        logger.warning("Batched Pipeline failed. Using standard.")
+            
+            self.model = self.models[self.settings.WHISPER_MODEL]
+            self.batched_model = self.batched_models.get(self.settings.WHISPER_MODEL)
+            
+            if self.settings.PARALLEL_PROCESSES and self.settings.DEVICE == "cpu":
+                processes = self.settings.PARALLEL_PROCESSES
+                self.parallel = ParallelTranscriber(
+                    self.settings.WHISPER_MODEL,
+                    device=self.settings.DEVICE,
+                    compute_type=self.settings.COMPUTE_TYPE,
+                    download_root=content_root,
+                    processes=processes,
+                    cpu_threads=self.settings.PARALLEL_CPU_THREADS or max(1, (os.cpu_count() or 1) // processes),
+                    chunk_seconds=self.settings.PARALLEL_CHUNK_SECONDS
+                )
         except Exception as e:
             logger.error(f"Model load failed: {e}")
             raise e
 
-    def process_task(self, file_path: str, options: dict = {}, progress_callback=None, rules: list = None):
+    def _whisper_model(self, name: str, num_workers: int = 1):
+        logger.info(f"Loading Whisper: {name} ({self.settings.DEVICE})")
+        return WhisperModel(
+            name,
+            device=self.settings.DEVICE,
+            compute_type=self.settings.COMPUTE_TYPE,
+            download_root=os.environ.get('HF_HOME', '/home/appuser/.cache/huggingface'),
+            cpu_threads=self.settings.WHISPER_CPU_THREADS,
+            num_workers=num_workers
+        )
+
+    def _preset_model_names(self) -> list:
+        """Whisper models of the enabled presets, default model first, no duplicates."""
+        names = [self.settings.WHISPER_MODEL] + [self.settings.PRESET_MODELS[p] for p in presets.enabled_presets()]
+        if self.settings.TWO_TIER:
+            names.append(self.settings.TWO_TIER_DRAFT_MODEL)
+        return list(dict.fromkeys(names))
+
+    def use_batched(self) -> bool:
+        if self.settings.WHISPER_BATCHED == "auto":
+            return self.settings.DEVICE == "cuda"
+        return self.settings.WHISPER_BATCHED == "true"
+
+    def warmup(self):
+        """
+        Runs a dummy pass through every model so the first real task pays no
+        lazy-init cost (CTranslate2 allocations, ECAPA download/load).
+        """
+        import numpy as np
+        
+        silence = np.zeros(16000, dtype=np.float32)
+        for name, model in self.models.items():
+            segments, _ = model.transcribe(silence, language="pt", beam_size=1)
+            list(segments)  # Generator: consume to actually run the decoder
+            logger.info(f"Whisper model {name} warmed up.")
+        
+        if self.parallel:
+            self.parallel.warmup()
+        
+        if self.inference_client:
+            return  # The server warms up its own encoder
+        
+        try:
+            self.diarizer.warmup()
+        except ImportError:
+            logger.warning("Diarization dependencies missing, skipping warmup.")
+
+    def process_task(self, file_path: str, options: dict = {}, progress_callback=None, rules: list = None,
+                     segment_callback=None, checkpoint=None):
         """
         Orchestrates the full pipeline:
-        1. Audio Optimize
+        1. Decode once (16kHz mono float32 buffer, shared by every stage)
+           and cut long silences / hold music (timestamps remapped afterwards)
         2. Transcribe
-        3. Diarize
+        3. Diarize (dual-channel calls: speaker = channel, no ECAPA)
         4. Analyze
+        options['preset'] picks the model and decoding options (app/core/presets.py).
+        segment_callback(segment, speaker=None) receives each segment as soon as it
+        is decoded, on the original timeline (partial transcript).
+        checkpoint (app/services/checkpoint.py): segments and embeddings are saved
+        as they are computed, and a recovered task resumes from them (mono path).
         """
-        # 1. Optimize
-        optimized_path = self.audio_processor.enhance_audio(file_path)
+        preset = presets.resolve(options)
+        use_diarization = preset['diarization']
+        
+        # Fast path: dual-channel call (agent / customer on separate channels)
+        # Speaker = channel, so ECAPA + clustering are skipped entirely.
+        if use_diarization and self.settings.STEREO_SPLIT and self.audio_processor.probe_channels(file_path) == 2:
+            stereo = self.audio_processor.decode_audio(file_path, channels=2)
+            if self.audio_processor.is_channel_split(stereo):
+                logger.info("Dual-channel call detected. Transcribing channels separately.")
+                segments, speaker_labels, info = self._transcribe_channels(stereo, progress_callback, preset, segment_callback)
+                return self._finish(segments, speaker_labels, info, options, rules)
+            # Same speakers on both channels: downmix the buffer we already have
+            audio = stereo.mean(axis=0)
+        else:
+            # 1. Decode + Normalize (in memory)
+            audio = self.audio_processor.decode_audio(file_path)
+        
+        # 1b. Drop long silences / hold music once; both models see the shorter buffer
+        audio, speech_map = self._compact(audio)
         
         # 2. Transcribe
-        segments, info = self._transcribe_audio(optimized_path, progress_callback)
+        on_segment = None
+        if segment_callback:
+            on_segment = lambda seg: segment_callback(speech_map.restore([seg])[0][0])
+        if checkpoint is not None:
+            checkpoint.bind(self.checkpoint_fingerprint(audio, preset))
+        segments, info = self._transcribe_audio(audio, progress_callback, preset, on_segment, checkpoint)
         
         # 3. Diarize (Optional but enabled by default in Logic)
-        use_diarization = options.get('diarization', True)
         speaker_labels = []
         if use_diarization:
-             speaker_labels = self.diarizer.diarize(optimized_path, segments)
+             speaker_labels = self.diarizer.diarize(audio, segments, checkpoint, preset['num_speakers'])
+        
+        # Timestamps back to the original recording
+        segments, info = speech_map.restore(segments, info)
+        
+        return self._finish(segments, speaker_labels, info, options, rules)
+
+    def _compact(self, audio):
+        if not self.settings.SILENCE_COMPACTION:
+            return audio, SpeechMap.identity(len(audio))
+        return self.audio_processor.compact_silence(audio, self.settings.SILENCE_MIN_GAP_S)
+
+    def _transcribe_channel(self, audio, cb, preset=None, on_segment=None):
+        """One channel of a stereo call: compact, transcribe, remap to the original timeline."""
+        audio, speech_map = self._compact(audio)
+        restored_cb = (lambda seg: on_segment(speech_map.restore([seg])[0][0])) if on_segment else None
+        segments, info = self._transcribe_audio(audio, cb, preset, restored_cb)
+        return speech_map.restore(segments, info)
+
+    def process_clips(self, items, rules: list = None):
+        """
+        Short clips (voice notes, <= 30s each) in one batched inference call:
+        the clips are concatenated and each one is a batch chunk (clip_timestamps,
+        no VAD split), so N tasks cost one decoder pass.
+        items: [(file_path, options)]. Returns a result dict or an Exception per item.
+        """
+        results = [None] * len(items)
+        clips = []  # (index, audio)
+        for i, (path, options) in enumerate(items):
+            try:
+                audio = self.audio_processor.decode_audio(path)
+                if len(audio) > 30 * SAMPLE_RATE:
+                    # Longer than one Whisper window (probe was off): regular pipeline
+                    results[i] = self.process_task(path, options=options, rules=rules)
+                elif len(audio) == 0:
+                    raise ValueError("Áudio vazio")
+                else:
+                    clips.append((i, audio))
+            except Exception as e:
+                results[i] = e
         
+        # One batched call per preset present in the batch (usually just one)
+        groups = {}
+        for i, audio in clips:
+            groups.setdefault(presets.preset_name(items[i][1]), []).append((i, audio))
+        
+        for group in groups.values():
+            preset = presets.resolve(items[group[0][0]][1])
+            try:
+                per_clip, info = self._transcribe_clip_batch([a for _, a in group], preset)
+            except Exception as e:
+                for i, _ in group:
+                    results[i] = e
+                continue
+            
+            for (i, audio), clip_segments in zip(group, per_clip):
+                options = items[i][1]
+                try:
+                    clip_info = replace_fields(info, duration=len(audio) / SAMPLE_RATE)
+                    speaker_labels = []
+                    clip_preset = presets.resolve(options)
+                    if clip_preset['diarization']:
+                        speaker_labels = self.diarizer.diarize(audio, clip_segments, num_speakers=clip_preset['num_speakers'])
+                    results[i] = self._finish(clip_segments, speaker_labels, clip_info, options, rules)
+                except Exception as e:
+                    results[i] = e
+        return results
+
+    def _transcribe_clip_batch(self, audios, preset):
+        """Concatenated clips, one clip_timestamps chunk each. Returns per-clip segments (clip timeline), info."""
+        offsets = np.cumsum([0] + [len(a) for a in audios])
+        clip_timestamps = [{"start": a / SAMPLE_RATE, "end": b / SAMPLE_RATE} for a, b in zip(offsets[:-1], offsets[1:])]
+        segments, info = self.clip_model(preset['model']).transcribe(
+            np.concatenate(audios),
+            batch_size=len(audios),
+            language="pt",
+            beam_size=preset['beam_size'],
+            vad_filter=False,
+            clip_timestamps=clip_timestamps,
+            word_timestamps=preset['word_timestamps']
+        )
+        
+        per_clip = [[] for _ in audios]
+        for seg in segments:
+            c = int(np.searchsorted(offsets, seg.start * SAMPLE_RATE + 1, side="left")) - 1
+            per_clip[min(max(c, 0), len(audios) - 1)].append(seg)
+        return [shift_segments(segs, -offsets[c] / SAMPLE_RATE) for c, segs in enumerate(per_clip)], info
+
+    def clip_model(self, name: str):
+        """Batched pipeline for clip batches (also on CPU, where batched_models may be empty)."""
+        if name in self.batched_models:
+            return self.batched_models[name]
+        if name not in self._clip_models:
+            if self.inference_client:
+                self._clip_models[name] = RemoteWhisperModel(self.inference_client, batched=True, model=name)
+            else:
+                self._clip_models[name] = BatchedInferencePipeline(model=self.models[name])
+        return self._clip_models[name]
+
+    def preview_model(self):
+        """PREVIEW_MODEL, loaded on the first preview job (or shared with a preset)."""
+        name = self.settings.PREVIEW_MODEL
+        if name in self.models:
+            return self.models[name]
+        if self._preview_model is None:
+            if self.inference_client:
+                self._preview_model = RemoteWhisperModel(self.inference_client, model=name)
+            else:
+                self._preview_model = self._whisper_model(name)
+        return self._preview_model
+
+    def transcribe_preview(self, file_path: str, seconds: float) -> str:
+        """
+        Triage text of the first `seconds` of the file: greedy decoding, no
+        diarization, analysis or spell check. Timestamps match the full result.
+        """
+        audio = self.audio_processor.decode_audio(file_path, max_seconds=seconds)
+        segments, _ = self.preview_model().transcribe(audio, language="pt", beam_size=1, vad_filter=True)
+        return self._format_output(list(segments), [], use_timestamps=True)
+
+    def enroll_voiceprint(self, name: str, file_path: str) -> int:
+        """Adds `name` to the voiceprint registry from a recording of that speaker alone."""
+        audio = self.audio_processor.decode_audio(file_path)
+        audio, _ = self.audio_processor.compact_silence(audio, self.settings.SILENCE_MIN_GAP_S)
+        return self.diarizer.voiceprints.enroll(name, self.diarizer.embed_voice(audio))
+
+    def _finish(self, segments, speaker_labels, info, options, rules):
+        """Format + Analyze (shared by the mono and the channel-split paths)"""
         # 4. Format
         full_text = self._format_output(segments, speaker_labels, options.get('timestamp', True))
         
         # 5. Analyze
         analysis = self.analyzer.analyze(full_text, rules=rules)
-        
-        # Cleanup
-        if optimized_path != file_path and os.path.exists(optimized_path):
-            os.remove(optimized_path)
             
         return {
             "text": full_text,
@@ -80,17 +337,128 @@ class TranscriptionService:
             "topics": analysis.get("topics")
         }
 
-    def _transcribe_audio(self, path, cb):
-        if self.batched_model:
-            segments, info = self.batched_model.transcribe(path, batch_size=16, word_timestamps=True)
+    def _transcribe_audio(self, audio, cb, preset=None, on_segment=None, checkpoint=None):
+        """
+        on_segment(seg) is called as segments are decoded (two-tier: draft segments).
+        checkpoint: decoded segments are appended to it, and a recovered job resumes
+        after the last one (not on the process-pool path, whose chunks finish out of order).
+        """
+        preset = preset or presets.resolve()
+        two_tier = self._two_tier(preset)
+        name = self.settings.TWO_TIER_DRAFT_MODEL if two_tier else preset['model']
+        decode_cb = (lambda pct: cb(pct * 8 // 10)) if cb and two_tier else cb
+        
+        if checkpoint is not None and not self._uses_parallel(name, audio):
+            segments, info = self._decode_resumable(audio, decode_cb, preset, name, on_segment, checkpoint)
         else:
-            segments, info = self.model.transcribe(
-                path, 
-                beam_size=5, 
-                language="pt", 
-                vad_filter=True, 
-                word_timestamps=True
+            segments, info = self._decode(audio, decode_cb, preset, name, on_segment)
+        
+        if two_tier:
+            segments = self._refine(audio, segments, preset, cb)
+        return segments, info
+
+    def _two_tier(self, preset) -> bool:
+        """Two-tier decoding applies to the default model only (fast/accurate keep their own model)."""
+        return (self.settings.TWO_TIER
+                and preset['model'] == self.settings.WHISPER_MODEL
+                and self.settings.TWO_TIER_DRAFT_MODEL != self.settings.WHISPER_MODEL)
+
+    def _refine(self, audio, segments, preset, cb):
+        """
+        Two-tier, second pass: after the draft model went over the whole audio,
+        the default model re-decodes only the low-confidence ranges, spliced back in place.
+        """
+        total_s = len(audio) / SAMPLE_RATE
+        ranges = weak_ranges(segments, self.settings.TWO_TIER_MIN_LOGPROB, self.settings.TWO_TIER_MAX_NO_SPEECH, total_s=total_s)
+        model = self.models[preset['model']]
+        replacements = []
+        for n, (first, last, start, end) in enumerate(ranges):
+            redecoded, _ = model.transcribe(
+                audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)],
+                language="pt",
+                beam_size=preset['beam_size'],
+                word_timestamps=preset['word_timestamps'],
+                vad_filter=False,  # The range is already a (padded) speech segment
+                condition_on_previous_text=False,
+                initial_prompt=segments[first - 1].text.strip() if first else None
+            )
+            redecoded = shift_segments(list(redecoded), start)
+            if not redecoded and all(seg.no_speech_prob <= self.settings.TWO_TIER_MAX_NO_SPEECH
+                                     for seg in segments[first:last]):
+                # Weak only on avg_logprob: real speech the larger model could not read, keep the draft
+                redecoded = segments[first:last]
+            # Otherwise an empty re-decode drops the range: draft text over likely silence is a hallucination
+            replacements.append(redecoded)
+            if cb: cb(80 + 19 * (n + 1) // len(ranges))
+        
+        weak = sum(last - first for first, last, _, _ in ranges)
+        logger.info(f"Two-tier: re-decoded {weak}/{len(segments)} segments "
+                    f"({sum(end - start for _, _, start, end in ranges):.0f}s of {total_s:.0f}s) with {preset['model']}.")
+        
+        if cb: cb(100)
+        return splice_segments(segments, ranges, replacements)
+
+    def _uses_parallel(self, name, audio) -> bool:
+        """Long audio on the default model: chunks at pauses across the process pool."""
+        return bool(self.parallel) and name == self.settings.WHISPER_MODEL \
+            and len(audio) / SAMPLE_RATE >= self.settings.PARALLEL_MIN_SECONDS
+
+    def _decode_resumable(self, audio, cb, preset, name, on_segment, checkpoint):
+        """_decode from the end of the last checkpointed segment (trimmed buffer)."""
+        done, info = checkpoint.load_segments()
+        if on_segment:
+            for seg in done:  # Partial transcript of the previous attempt
+                on_segment(seg)
+        if info is not None:
+            logger.info(f"Transcription restored from checkpoint ({len(done)} segments).")
+            if cb: cb(100)
+            return done, info
+        
+        total_s = len(audio) / SAMPLE_RATE
+        offset = done[-1].end if done else 0.0
+        if done:
+            logger.info(f"Resuming transcription at {offset:.0f}s of {total_s:.0f}s ({len(done)} segments checkpointed).")
+        
+        def on_new(seg):
+            seg = shift_segments([seg], offset)[0]
+            checkpoint.append_segment(seg)
+            if on_segment: on_segment(seg)
+        
+        base = int(offset / total_s * 100) if total_s else 0
+        rest_cb = (lambda pct: cb(base + pct * (100 - base) // 100)) if cb else None
+        segments, info = self._decode(audio[int(offset * SAMPLE_RATE):], rest_cb, preset, name, on_new)
+        
+        segments = done + shift_segments(segments, offset)
+        info = replace_fields(info, duration=total_s)
+        checkpoint.mark_done(info)
+        return segments, info
+
+    def checkpoint_fingerprint(self, audio, preset) -> str:
+        """Checkpoints are only reused for the same buffer and decoding settings."""
+        draft = self.settings.TWO_TIER_DRAFT_MODEL if self._two_tier(preset) else ""
+        return f"{len(audio)}|{preset['model']}|{draft}|{preset['beam_size']}|{preset['word_timestamps']}"
+
+    def _decode(self, audio, cb, preset, name, on_segment=None):
+        decode_options = dict(SEQUENTIAL_OPTIONS, beam_size=preset['beam_size'], word_timestamps=preset['word_timestamps'])
+        
+        # Long audio: chunks at pauses across the process pool (holds the default model)
+        if self._uses_parallel(name, audio):
+            return self.parallel.transcribe(audio, decode_options, cb, on_segment)
+        
+        # faster-whisper accepts a 16kHz float32 array directly (no re-decode)
+        batched_model = self.batched_models.get(name)
+        if batched_model:
+            # VAD splits the audio into chunks that are decoded batch_size at a time
+            segments, info = batched_model.transcribe(
+                audio,
+                batch_size=self.settings.WHISPER_BATCH_SIZE,
+                language="pt",
+                beam_size=preset['beam_size'],
+                vad_filter=True,
+                word_timestamps=preset['word_timestamps']
             )
+        else:
+            segments, info = self.models[name].transcribe(audio, **decode_options)
             
         # Collect for progress (simplification: faster-whisper is generator, 
         # so we iterate to consume and calculate progress if duration known)
@@ -102,6 +470,8 @@ class TranscriptionService:
         
         for seg in segments:
             results.append(seg)
+            if on_segment:
+                on_segment(seg)
             if cb:
                 pct = int((seg.end / total_dur) * 100)
                 cb(min(99, pct))
@@ -109,6 +479,56 @@ class TranscriptionService:
         if cb: cb(100)
         return results, info
 
+    def _transcribe_channels(self, stereo, cb, preset=None, segment_callback=None):
+        """
+        Transcribes both channels concurrently (CTranslate2 releases the GIL and
+        the model runs 2 workers). Returns merged segments, channel labels, info.
+        """
+        progress = [0, 0]
+        # Both channel threads report progress; the callback may hold a DB session, never enter it twice
+        progress_lock = threading.Lock()
+        
+        def channel_cb(ch):
+            def _cb(pct):
+                with progress_lock:
+                    progress[ch] = pct
+                    if cb: cb(min(99, sum(progress) // 2))
+            return _cb
+        
+        labels = self.settings.STEREO_CHANNEL_LABELS
+        
+        def channel_segment_cb(ch):
+            if not segment_callback:
+                return None
+            return lambda seg: segment_callback(seg, speaker=labels[ch] if len(labels) == 2 else ch)
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(self._transcribe_channel, stereo[ch], channel_cb(ch), preset, channel_segment_cb(ch))
+                for ch in (0, 1)
+            ]
+            results = [f.result() for f in futures]
+        
+        energy = self.audio_processor.frame_energy_db(stereo)
+        frames_per_sec = 1000 // FRAME_MS
+        
+        merged = []
+        for ch, (segments, _) in enumerate(results):
+            for seg in segments:
+                # Drop crosstalk: text decoded from the other speaker bleeding into this channel
+                a = min(int(seg.start * frames_per_sec), energy.shape[1] - 1)
+                b = max(a + 1, int(seg.end * frames_per_sec))
+                if energy[ch, a:b].mean() < energy[1 - ch, a:b].mean() - DOMINANCE_DB:
+                    continue
+                merged.append((seg.start, ch, seg))
+        merged.sort(key=lambda x: (x[0], x[1]))
+        
+        segments = [seg for _, _, seg in merged]
+        speaker_labels = [labels[ch] if len(labels) == 2 else ch for _, ch, _ in merged]
+        
+        if cb: cb(100)
+        return segments, speaker_labels, results[0][1]
+
     def _format_output(self, segments, speakers, use_timestamps):
         lines = []
         for i, seg in enumerate(segments):
@@ -123,7 +543,10 @@ class TranscriptionService:
             # Speaker
             if speakers and i < len(speakers):
                 lbl = speakers[i]
-                parts.append(f"[Pessoa {lbl+1}]" if lbl >= 0 else "[?]")
+                if isinstance(lbl, str):
+                    parts.append(f"[{lbl}]")
+                else:
+                    parts.append(f"[Pessoa {lbl+1}]" if lbl >= 0 else "[?]")
                 
             parts.append(seg.text.strip())
             lines.append(" ".join(parts))
@@ -0,0 +1,129 @@
+"""
+Voiceprint registry of known speakers (agents).
+
+One unit-norm ECAPA embedding per enrolled name, held as a NumPy matrix and
+persisted as .npz on the data volume shared by the API and the workers.
+Enrollment runs in the worker (it needs the encoder); every diarization
+matches its segment embeddings against the matrix in one product, labels
+the matches by name and only clusters the rest.
+"""
+import os
+import fcntl
+import logging
+from contextlib import contextmanager
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MIN_ENROLL_EMBEDDINGS = 3  # Windows of speech needed for a usable voiceprint
+
+
+def registry_version(path: str) -> str:
+    """Short content hash of the registry file ('' when nothing is enrolled). Part of the result cache key."""
+    import hashlib
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except FileNotFoundError:
+        return ""
+
+
+class VoiceprintRegistry:
+    def __init__(self, path: str, threshold: float):
+        self.path = path
+        self.threshold = threshold  # Minimum cosine similarity to label a segment by name
+        self._mtime = None
+        self._names = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._samples = np.zeros(0, dtype=np.int64)
+
+    # --- Read side (reloaded when another process enrolled) ---
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._names = None, []
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._samples = np.zeros(0, dtype=np.int64)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self._names = data["names"].tolist()
+                self._matrix = data["embeddings"]
+                self._samples = data["samples"]
+            self._mtime = mtime
+            logger.info(f"Loaded {len(self._names)} voiceprints.")
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not load voiceprints from {self.path}: {e}")
+
+    def entries(self) -> list:
+        self._refresh()
+        return [{"name": name, "samples": int(n)} for name, n in zip(self._names, self._samples)]
+
+    def match(self, X):
+        """
+        (registry index per row of the unit-norm matrix X, -1 = unknown; names).
+        Both come from the same snapshot of the registry.
+        """
+        self._refresh()
+        names, matrix = self._names, self._matrix
+        if not names or len(X) == 0:
+            return np.full(len(X), -1), names
+        sims = X @ matrix.T
+        best = np.argmax(sims, axis=1)
+        best[sims[np.arange(len(X)), best] < self.threshold] = -1
+        return best, names
+
+    # --- Write side (file lock: concurrent enrollments in several workers) ---
+
+    def enroll(self, name: str, embeddings) -> int:
+        """Stores the mean voice of `embeddings` under `name` (replacing it). Returns the sample count."""
+        if len(embeddings) < MIN_ENROLL_EMBEDDINGS:
+            raise ValueError("Áudio de cadastro muito curto: envie pelo menos 10 segundos de fala.")
+        X = np.asarray(embeddings, dtype=np.float32)
+        X /= np.linalg.norm(X, axis=1, keepdims=True)
+        voice = X.mean(axis=0)
+        voice /= np.linalg.norm(voice)
+        with self._locked():
+            self._mtime = None
+            self._refresh()
+            names = [n for n in self._names if n != name]
+            keep = [i for i, n in enumerate(self._names) if n != name]
+            matrix = self._matrix[keep] if keep else np.zeros((0, len(voice)), dtype=np.float32)
+            self._save(names + [name], np.vstack([matrix, voice[None, :]]),
+                       np.append(self._samples[keep], len(X)))
+        logger.info(f"Voiceprint '{name}' enrolled from {len(X)} windows.")
+        return len(X)
+
+    def remove(self, name: str) -> bool:
+        with self._locked():
+            self._mtime = None
+            self._refresh()
+            if name not in self._names:
+                return False
+            keep = [i for i, n in enumerate(self._names) if n != name]
+            self._save([self._names[i] for i in keep], self._matrix[keep], self._samples[keep])
+        return True
+
+    def _save(self, names, matrix, samples):
+        tmp = self.path + ".tmp.npz"
+        np.savez(
+            tmp,
+            names=np.array(names, dtype=str),
+            embeddings=np.asarray(matrix, dtype=np.float32),
+            samples=np.asarray(samples, dtype=np.int64)
+        )
+        os.replace(tmp, self.path)  # Readers never see a half-written registry
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,235 @@
+
+"""
+Streaming multipart upload.
+
+Starlette's request.form() spools the whole body to a SpooledTemporaryFile
+before the handler runs, and the handler then copied it a second time to
+UPLOAD_DIR. Here the multipart stream is parsed as it arrives and the audio
+part is written straight to its final path in a single pass that also
+sniffs the header (libmagic), enforces MAX_FILE_SIZE_MB and hashes the content.
+"""
+import os
+import uuid
+import hashlib
+from fastapi import Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings, logger
+from app.validation import FileValidator
+
+HEADER_BYTES = 8192           # Same window validate_file() sniffs
+WRITE_BUFFER = 1024 * 1024    # Flush to disk in 1MB writes
+FORM_OVERHEAD = 64 * 1024     # Multipart boundaries + small form fields
+
+
+class UploadedFile:
+    """Result of a streamed upload (file already at its final location)."""
+
+    def __init__(self, filename, safe_filename, file_path, size, content_hash, fields):
+        self.filename = filename
+        self.safe_filename = safe_filename
+        self.file_path = file_path
+        self.size = size
+        self.content_hash = content_hash
+        self.fields = fields
+
+
+class StreamingUpload:
+    """
+    Parses a multipart/form-data request with one file field.
+    Usage: upload = await StreamingUpload(request).receive()
+    """
+
+    def __init__(self, request: Request, file_field: str = "file", dest_dir: str = None):
+        self.request = request
+        self.file_field = file_field
+        self.dest_dir = dest_dir or settings.UPLOAD_DIR
+        self.max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+        self._messages = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._field_name = None
+
+        self.fields = {}
+        self.filename = None
+        self.safe_filename = None
+        self.file_path = None
+        self._file = None
+        self._size = 0
+        self._header = b""
+        self._sniffed = False
+        self._buffer = bytearray()
+        self._sha256 = hashlib.sha256()
+
+    # --- Parser callbacks (sync, only queue messages) ---
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        self._messages.append(("headers", dict(self._headers)))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._messages.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        self._messages.append(("end", None))
+
+    # --- Async processing ---
+
+    async def receive(self) -> UploadedFile:
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(400, "Envio deve ser multipart/form-data")
+
+        # Reject obviously oversized bodies before reading a single byte
+        content_length = self.request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_size + FORM_OVERHEAD:
+            raise HTTPException(413, f"Arquivo muito grande. Máximo: {settings.MAX_FILE_SIZE_MB}MB")
+
+        parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+        try:
+            part = None
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                messages, self._messages = self._messages, []
+                for kind, payload in messages:
+                    if kind == "headers":
+                        part = await self._start_part(payload)
+                    elif kind == "data":
+                        if part is None:
+                            self._sink_field(payload)
+                        else:
+                            await self._write(payload)
+                    elif kind == "end":
+                        if part is not None:
+                            await self._close_file()
+                        part = None
+            parser.finalize()
+
+            if self.file_path is None:
+                raise HTTPException(400, "Nenhum arquivo enviado")
+            if self._file is not None:
+                raise HTTPException(400, "Envio incompleto")
+            if self._size == 0:
+                raise HTTPException(400, "Arquivo vazio")
+            if not self._sniffed:
+                self._sniff()
+        except BaseException:
+            await self._discard()
+            raise
+
+        logger.info(f"File streamed: {self.safe_filename}, size: {self._size/1024/1024:.2f}MB")
+        return UploadedFile(
+            filename=self.filename,
+            safe_filename=self.safe_filename,
+            file_path=self.file_path,
+            size=self._size,
+            content_hash=self._sha256.hexdigest(),
+            fields=self.fields,
+        )
+
+    async def _start_part(self, headers: dict):
+        """Returns a marker for the file part, None for plain form fields."""
+        disposition, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+
+        if filename is None or name != self.file_field:
+            self._field_name = name
+            self.fields[name] = ""
+            return None
+
+        if self.file_path is not None:
+            raise HTTPException(400, "Envie apenas um arquivo por vez")
+
+        self.filename = filename.decode("utf-8", errors="replace")
+        FileValidator.validate_extension(self.filename)
+        self.safe_filename = FileValidator.sanitize_filename(self.filename)
+
+        # Disk uses UUID to never collide
+        self.file_path = os.path.join(self.dest_dir, f"{uuid.uuid4()}_{self.safe_filename}")
+        try:
+            self._file = await run_in_threadpool(open, self.file_path, "wb")
+        except Exception as e:
+            self.file_path = None
+            raise HTTPException(status_code=500, detail=f"Falha ao salvar arquivo: {str(e)}")
+        return name
+
+    def _sink_field(self, data: bytes):
+        value = self.fields[self._field_name] + data.decode("utf-8", errors="replace")
+        if len(value) > FORM_OVERHEAD:
+            raise HTTPException(400, "Campo de formulário muito grande")
+        self.fields[self._field_name] = value
+
+    def _sniff(self):
+        ext = self.filename.split('.')[-1].lower()
+        FileValidator.validate_mime(self._header, ext)
+        self._sniffed = True
+
+    async def _write(self, data: bytes):
+        self._size += len(data)
+        if self._size > self.max_size:
+            raise HTTPException(413, f"Arquivo muito grande. Máximo: {settings.MAX_FILE_SIZE_MB}MB")
+
+        self._sha256.update(data)
+        if not self._sniffed:
+            self._header += data[:HEADER_BYTES - len(self._header)]
+            if len(self._header) >= HEADER_BYTES:
+                self._sniff()
+
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER:
+            await self._flush()
+
+    async def _flush(self):
+        if self._buffer:
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await run_in_threadpool(self._file.write, data)
+
+    async def _close_file(self):
+        await self._flush()
+        await run_in_threadpool(self._file.close)
+        self._file = None
+
+    async def _discard(self):
+        """Removes a partially written file (validation failure or client abort)."""
+        if self._file is not None:
+            try:
+                await run_in_threadpool(self._file.close)
+            except Exception:
+                pass
+            self._file = None
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                os.remove(self.file_path)
+            except OSError as e:
+                logger.warning(f"Could not remove partial upload {self.file_path}: {e}")
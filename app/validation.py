@@ -42,15 +42,7 @@ class FileValidator:
         """
         
         # 1. Validate extension
-        if not file.filename:
-            raise HTTPException(400, "Nome de arquivo inválido")
-        
-        ext = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-        if ext not in settings.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                400, 
-                f"Extensão '{ext}' não permitida. Permitidas: {', '.join(settings.ALLOWED_EXTENSIONS)}"
-            )
+        ext = FileValidator.validate_extension(file.filename)
         
         # 2. Read ONLY the header (first 8KB) for MIME detection
         # This is O(1) memory regardless of file size
@@ -78,6 +70,40 @@ class FileValidator:
             raise HTTPException(400, "Arquivo vazio")
         
         # 5. Validate MIME type (using header only)
+        mime = FileValidator.validate_mime(header, ext)
+        
+        # 6. Sanitize filename
+        safe_filename = FileValidator.sanitize_filename(file.filename)
+        
+        logger.info(f"File validated: {safe_filename}, size: {size/1024/1024:.2f}MB, mime: {mime}")
+        
+        return safe_filename, size
+    
+    @staticmethod
+    def validate_extension(filename: str) -> str:
+        """
+        Validate extension against ALLOWED_EXTENSIONS.
+        Returns: lowercase extension
+        Raises: HTTPException if invalid
+        """
+        if not filename:
+            raise HTTPException(400, "Nome de arquivo inválido")
+        
+        ext = filename.split('.')[-1].lower() if '.' in filename else ''
+        if ext not in settings.ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                400, 
+                f"Extensão '{ext}' não permitida. Permitidas: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+            )
+        return ext
+    
+    @staticmethod
+    def validate_mime(header: bytes, ext: str) -> str:
+        """
+        Validate MIME type from the first bytes of the file (libmagic).
+        Returns: detected MIME ('unknown' if detection fails)
+        Suspicious types are logged; detection never blocks a valid extension.
+        """
         mime = 'unknown'
         try:
             mime = magic.from_buffer(header, mime=True)
@@ -96,13 +122,7 @@ class FileValidator:
         except Exception as e:
             logger.debug(f"MIME detection fallback: {e}")
             # Continue if MIME detection fails but extension is valid
-        
-        # 6. Sanitize filename
-        safe_filename = FileValidator.sanitize_filename(file.filename)
-        
-        logger.info(f"File validated: {safe_filename}, size: {size/1024/1024:.2f}MB, mime: {mime}")
-        
-        return safe_filename, size
+        return mime
     
     @staticmethod
     def sanitize_filename(filename: str) -> str:
@@ -0,0 +1,82 @@
+"""
+Real-time factor benchmark: sequential vs batched faster-whisper decoding.
+
+RTF = processing seconds / audio seconds (lower is better; 0.25 = 4x faster
+than real time). Uses the same model settings as the worker (WHISPER_MODEL,
+DEVICE, COMPUTE_TYPE, WHISPER_CPU_THREADS...) unless overridden below.
+
+Usage (inside the worker image):
+    python scripts/benchmark_rtf.py call1.mp3 call2.wav
+    python scripts/benchmark_rtf.py --batch-sizes 4,8,16 --cpu-threads 8 calls/*.mp3
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.audio import AudioProcessor, SAMPLE_RATE
+
+
+def run(transcribe, audios, **kwargs):
+    """Total processing time and audio duration over all files."""
+    processing, duration = 0.0, 0.0
+    for audio in audios:
+        start = time.perf_counter()
+        segments, _ = transcribe(audio, language="pt", word_timestamps=True, **kwargs)
+        list(segments)  # Generator: consume to actually decode
+        processing += time.perf_counter() - start
+        duration += len(audio) / SAMPLE_RATE
+    return processing, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare real-time factor of sequential and batched decoding")
+    parser.add_argument("files", nargs="+", help="Audio files (real calls give representative numbers)")
+    parser.add_argument("--batch-sizes", default=str(settings.WHISPER_BATCH_SIZE), help="Comma-separated, e.g. 4,8,16")
+    parser.add_argument("--cpu-threads", type=int, default=settings.WHISPER_CPU_THREADS)
+    parser.add_argument("--num-workers", type=int, default=settings.WHISPER_NUM_WORKERS or 1)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+
+    print(f"Model: {settings.WHISPER_MODEL} | device: {settings.DEVICE} | compute: {settings.COMPUTE_TYPE} | "
+          f"cpu_threads: {args.cpu_threads or 'default'} | cores: {os.cpu_count()}")
+
+    # Decode once, outside the timed section (same buffer the worker hands to Whisper)
+    audios = [AudioProcessor.decode_audio(path) for path in args.files]
+
+    model = WhisperModel(
+        settings.WHISPER_MODEL,
+        device=settings.DEVICE,
+        compute_type=settings.COMPUTE_TYPE,
+        download_root=os.environ.get('HF_HOME', '/home/appuser/.cache/huggingface'),
+        cpu_threads=args.cpu_threads,
+        num_workers=args.num_workers
+    )
+
+    # Warm-up pass so the first configuration does not pay lazy allocations
+    run(model.transcribe, [audios[0][:SAMPLE_RATE * 5]], beam_size=1)
+
+    rows = []
+    if not args.skip_sequential:
+        # Current non-batched path (TranscriptionService._transcribe_audio)
+        rows.append(("sequential (beam 5, vad)",) + run(model.transcribe, audios, beam_size=5, vad_filter=True))
+
+    batched = BatchedInferencePipeline(model=model)
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        rows.append((f"batched (batch_size={batch_size})",) + run(
+            batched.transcribe, audios, batch_size=batch_size, vad_filter=True
+        ))
+
+    print(f"\n{'Mode':<28} {'Audio (s)':>10} {'Proc. (s)':>10} {'RTF':>7}")
+    for name, processing, duration in rows:
+        print(f"{name:<28} {duration:>10.1f} {processing:>10.1f} {processing / duration:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -238,8 +238,9 @@ function pollTaskStatus(taskId, item) {
             if (['processing', 'queued'].includes(data.status)) {
                 bar.style.width = `${data.progress || 0}%`;
                 if (item.querySelector('.progress-status')) {
+                    const eta = data.eta_seconds ? ` (~${formatDuration(data.eta_seconds)} restantes)` : '';
                     item.querySelector('.progress-status').textContent =
-                        data.status === 'queued' ? 'Na fila...' : `Processando ${data.progress || 0}%`;
+                        (data.status === 'queued' ? 'Na fila...' : `Processando ${data.progress || 0}%`) + eta;
                 }
             } else if (data.status === 'completed') {
                 clearInterval(interval);
@@ -729,7 +730,7 @@ window.regenerateAllAnalyses = async () => {
     try {
         const res = await authFetch('/api/admin/regenerate-all', { method: 'POST' });
         const data = await res.json();
-        showToast(`Concluído: ${data.count} atualizados.`);
+        showToast(`Enviado: ${data.count} análises na fila.`);
     } catch (e) {
         showToast('Erro na regeneração');
     }
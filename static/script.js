@@ -804,6 +804,10 @@ document.addEventListener('DOMContentLoaded', () => {
         const dr = document.getElementById('opt-diarization');
         if (ts) formData.append('timestamp', ts.checked);
         if (dr) formData.append('diarization', dr.checked);
+        const preset = document.getElementById('opt-preset');
+        if (preset && preset.value) formData.append('preset', preset.value);
+        const speakers = document.getElementById('opt-speakers');
+        if (speakers && speakers.value) formData.append('num_speakers', speakers.value);
         const bar = item.querySelector('.progress-bar-fill');
         const statusEl = item.querySelector(`#status-${itemId}`);
 
@@ -865,26 +869,57 @@ document.addEventListener('DOMContentLoaded', () => {
         items.forEach(item => container.appendChild(item));
     }
 
+    // --- Task events: pushed over /ws/tasks, polling is the fallback ---
+    const taskHandlers = new Map();
+    let taskSocket = null;
+
+    function connectTaskEvents() {
+        const t = sessionStorage.getItem('access_token');
+        if (!t || !window.WebSocket) return;
+        const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+        taskSocket = new WebSocket(`${proto}://${location.host}/ws/tasks?token=${encodeURIComponent(t)}`);
+        taskSocket.onmessage = (e) => {
+            try {
+                const data = JSON.parse(e.data);
+                const handler = taskHandlers.get(data.task_id);
+                if (handler) handler(data);
+            } catch (err) { console.error(err); }
+        };
+        taskSocket.onclose = () => {
+            taskSocket = null;
+            if (taskHandlers.size) setTimeout(connectTaskEvents, 3000);
+        };
+    }
+
+    const taskEventsOpen = () => taskSocket && taskSocket.readyState === WebSocket.OPEN;
+
     function pollStatus(taskId, item) {
         const bar = item.querySelector('.progress-bar-fill');
-        let processedPercent = 0;
-        const interval = setInterval(async () => {
+        let ticks = 0;
+        let finished = false;
+
+        function applyStatus(data) {
+            if (finished) return;  // Late poll response after the pushed final event
             try {
-                const res = await authFetch(`/api/status/${taskId}`);
-                if (!res.ok) return;
-                const data = await res.json();
                 const pct = data.progress || 0;
 
                 // Update text first
                 if (['processing', 'pending', 'queued'].includes(data.status)) {
                     bar.style.width = `${pct}%`;
+                    const eta = data.eta_seconds ? ` (~${formatDuration(data.eta_seconds)} restantes)` : '';
+                    if (data.preview && item.dataset.preview !== data.preview) {
+                        // First seconds of the call (triage) while the full transcription runs
+                        item.dataset.preview = data.preview;
+                        item.title = `Prévia:\n${data.preview}`;
+                    }
+                    const previewNote = data.preview ? ' · prévia disponível' : '';
                     if (data.status === 'queued') {
-                        if (item.addLog) item.addLog('Na fila de processamento...');
+                        if (item.addLog) item.addLog(`Na fila de processamento...${eta}${previewNote}`);
                     } else if (data.status === 'processing') {
-                        if (item.addLog) item.addLog(`Processando... ${pct}%`);
+                        if (item.addLog) item.addLog(`Processando... ${pct}%${eta}${previewNote}`);
                     }
                 } else if (data.status === 'completed') {
-                    clearInterval(interval);
+                    stop();
                     bar.style.width = '100%';
                     if (item.addLog) {
                         item.addLog('Concluído!');
@@ -897,7 +932,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         loadUserInfo();
                     }, 2000);
                 } else if (data.status === 'failed') {
-                    clearInterval(interval);
+                    stop();
                     bar.style.backgroundColor = 'var(--danger)';
                     if (item.addLog) item.addLog(`FALHA: ${data.error}`);
                 }
@@ -906,7 +941,26 @@ document.addEventListener('DOMContentLoaded', () => {
                 updateProgressOrder();
 
             } catch (e) { console.error(e); }
+        }
+
+        taskHandlers.set(taskId, applyStatus);
+        if (!taskSocket) connectTaskEvents();
+
+        const interval = setInterval(async () => {
+            // Push channel up: poll only every ~15s as a safety net
+            if (taskEventsOpen() && ticks++ % 10 !== 0) return;
+            try {
+                const res = await authFetch(`/api/status/${taskId}`);
+                if (!res.ok) return;
+                applyStatus(await res.json());
+            } catch (e) { console.error(e); }
         }, 1500);
+
+        function stop() {
+            finished = true;
+            clearInterval(interval);
+            taskHandlers.delete(taskId);
+        }
     }
 
     // --- History Logic ---
@@ -1846,8 +1900,24 @@ document.addEventListener('DOMContentLoaded', () => {
         } catch (e) { console.error(e); }
     }
 
+    // Quality presets enabled on the server (fast / balanced / accurate)
+    async function loadPresets() {
+        const select = document.getElementById('opt-preset');
+        if (!select) return;
+        try {
+            const res = await authFetch('/api/presets');
+            if (!res.ok) return;
+            const data = await res.json();
+            select.innerHTML = data.presets.map(p =>
+                `<option value="${p.name}" ${p.name === data.default ? 'selected' : ''}>${escapeHtml(p.label)}</option>`
+            ).join('');
+            select.parentElement.classList.toggle('hidden', data.presets.length < 2);
+        } catch (e) { console.error(e); }
+    }
+
     // Initial Load
     Notification.requestPermission();
+    loadPresets();
 
     // Validate auth before loading data
     if (token) {
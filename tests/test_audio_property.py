@@ -0,0 +1,119 @@
+from hypothesis import given, settings, strategies as st
+import numpy as np
+from app.services.audio import AudioProcessor, SAMPLE_RATE, weak_ranges, splice_segments
+
+
+def _speech(seconds: float, rng) -> np.ndarray:
+    return (0.3 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def _turns(n_turns: int, seed: int) -> np.ndarray:
+    """Dual-channel call: speakers alternate, each one only on its own channel"""
+    rng = np.random.default_rng(seed)
+    left, right = [], []
+    for t in range(n_turns):
+        s = _speech(1.0, rng)
+        silence = np.zeros_like(s)
+        left.append(s if t % 2 == 0 else silence)
+        right.append(silence if t % 2 == 0 else s)
+    return np.stack([np.concatenate(left), np.concatenate(right)])
+
+
+@settings(max_examples=20, deadline=None)
+@given(st.integers(min_value=2, max_value=8), st.integers(min_value=0, max_value=1000))
+def test_separated_channels_detected(n_turns, seed):
+    """Property: one speaker per channel is detected as a channel split"""
+    assert AudioProcessor.is_channel_split(_turns(n_turns, seed))
+
+
+@settings(max_examples=20, deadline=None)
+@given(st.integers(min_value=2, max_value=8), st.integers(min_value=0, max_value=1000))
+def test_upmixed_mono_not_split(n_turns, seed):
+    """Property: identical channels (upmixed mono) never take the split path"""
+    mono = _turns(n_turns, seed).sum(axis=0)
+    assert not AudioProcessor.is_channel_split(np.stack([mono, mono]))
+
+
+def test_silence_not_split():
+    assert not AudioProcessor.is_channel_split(np.zeros((2, SAMPLE_RATE * 5), dtype=np.float32))
+
+
+def _with_gaps(gaps, seed):
+    """Speech bursts separated by silences of the given lengths (seconds)"""
+    rng = np.random.default_rng(seed)
+    parts = [_speech(1.0, rng)]
+    for gap in gaps:
+        parts += [np.zeros(int(gap * SAMPLE_RATE), dtype=np.float32), _speech(1.0, rng)]
+    return np.concatenate(parts)
+
+
+@settings(max_examples=20, deadline=None)
+@given(st.lists(st.floats(min_value=0.1, max_value=8.0), min_size=1, max_size=6), st.integers(min_value=0, max_value=1000))
+def test_compaction_maps_back_to_original(gaps, seed):
+    """Property: every compacted sample maps back to the same sample of the original audio"""
+    audio = _with_gaps(gaps, seed)
+    compact, speech_map = AudioProcessor.compact_silence(audio, min_gap_s=2.0)
+    
+    assert len(compact) == speech_map.compact_samples <= len(audio)
+    # Only gaps longer than min_gap are cut (up to the padding around speech)
+    assert speech_map.removed_seconds <= sum(g for g in gaps if g >= 2.0) + 0.1
+    
+    positions = np.arange(0, len(compact), 97)
+    original = np.round(speech_map.to_original(positions / SAMPLE_RATE) * SAMPLE_RATE).astype(int)
+    assert np.array_equal(compact[positions], audio[original])
+    assert np.all(np.diff(original) > 0)  # Monotonic timeline
+
+
+def test_segment_timestamps_restored():
+    from collections import namedtuple
+    Segment = namedtuple("Segment", "start end text words")
+    Word = namedtuple("Word", "start end word")
+    
+    audio = _with_gaps([10.0], seed=1)
+    _, speech_map = AudioProcessor.compact_silence(audio, min_gap_s=2.0)
+    assert speech_map.removed_seconds > 9
+    
+    # Second burst starts at 1s + pad in the compacted buffer, at 11s in the original
+    joined = speech_map.compact_starts[1] / SAMPLE_RATE
+    seg = Segment(joined, joined + 0.5, "oi", [Word(joined, joined + 0.5, "oi")])
+    (restored,), _ = speech_map.restore([seg])
+    assert abs(restored.start - 11.0 + 0.2) < 0.06
+    assert restored.words[0].start == restored.start
+    # An end exactly on the join stays in the first span
+    assert speech_map.to_original(joined, is_end=True) < 1.5
+
+
+@settings(max_examples=20, deadline=None)
+@given(st.lists(st.floats(min_value=0.5, max_value=6.0), min_size=3, max_size=12), st.integers(min_value=0, max_value=1000))
+def test_split_at_pauses_covers_audio(gaps, seed):
+    """Property: chunks are contiguous, cover the buffer and are cut in silence"""
+    audio = _with_gaps(gaps, seed)
+    spans = AudioProcessor.split_at_pauses(audio, chunk_seconds=5.0, search_seconds=2.0)
+    
+    assert spans[0][0] == 0 and spans[-1][1] == len(audio)
+    assert all(a < b for a, b in spans)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(spans, spans[1:]))
+    for _, cut in spans[:-1]:
+        frame = SAMPLE_RATE // 20
+        assert np.abs(audio[cut:cut + frame]).max() == 0 or np.abs(audio[cut - frame:cut]).max() == 0
+
+
+@settings(max_examples=50, deadline=None)
+@given(st.lists(st.tuples(st.floats(min_value=-3.0, max_value=0.0), st.floats(min_value=0.0, max_value=1.0)), max_size=20))
+def test_two_tier_splice_replaces_only_weak_segments(scores):
+    """Property: confident segments survive in order, each weak run becomes its re-decoded text"""
+    from collections import namedtuple
+    Segment = namedtuple("Segment", "start end text avg_logprob no_speech_prob")
+    segments = [Segment(2.0 * i, 2.0 * i + 1.5, f"s{i}", lp, ns) for i, (lp, ns) in enumerate(scores)]
+    
+    ranges = weak_ranges(segments, min_logprob=-1.0, max_no_speech=0.6, total_s=2.0 * len(segments))
+    weak = {i for first, last, _, _ in ranges for i in range(first, last)}
+    assert weak == {i for i, s in enumerate(segments) if s.avg_logprob < -1.0 or s.no_speech_prob > 0.6}
+    for first, last, start, end in ranges:
+        assert start <= segments[first].start and end >= segments[last - 1].end
+    
+    replacements = [[Segment(start, end, f"r{n}", 0.0, 0.0)] for n, (_, _, start, end) in enumerate(ranges)]
+    spliced = splice_segments(segments, ranges, replacements)
+    assert [s.text for s in spliced if s.text.startswith("s")] == [f"s{i}" for i in range(len(segments)) if i not in weak]
+    assert [s.text for s in spliced if s.text.startswith("r")] == [f"r{n}" for n in range(len(ranges))]
+    assert [s.start for s in spliced] == sorted(s.start for s in spliced)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import numpy as np
+from hypothesis import given, settings, strategies as st
+from app.services.checkpoint import Checkpoint, Segment, Word
+
+segment_lists = st.lists(
+    st.tuples(st.floats(min_value=0, max_value=5), st.text(max_size=20), st.booleans()), max_size=15
+)
+
+
+def _segments(raw):
+    segments, t = [], 0.0
+    for length, text, with_words in raw:
+        words = [Word(t, t + length, text, 0.9)] if with_words else None
+        segments.append(Segment(t, t + length, text, words, -0.3, 0.01))
+        t += length + 0.5
+    return segments
+
+
+@settings(max_examples=30, deadline=None)
+@given(segment_lists)
+def test_segments_survive_a_restart(raw):
+    """Property: what a killed worker checkpointed is what the next attempt resumes from"""
+    with tempfile.TemporaryDirectory() as d:
+        segments = _segments(raw)
+        first = Checkpoint(d, "t1")
+        first.bind("fp")
+        for seg in segments:
+            first.append_segment(seg)
+        # Killed mid-write
+        with open(first.segments_path, "a") as f:
+            f.write('{"start": 99, "en')
+        
+        resumed = Checkpoint(d, "t1")
+        resumed.bind("fp")
+        loaded, info = resumed.load_segments()
+        assert loaded == segments and info is None
+        
+        # New segments after the torn line are kept
+        extra = Segment(100.0, 101.0, "fim", None, 0.0, 0.0)
+        resumed.append_segment(extra)
+        assert resumed.load_segments()[0] == segments + [extra]
+
+
+def test_other_settings_discard_checkpoint():
+    with tempfile.TemporaryDirectory() as d:
+        cp = Checkpoint(d, "t1")
+        cp.bind("small|5")
+        cp.append_segment(Segment(0.0, 1.0, "oi", None, 0.0, 0.0))
+        cp.save_embeddings([0], np.ones((1, 4)), upto=1, n_segments=1)
+        
+        assert cp.load_embeddings(n_segments=2)[1] is None  # Other segment list
+        indices, embeddings, upto = cp.load_embeddings(n_segments=1)
+        assert indices == [0] and embeddings.shape == (1, 4) and upto == 1
+        
+        cp.bind("medium|5")
+        assert cp.load_segments() == ([], None)
+        cp.clear()
+        assert not os.path.exists(cp.segments_path) and not os.path.exists(cp.embeddings_path)
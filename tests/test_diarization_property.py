@@ -0,0 +1,100 @@
+import numpy as np
+from collections import namedtuple
+from hypothesis import given, assume, settings as hyp_settings, strategies as st
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import normalize
+from app.services.diarization import (
+    DiarizationService, cluster_embeddings, ward_labels, fixed_k_labels, inner_turn_segments, DISTANCE_THRESHOLD
+)
+
+Seg = namedtuple("Seg", "start end")
+
+
+def _speakers(seed, n_speakers, n_segments, noise=0.02, dim=192):
+    """Unit-norm embeddings of n_speakers voices, in conversation order"""
+    rng = np.random.default_rng(seed)
+    voices = normalize(rng.normal(size=(n_speakers, dim)))
+    truth = np.repeat(rng.integers(0, n_speakers, size=n_segments // 4 + 1), 4)[:n_segments]
+    return normalize(voices[truth] + rng.normal(scale=noise, size=(n_segments, dim))), truth
+
+
+@hyp_settings(max_examples=15, deadline=None)
+@given(st.integers(min_value=0, max_value=10**6), st.integers(min_value=1, max_value=5),
+       st.integers(min_value=100, max_value=400), st.integers(min_value=40, max_value=80))
+def test_two_stage_matches_ward(seed, n_speakers, n_segments, window):
+    """Property: above the direct-Ward limit, two-stage clustering finds the same speakers as Ward"""
+    X, truth = _speakers(seed, n_speakers, n_segments)
+    direct = ward_labels(X, DISTANCE_THRESHOLD)
+    two_stage = cluster_embeddings(X, DISTANCE_THRESHOLD, max_direct=window, window=window)
+    assert len(two_stage) == n_segments
+    assert adjusted_rand_score(direct, two_stage) == 1.0
+    assert adjusted_rand_score(truth, two_stage) == 1.0
+
+
+def test_short_calls_use_plain_ward():
+    X, _ = _speakers(7, 2, 30)
+    assert cluster_embeddings(X, DISTANCE_THRESHOLD, max_direct=2000, window=500).tolist() == \
+        ward_labels(X, DISTANCE_THRESHOLD).tolist()
+
+
+@hyp_settings(max_examples=15, deadline=None)
+@given(st.integers(min_value=0, max_value=10**6), st.integers(min_value=1, max_value=4), st.integers(min_value=4, max_value=300))
+def test_fixed_k_finds_known_speakers(seed, n_speakers, n_segments):
+    """Property: with the speaker count given, k-means + cosine assignment recovers the speakers"""
+    X, truth = _speakers(seed, n_speakers, n_segments)
+    assume(len(set(truth.tolist())) == n_speakers)
+    labels = fixed_k_labels(X, n_speakers)
+    assert len(set(labels.tolist())) <= n_speakers
+    assert adjusted_rand_score(truth, labels) == 1.0
+
+
+@given(st.lists(st.tuples(st.floats(min_value=0, max_value=2), st.floats(min_value=0.1, max_value=10)), max_size=50))
+def test_inner_turn_segments_keep_embedded_neighbours(gaps_and_lengths):
+    """Property: skipped segments are interior, never adjacent, and have continuous speech on both sides"""
+    segments, t = [], 0.0
+    for gap, length in gaps_and_lengths:
+        segments.append(Seg(t + gap, t + gap + length))
+        t += gap + length
+    skipped = inner_turn_segments(segments)
+    for i in skipped:
+        assert 0 < i < len(segments) - 1
+        assert i + 1 not in skipped
+        assert segments[i].start - segments[i - 1].end <= 0.3 and segments[i + 1].start - segments[i].end <= 0.3
+
+
+class _VoiceEmbedder:
+    """Remote-embedder stand-in: crop samples carry the speaker id, embedding = that voice + noise"""
+    def __init__(self, voices, seed=0):
+        self.voices = voices
+        self.rng = np.random.default_rng(seed)
+        self.crops = 0
+
+    def embed(self, crops):
+        self.crops += len(crops)
+        ids = [int(c[0]) for c in crops]
+        return self.voices[ids] + self.rng.normal(scale=0.02, size=(len(ids), self.voices.shape[1]))
+
+
+def test_two_party_call_skipping_inner_turns():
+    rng = np.random.default_rng(3)
+    voices = normalize(rng.normal(size=(2, 192)))
+    # Turns of 2-6 back-to-back segments, 1s pauses between turns (single-segment turns get smoothed)
+    segments, truth, t = [], [], 0.0
+    for turn in range(30):
+        for _ in range(int(rng.integers(2, 7))):
+            segments.append(Seg(t, t + 2.0))
+            truth.append(turn % 2)
+            t += 2.1
+        t += 1.0
+    audio = np.zeros(int(t * 16000) + 16000, dtype=np.float32)
+    for seg, speaker in zip(segments, truth):
+        audio[int(seg.start * 16000):int(seg.end * 16000)] = speaker
+
+    full = _VoiceEmbedder(voices)
+    labels = DiarizationService(embedder=full).diarize(audio, segments, num_speakers=2)
+    assert adjusted_rand_score(truth, labels) == 1.0
+
+    partial = _VoiceEmbedder(voices)
+    labels = DiarizationService(embedder=partial, skip_inner_turns=True).diarize(audio, segments, num_speakers=2)
+    assert adjusted_rand_score(truth, labels) == 1.0
+    assert partial.crops < full.crops == len(segments)
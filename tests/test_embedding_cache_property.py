@@ -0,0 +1,49 @@
+import os
+import numpy as np
+from collections import namedtuple
+from hypothesis import given, settings as hyp_settings, strategies as st
+from app.services.embedding_cache import EmbeddingCache
+
+Seg = namedtuple("Seg", "start end")
+
+
+def test_key_depends_on_content_and_boundaries():
+    audio = np.zeros(1600, dtype=np.float32)
+    segments = [Seg(0.0, 0.05), Seg(0.05, 0.1)]
+    key = EmbeddingCache.key(audio, segments)
+    assert EmbeddingCache.key(audio.copy(), list(segments)) == key
+    assert EmbeddingCache.key(audio + 0.5, segments) != key
+    assert EmbeddingCache.key(audio, [Seg(0.0, 0.06), Seg(0.06, 0.1)]) != key
+
+
+def test_roundtrip_without_pickle(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    embeddings = [np.full(192, i, dtype=np.float32) for i in range(3)]
+    cache.put("k", embeddings, [0, 2, 5])
+    loaded, indices = cache.get("k")
+    assert indices == [0, 2, 5]
+    assert np.array_equal(np.array(loaded), np.array(embeddings))
+    with np.load(tmp_path / "k.npz", allow_pickle=False) as data:
+        assert data["embeddings"].dtype == np.float32
+    assert cache.get("missing") is None
+
+
+@hyp_settings(max_examples=20, deadline=None)
+@given(st.integers(min_value=1, max_value=6), st.integers(min_value=2, max_value=12))
+def test_lru_bound(tmp_path_factory, keep, n):
+    """Property: the directory stays under max_bytes, the most recently used entries survive"""
+    directory = tmp_path_factory.mktemp("emb")
+    probe = EmbeddingCache(str(directory), max_bytes=1 << 30)
+    probe.put("probe", [np.zeros(64, dtype=np.float32)], [0])
+    size = os.path.getsize(directory / "probe.npz")
+    os.remove(directory / "probe.npz")
+
+    cache = EmbeddingCache(str(directory), max_bytes=size * keep)
+    for i in range(n):
+        cache.put(f"e{i}", [np.full(64, i, dtype=np.float32)], [0])
+        os.utime(directory / f"e{i}.npz", (i, i))  # Deterministic recency
+    cache.evict()
+
+    left = sorted(os.listdir(directory))
+    assert sum(os.path.getsize(directory / f) for f in left) <= size * keep
+    assert left == sorted(f"e{i}.npz" for i in range(max(0, n - keep), n))
@@ -0,0 +1,79 @@
+import json
+import asyncio
+from hypothesis import given, strategies as st
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.crud import TaskStore
+from app.core.events import task_event, TaskEventHub
+
+
+def test_worker_changes_emit_status_events():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    events = []
+    store = TaskStore(sessionmaker(bind=engine)(), on_change=lambda task: events.append(task_event(task)))
+    task = store.create_task("a.wav", "/tmp/a.wav", owner_id="u1")
+    
+    store.update_status(task.task_id, "processing")
+    store.update_progress(task.task_id, 40)
+    store.save_result(task.task_id, "oi", "pt", 60.0, 12.0)
+    assert [(e["status"], e["progress"]) for e in events] == [("processing", 0), ("processing", 40), ("completed", 100)]
+    assert events[1]["eta_seconds"] is not None
+    assert all(e["task_id"] == task.task_id for e in events)
+
+
+@given(st.lists(st.sampled_from(["u1", "u2"]), max_size=300))
+def test_hub_fans_out_to_owner_only(owners):
+    """Property: each socket gets only its owner's events, newest kept when a client lags"""
+    hub = TaskEventHub("redis://unused")
+    queues = {owner: asyncio.Queue(maxsize=100) for owner in ("u1", "u2")}
+    for owner, queue in queues.items():
+        hub._listeners[owner] = {queue}
+    
+    for n, owner in enumerate(owners):
+        hub._dispatch(f"task_events:{owner}", json.dumps({"task_id": owner, "n": n}))
+    
+    for owner, queue in queues.items():
+        received = [json.loads(queue.get_nowait()) for _ in range(queue.qsize())]
+        sent = [n for n, o in enumerate(owners) if o == owner]
+        assert all(e["task_id"] == owner for e in received)
+        assert [e["n"] for e in received] == sent[-100:]
+
+
+class _Recorder:
+    def __init__(self, clock):
+        self.clock = clock
+        self.events = []
+
+    def publish_event(self, owner_id, event):
+        self.events.append((self.clock(), event))
+
+
+@given(st.lists(st.tuples(st.integers(min_value=0, max_value=100), st.floats(min_value=0, max_value=3)), max_size=200))
+def test_progress_coalesced(updates):
+    """Property: live progress is rate-limited, the DB is only written at 10% milestones"""
+    from app.core.progress import ProgressReporter, PUBLISH_INTERVAL_S, DB_STEP
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    writes = []
+    store = TaskStore(sessionmaker(bind=engine)())
+    task = store.create_task("a.wav", "/tmp/a.wav", owner_id="u1")
+    original = store.update_progress
+    store.update_progress = lambda task_id, pct, notify=True: writes.append(pct) or original(task_id, pct, notify)
+    
+    now = [0.0]
+    recorder = _Recorder(lambda: now[0])
+    report = ProgressReporter(store, task, publisher=recorder, clock=lambda: now[0])
+    pcts = sorted(p for p, _ in updates)  # Whisper reports monotonically
+    for pct, (_, dt) in zip(pcts, updates):
+        now[0] += dt
+        report(pct)
+    
+    published = [e["progress"] for _, e in recorder.events]
+    assert published == sorted(set(published))
+    times = [t for t, e in recorder.events if e["progress"] < 100]
+    assert all(b - a >= PUBLISH_INTERVAL_S for a, b in zip(times, times[1:]))
+    assert len({w // DB_STEP for w in writes}) == len(writes)
+    if pcts and pcts[-1] == 100:
+        assert published[-1] == 100 and writes[-1] == 100
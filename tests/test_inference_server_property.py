@@ -0,0 +1,81 @@
+import queue
+import threading
+import numpy as np
+from hypothesis import given, settings as hyp_settings, strategies as st
+from app.services.inference_server import InferenceServer, parse_address
+from app.services.diarization import length_batches
+
+
+def test_parse_address():
+    assert parse_address("/run/careca/inference.sock") == ("/run/careca/inference.sock", "AF_UNIX")
+    assert parse_address("localhost:7000") == (("localhost", 7000), "AF_INET")
+
+
+class _LengthEncoder:
+    """Embedding = crop length, so every result can be traced back to its request"""
+    def encode_crops(self, crops, batch_size=32):
+        return np.array([[len(c)] for c in crops], dtype=np.float32)
+
+
+class _Settings:
+    INFERENCE_EMBED_BATCH = 8
+
+
+@hyp_settings(max_examples=20, deadline=None)
+@given(st.lists(st.lists(st.integers(min_value=1, max_value=50), min_size=1, max_size=10), min_size=1, max_size=6))
+def test_batched_embeddings_return_to_their_requests(requests):
+    """Property: crops from concurrent workers are batched, each worker gets its own embeddings back"""
+    server = object.__new__(InferenceServer)
+    server.settings = _Settings()
+    server.diarizer = _LengthEncoder()
+    server._embed_queue = queue.Queue()
+    threading.Thread(target=server._embed_loop, daemon=True).start()
+
+    results = [None] * len(requests)
+
+    def worker(i):
+        crops = [np.zeros(n, dtype=np.float32) for n in requests[i]]
+        results[i] = server.op_embed(crops)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(requests))]
+    for t in threads: t.start()
+    for t in threads: t.join(timeout=10)
+
+    for lengths, emb in zip(requests, results):
+        assert emb[:, 0].tolist() == lengths
+
+
+@hyp_settings(max_examples=50, deadline=None)
+@given(st.lists(st.integers(min_value=1, max_value=10000), max_size=100), st.integers(min_value=1, max_value=16))
+def test_length_batches_cover_every_crop_once(lengths, batch_size):
+    """Property: ECAPA batches hold every crop exactly once, shortest first, at most batch_size each"""
+    batches = length_batches(lengths, batch_size)
+    flat = [i for batch in batches for i in batch]
+    assert sorted(flat) == list(range(len(lengths)))
+    assert all(0 < len(batch) <= batch_size for batch in batches)
+    assert [lengths[i] for i in flat] == sorted(lengths)
+
+
+def test_model_load_does_not_block_loaded_models():
+    """A slow model load only holds its own lock: requests for loaded models keep going"""
+    server = object.__new__(InferenceServer)
+    server.settings = type("S", (), {"WHISPER_MODEL": "small"})()
+    server.models = {"small": "small-model"}
+    server._batched_models = {}
+    server._models_lock = threading.Lock()
+    server._load_locks = {}
+    release, loads = threading.Event(), []
+
+    def slow_load(name):
+        loads.append(name)
+        release.wait(5)
+        return f"{name}-model"
+    server._load_model = slow_load
+
+    loaders = [threading.Thread(target=server.get_model, args=("large-v3",)) for _ in range(2)]
+    for t in loaders: t.start()
+    assert server.get_model("small") == "small-model"
+    release.set()
+    for t in loaders: t.join(timeout=5)
+    assert server.models["large-v3"] == "large-v3-model"
+    assert loads == ["large-v3"]  # Loaded once, the second request waited for it
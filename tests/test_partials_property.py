@@ -0,0 +1,19 @@
+from hypothesis import given, strategies as st
+from app.core.partials import format_partial
+
+segment = st.fixed_dictionaries(
+    {"start": st.floats(min_value=0, max_value=7200), "text": st.text(alphabet="abcçãé ?!", min_size=1, max_size=40).map(str.strip).filter(bool)},
+    optional={"speaker": st.one_of(st.sampled_from(["Atendente", "Cliente"]), st.integers(min_value=0, max_value=1))}
+)
+
+
+@given(st.lists(segment, max_size=20), st.booleans())
+def test_partial_transcript_one_line_per_segment(segments, use_timestamps):
+    """Property: the partial text has the final transcript's line format, one line per segment"""
+    lines = format_partial(segments, use_timestamps).split("\n") if segments else []
+    assert len(lines) == len(segments)
+    for line, seg in zip(lines, segments):
+        assert line.endswith(seg["text"])
+        assert line.startswith(f"[{int(seg['start'] // 60):02d}:") == use_timestamps
+        if isinstance(seg.get("speaker"), int):
+            assert f"[Pessoa {seg['speaker'] + 1}]" in line
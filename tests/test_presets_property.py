@@ -0,0 +1,35 @@
+from hypothesis import given, strategies as st
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.crud import TaskStore, result_cache_key
+from app.core import presets
+
+
+@given(st.sampled_from(list(presets.PRESETS)), st.booleans())
+def test_explicit_no_diarization_always_wins(name, diarization):
+    """Property: a preset can turn diarization off, never back on against the upload form"""
+    config = presets.resolve({"preset": name, "diarization": diarization})
+    assert config["diarization"] == (diarization and presets.PRESETS[name]["diarization"])
+    assert config["beam_size"] == presets.PRESETS[name]["beam_size"]
+
+
+def test_tasks_without_preset_are_balanced():
+    assert presets.resolve({})["beam_size"] == presets.PRESETS["balanced"]["beam_size"]
+    assert presets.preset_name(None) == "balanced"
+
+
+def test_cache_key_depends_on_preset():
+    assert result_cache_key("h", {"preset": "fast"}) != result_cache_key("h", {"preset": "balanced"})
+
+
+def test_preset_and_real_time_factor_recorded():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    store = TaskStore(sessionmaker(bind=engine)())
+    
+    task = store.create_task("a.mp3", "/tmp/a.mp3", owner_id="u1", options={"preset": "fast"})
+    store.save_result(task.task_id, "texto", "pt", duration=120.0, processing_time=30.0)
+    task = store.get_task(task.task_id)
+    assert task.preset == "fast"
+    assert task.real_time_factor == 0.25
@@ -0,0 +1,107 @@
+from hypothesis import given, settings as hyp_settings, strategies as st, HealthCheck
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, ResultCache
+from app.crud import TaskStore, result_cache_key
+
+# In-memory SQLite for testing
+TEST_DATABASE_URL = "sqlite:///:memory:"
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(TEST_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+    Base.metadata.drop_all(engine)
+
+def _completed_task(store, content_hash, options=None, text="Olá mundo"):
+    task = store.create_task("a.mp3", "/tmp/a.mp3", owner_id="u1", options=options, content_hash=content_hash)
+    store.save_result(task.task_id, text, "pt", 12.0, 3.0, summary="Resumo", topics="a, b")
+    return task
+
+def test_duplicate_upload_served_from_cache(db_session):
+    store = TaskStore(db_session)
+    options = {"timestamp": True, "diarization": True}
+    source = _completed_task(store, "h1", options)
+    store.store_cached_result(source.task_id)
+
+    entry = store.find_cached_result("h1", options)
+    assert entry is not None
+    assert entry.hits == 1
+
+    dup = store.create_task("b.mp3", "/tmp/b.mp3", owner_id="u2", options=options, content_hash="h1")
+    done = store.complete_from_cache(dup.task_id, entry)
+    assert done.status == "completed"
+    assert done.result_text == "Olá mundo"
+    assert done.processing_time == 0.0
+
+def test_different_options_miss(db_session):
+    store = TaskStore(db_session)
+    source = _completed_task(store, "h1", {"timestamp": True, "diarization": True})
+    store.store_cached_result(source.task_id)
+    assert store.find_cached_result("h1", {"timestamp": True, "diarization": False}) is None
+
+def test_force_flag_not_part_of_key():
+    assert result_cache_key("h", {"timestamp": True}) == result_cache_key("h", {"timestamp": True, "force": True})
+
+def test_speaker_settings_part_of_key(tmp_path, monkeypatch):
+    """Enrolling a voiceprint or renaming channels invalidates diarized results only"""
+    import numpy as np
+    from app.core.config import settings
+    from app.services.voiceprints import VoiceprintRegistry
+    monkeypatch.setattr(settings, "VOICEPRINTS_PATH", str(tmp_path / "voiceprints.npz"))
+    diarized, plain = {"diarization": True}, {"diarization": False}
+    before = result_cache_key("h", diarized), result_cache_key("h", plain)
+
+    VoiceprintRegistry(settings.VOICEPRINTS_PATH, 0.6).enroll("Ana", np.eye(3, 8) + 1)
+    assert result_cache_key("h", diarized) != before[0]
+    assert result_cache_key("h", plain) == before[1]
+
+    enrolled = result_cache_key("h", diarized)
+    monkeypatch.setattr(settings, "STEREO_CHANNEL_LABELS", ["Atendente", "Cliente"])
+    assert result_cache_key("h", diarized) != enrolled
+
+def test_two_tier_settings_part_of_key(monkeypatch):
+    """Two-tier decoding changes the default model's results, not the other presets'"""
+    from app.core.config import settings
+    default, fast = {"preset": "balanced"}, {"preset": "fast"}
+    monkeypatch.setattr(settings, "TWO_TIER", False)
+    before = result_cache_key("h", default), result_cache_key("h", fast)
+
+    monkeypatch.setattr(settings, "TWO_TIER", True)
+    assert result_cache_key("h", default) != before[0]
+    assert result_cache_key("h", fast) == before[1]
+
+    two_tier = result_cache_key("h", default)
+    monkeypatch.setattr(settings, "TWO_TIER_DRAFT_MODEL", "base")
+    assert result_cache_key("h", default) != two_tier
+
+def test_invalidate(db_session):
+    store = TaskStore(db_session)
+    source = _completed_task(store, "h1")
+    store.store_cached_result(source.task_id)
+    assert store.invalidate_cached_result("h1") == 1
+    assert store.find_cached_result("h1") is None
+
+@hyp_settings(max_examples=10, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(st.integers(min_value=1, max_value=15), st.integers(min_value=0, max_value=10))
+def test_lru_bound(db_session, n_entries, max_entries):
+    """Property: after eviction the cache never holds more than max_entries, most recent kept"""
+    store = TaskStore(db_session)
+    db_session.query(ResultCache).delete()
+    base = datetime.utcnow()
+    for i in range(n_entries):
+        entry = store.store_cached_result(_completed_task(store, f"h{i}").task_id)
+        entry.last_used_at = base + timedelta(seconds=i)
+    db_session.commit()
+
+    store.evict_result_cache(max_entries=max_entries, ttl_days=0)
+    remaining = {e.content_hash for e in db_session.query(ResultCache).all()}
+    assert len(remaining) == min(n_entries, max_entries)
+    if remaining:
+        assert f"h{n_entries - 1}" in remaining
@@ -0,0 +1,128 @@
+from hypothesis import given, settings as hyp_settings, strategies as st
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.crud import TaskStore
+from app.core.config import settings
+from app.core.queue import TaskQueue
+from app.api.v1.endpoints.tasks import _estimate_eta
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@hyp_settings(max_examples=50)
+@given(st.floats(min_value=0.1, max_value=48 * 3600))
+def test_job_timeout_scales_within_bounds(duration):
+    """Property: timeout grows with the audio length and stays within [min, max]"""
+    timeout = TaskQueue.job_timeout(duration)
+    assert settings.JOB_TIMEOUT_MIN_S <= timeout <= settings.JOB_TIMEOUT_MAX_S
+    assert timeout >= TaskQueue.job_timeout(duration / 2)
+
+def test_unknown_duration_keeps_default_timeout():
+    assert TaskQueue.job_timeout(None) == 3600
+
+def test_probe_stored_on_task(db_session):
+    store = TaskStore(db_session)
+    info = {"duration": 93.5, "sample_rate": 8000, "channels": 2, "codec": "pcm_s16le"}
+    task = store.create_task("a.wav", "/tmp/a.wav", owner_id="u1", audio_info=info)
+    assert (task.duration, task.sample_rate, task.channels, task.codec) == (93.5, 8000, 2, "pcm_s16le")
+
+def test_eta_from_history(db_session):
+    store = TaskStore(db_session)
+    assert store.estimate_rtf() is None
+    
+    done = store.create_task("a.mp3", "/tmp/a.mp3", owner_id="u1", audio_info={"duration": 100.0})
+    store.save_result(done.task_id, "texto", "pt", 100.0, 50.0)
+    assert store.estimate_rtf() == pytest.approx(0.5)
+    
+    queued = store.create_task("b.mp3", "/tmp/b.mp3", owner_id="u1", audio_info={"duration": 60.0})
+    assert _estimate_eta(queued, store) == 30
+    
+    # Processing with progress: extrapolated from its own pace
+    queued.status, queued.progress = "processing", 25
+    queued.started_at = datetime.utcnow() - timedelta(seconds=10)
+    assert _estimate_eta(queued, store) == pytest.approx(30, abs=1)
+    
+    assert _estimate_eta(done, store) is None
+
+def test_queue_routing_by_duration():
+    q = TaskQueue()
+    assert q.queue_for(12.0).name == "transcription_clips"
+    assert q.queue_for(settings.SHORT_AUDIO_SECONDS).name == "transcription_short"
+    assert q.queue_for(3600.0).name == "transcription_tasks"
+    assert q.queue_for(None).name == "transcription_tasks"
+
+def test_preview_only_for_long_audios(monkeypatch):
+    q = TaskQueue()
+    assert not q.wants_preview(3600.0)  # PREVIEW_SECONDS=0: off
+    monkeypatch.setattr(settings, "PREVIEW_SECONDS", 60)
+    assert q.wants_preview(3600.0) and q.wants_preview(None)
+    assert not q.wants_preview(settings.SHORT_AUDIO_SECONDS)
+
+class _RecordingQueue:
+    def __init__(self, name, log):
+        self.name, self.log = name, log
+
+    def enqueue(self, func, args=(), **kwargs):
+        self.log.append((self.name, func))
+        return type("Job", (), {"id": args[0], "timeout": kwargs.get("job_timeout")})()
+
+def test_preview_enqueued_before_full_job(monkeypatch):
+    import asyncio
+    monkeypatch.setattr(settings, "PREVIEW_SECONDS", 60)
+    q, log = TaskQueue(), []
+    q.queue = _RecordingQueue("transcription_tasks", log)
+    q.preview_queue = _RecordingQueue("transcription_preview", log)
+    asyncio.run(q.put(("t1", "/tmp/a.mp3", {}), duration=3600.0))
+    assert log == [
+        ("transcription_preview", "app.core.worker.process_preview"),
+        ("transcription_tasks", "app.core.worker.process_transcription"),
+    ]
+
+def test_enrollment_goes_to_a_model_queue():
+    q, log = TaskQueue(), []
+    q.short_queue = _RecordingQueue("transcription_short", log)
+    q.analysis_queue = _RecordingQueue("analysis_tasks", log)
+    q.enqueue_model_job("app.core.worker.enroll_voiceprint", "Ana", "/tmp/ana.wav")
+    assert log == [("transcription_short", "app.core.worker.enroll_voiceprint")]
+
+def test_preview_replaced_by_full_result(db_session):
+    store = TaskStore(db_session)
+    task = store.create_task("a.wav", "/tmp/a.wav", owner_id="u1")
+    store.save_preview(task.task_id, "[00:00] Alô")
+    assert task.preview_text == "[00:00] Alô"
+    store.save_result(task.task_id, "[00:00] Alô, bom dia", "pt", 600.0, 60.0)
+    assert task.preview_text is None
+    # A late preview never overwrites a finished task
+    store.save_preview(task.task_id, "[00:00] Alô")
+    assert task.preview_text is None
+
+@given(st.sampled_from(["queued", "deferred", "scheduled", "started", "finished", "failed", "stopped", "canceled"]), st.booleans())
+def test_recovery_only_reclaims_dead_jobs(status, worker_alive):
+    """Property: waiting jobs and jobs on a live worker are never re-enqueued"""
+    from redis import Redis
+    from rq.job import Job, JobStatus
+    from app.core.recovery import job_alive
+    job = Job("t1", connection=Redis())
+    job._status = JobStatus(status)
+    job.worker_name = "w1"
+    alive = job_alive(job, {"w1"} if worker_alive else set(), conn=None)
+    if status in ("queued", "deferred", "scheduled"):
+        assert alive
+    elif status == "started":
+        assert alive == worker_alive
+    else:
+        assert not alive
+
+@given(st.one_of(st.none(), st.integers(min_value=settings.JOB_TIMEOUT_MIN_S, max_value=settings.JOB_TIMEOUT_MAX_S)))
+def test_claimed_clips_outlive_their_claimer(timeout):
+    """Property: a claimed clip job expires, but never before its claiming job can time out"""
+    ttl = TaskQueue.claim_ttl(timeout)
+    assert ttl > (timeout or 3600)
@@ -0,0 +1,51 @@
+import os
+import hashlib
+from hypothesis import given, settings as hyp_settings, strategies as st
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.upload import StreamingUpload
+
+app = FastAPI()
+
+@app.post("/upload")
+async def _upload(request: Request):
+    upload = await StreamingUpload(request).receive()
+    return {"path": upload.file_path, "size": upload.size, "hash": upload.content_hash, "fields": upload.fields}
+
+client = TestClient(app)
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+
+
+@hyp_settings(max_examples=20, deadline=None)
+@given(st.binary(min_size=1, max_size=20000))
+def test_streamed_file_matches_upload(content):
+    """Property: the file on disk, its size and hash match the uploaded bytes"""
+    data = b"ID3" + content
+    response = client.post("/upload", files={"file": ("Call 01.mp3", data)}, data={"timestamp": "false"})
+    assert response.status_code == 200
+    body = response.json()
+    with open(body["path"], "rb") as f:
+        assert f.read() == data
+    os.remove(body["path"])
+    assert body["size"] == len(data)
+    assert body["hash"] == hashlib.sha256(data).hexdigest()
+    assert body["fields"] == {"timestamp": "false"}
+
+
+def test_oversized_upload_rejected_and_removed(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    before = set(os.listdir(settings.UPLOAD_DIR))
+    response = client.post("/upload", files={"file": ("big.wav", b"RIFF" + b"\0" * (2 * 1024 * 1024))})
+    assert response.status_code == 413
+    assert set(os.listdir(settings.UPLOAD_DIR)) == before
+
+
+def test_invalid_extension_rejected():
+    response = client.post("/upload", files={"file": ("script.exe", b"MZ")})
+    assert response.status_code == 400
+
+
+def test_empty_file_rejected():
+    response = client.post("/upload", files={"file": ("a.mp3", b"")})
+    assert response.status_code == 400
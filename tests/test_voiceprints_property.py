@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from hypothesis import given, settings as hyp_settings, strategies as st
+from sklearn.preprocessing import normalize
+from app.services.voiceprints import VoiceprintRegistry
+from app.services.diarization import DiarizationService
+from tests.test_diarization_property import Seg, _VoiceEmbedder
+
+
+def _voices(seed, n, dim=192):
+    return normalize(np.random.default_rng(seed).normal(size=(n, dim)))
+
+
+def _samples(voice, n, seed=0):
+    return voice + np.random.default_rng(seed).normal(scale=0.02, size=(n, len(voice)))
+
+
+@hyp_settings(max_examples=20, deadline=None)
+@given(st.integers(min_value=0, max_value=10**6), st.integers(min_value=1, max_value=6))
+def test_enrolled_voices_match_by_name(tmp_path_factory, seed, n_agents):
+    """Property: samples of enrolled voices match their name, unknown voices match nothing"""
+    path = str(tmp_path_factory.mktemp("vp") / "voiceprints.npz")
+    voices = _voices(seed, n_agents + 1)
+    registry = VoiceprintRegistry(path, threshold=0.6)
+    for i in range(n_agents):
+        registry.enroll(f"Agente {i}", _samples(voices[i], 5, seed=i))
+
+    # A fresh instance (another process) sees the same registry
+    known, names = VoiceprintRegistry(path, threshold=0.6).match(normalize(_samples(voices[0], 1, seed=99)))
+    assert names[known[0]] == "Agente 0"
+    unknown, _ = registry.match(normalize(_samples(voices[-1], 3, seed=7)))
+    assert unknown.tolist() == [-1, -1, -1]
+
+
+def test_reenroll_replaces_and_remove(tmp_path):
+    path = str(tmp_path / "voiceprints.npz")
+    a, b = _voices(1, 2)
+    registry = VoiceprintRegistry(path, threshold=0.6)
+    registry.enroll("Ana", _samples(a, 4))
+    registry.enroll("Ana", _samples(b, 6))
+    assert registry.entries() == [{"name": "Ana", "samples": 6}]
+    known, names = registry.match(normalize(_samples(b, 1, seed=3)))
+    assert names[known[0]] == "Ana"
+
+    assert registry.remove("Ana") and not registry.remove("Ana")
+    assert registry.entries() == []
+    with pytest.raises(ValueError):
+        registry.enroll("Bia", _samples(a, 2))
+
+
+def test_known_agent_labelled_by_name(tmp_path):
+    voices = _voices(5, 2)  # agent, customer
+    registry = VoiceprintRegistry(str(tmp_path / "voiceprints.npz"), threshold=0.6)
+    registry.enroll("Ana", _samples(voices[0], 5))
+
+    segments, truth, t = [], [], 0.0
+    for turn in range(12):
+        for _ in range(3):
+            segments.append(Seg(t, t + 2.0))
+            truth.append(turn % 2)
+            t += 2.5
+    audio = np.zeros(int(t * 16000) + 16000, dtype=np.float32)
+    for seg, speaker in zip(segments, truth):
+        audio[int(seg.start * 16000):int(seg.end * 16000)] = speaker
+
+    diarizer = DiarizationService(embedder=_VoiceEmbedder(voices), voiceprints=registry)
+    for num_speakers in (None, 2):
+        labels = diarizer.diarize(audio, segments, num_speakers=num_speakers)
+        assert labels == ["Ana" if s == 0 else 0 for s in truth]